@@ -1,3 +1,41 @@
-from django.test import TestCase
+"""Budgets of SQL queries and cache round trips for 'Authorization' endpoints.
 
-# Create your tests here.
+Run with SHOP_TESTING=True (SQLite and local memory cache).
+
+"""
+
+from django.urls import reverse
+
+from common.testing import QueryBudgetTestCase
+
+
+class AuthorizationQueryBudgetTest(QueryBudgetTestCase):
+    """Check that sign in/up/out endpoints cost fixed number of queries."""
+
+    def test_sign_in(self) -> None:
+        self.request_with_budget(
+            "post",
+            reverse("authorization:sign_in"),
+            9,
+            0,
+            {"username": "buyer", "password": "buyer_password"},
+        )
+
+    def test_sign_up(self) -> None:
+        self.request_with_budget(
+            "post",
+            reverse("authorization:sign_up"),
+            10,
+            0,
+            {
+                "name": "New Buyer",
+                "username": "new_buyer",
+                "password": "new_buyer_password",
+            },
+        )
+
+    def test_sign_out(self) -> None:
+        self.client.force_login(self.user)
+        self.request_with_budget(
+            "post", reverse("authorization:sign_out"), 11, 0,
+        )
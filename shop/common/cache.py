@@ -0,0 +1,635 @@
+"""Module with cache helpers for different apps."""
+
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from json import dumps as json_dumps
+from time import monotonic, sleep, time
+from traceback import format_exc as tb_format_exc
+from functools import wraps
+from typing import Any, Callable, Iterable, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpRequest, HttpResponse
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .custom_logger import app_logger
+
+cache_tag_key = "cache_tag:{tag}"
+cache_lock_key = "cache_lock:{key}"
+cache_metric_key = "cache_metric:{name}:{event}"
+cache_metrics_events = ("computed", "collapsed", "timed_out")
+cache_lock_poll_interval = 0.05
+cache_stale_timeout = 300
+cache_refresh_workers = 2
+cache_clock_skew = 1
+
+
+class CacheLockTimeoutError(Exception):
+    """Value is not computed by lock owner during lock wait timeout."""
+
+
+def build_cache_key(prefix: str, params: Any) -> str:
+    """Build canonical cache key from params.
+
+    Params are dumped to json with sorted keys and hashed, so equal params
+    give the same key regardless of keys order.
+
+    """
+    dumped_params = json_dumps(params, sort_keys=True, default=str)
+    return f"{prefix}:{sha256(dumped_params.encode()).hexdigest()}"
+
+
+class TaggedCache:
+    """Class for caching values tagged with invalidation tags.
+
+    Each tag has a version stored in cache. Entry keeps versions of its tags
+    at the moment of caching and is considered as missed if any tag version
+    is changed, so invalidation of tag evicts all entries tagged with it.
+    Version starts with timestamp of invalidation ('{timestamp}:{uuid}'),
+    so value which was being computed while its tag was invalidated is not
+    cached (it can be computed from data before changes).
+
+    """
+
+    @staticmethod
+    def _get_tags_keys(tags: Iterable[str]) -> dict[str, str]:
+        """Get {tag: tag cache key} for tags."""
+
+        return {tag: cache_tag_key.format(tag=tag) for tag in tags}
+
+    @classmethod
+    def get(cls, key: str) -> Optional[Any]:
+        """Get cached value if its tags are not invalidated."""
+
+        entry = cls.get_entry(key)
+        return entry["value"] if entry else None
+
+    @classmethod
+    def get_entry(cls, key: str) -> Optional[dict]:
+        """Get cached entry {'value', 'expires'} if tags are not invalidated.
+
+        'expires' is soft expiry timestamp, entry is kept in cache after it
+        for stale timeout.
+
+        """
+        entry = cache.get(key)
+        if entry is None:
+            return None
+
+        tags_keys = cls._get_tags_keys(entry["tags"])
+        tags_versions = cache.get_many(tags_keys.values())
+        return entry if cls._is_valid(key, entry, tags_versions) else None
+
+    @classmethod
+    def get_many(cls, keys: Iterable[str]) -> dict[str, Any]:
+        """Get {key: value} of cached values if their tags are not invalidated.
+
+        Values and versions of all their tags are got by two cache requests.
+
+        """
+        entries = cache.get_many(keys)
+        tags_keys = cls._get_tags_keys(
+            {tag for entry in entries.values() for tag in entry["tags"]}
+        )
+        tags_versions = cache.get_many(tags_keys.values())
+        return {
+            key: entry["value"]
+            for key, entry in entries.items()
+            if cls._is_valid(key, entry, tags_versions)
+        }
+
+    @classmethod
+    def _is_valid(cls, key: str, entry: dict, tags_versions: dict) -> bool:
+        """Check that entry tags versions are equal to current versions."""
+
+        for tag, version in entry["tags"].items():
+            tag_key = cache_tag_key.format(tag=tag)
+            if tags_versions.get(tag_key) != version:
+                app_logger.debug(f"Cache {key=} is invalidated by {tag=}")
+                return False
+        return True
+
+    @classmethod
+    def set(
+            cls,
+            key: str,
+            value: Any,
+            tags: Iterable[str],
+            timeout: int,
+            stale_timeout: int = 0,
+            computed_since: Optional[float] = None,
+    ) -> None:
+        """Cache value with current versions of tags.
+
+        Value is expired after timeout and kept in cache for stale timeout
+        more to be served while it is refreshed. Value is not cached if any
+        tag is invalidated after 'computed_since' (timestamp when computing
+        of value is started).
+
+        """
+        versions = cls.get_versions(tags)
+        if cls._is_invalidated_since(versions.values(), computed_since):
+            app_logger.debug(f"Cache {key=} is invalidated while computed")
+            return
+
+        entry = {
+            "tags": versions,
+            "value": value,
+            "expires": time() + timeout,
+        }
+        cache.set(key, entry, timeout + stale_timeout)
+
+    @classmethod
+    def set_many(
+            cls,
+            entries: dict[str, tuple[Any, Iterable[str]]],
+            timeout: int,
+            computed_since: Optional[float] = None,
+    ) -> None:
+        """Cache values {key: (value, tags)} with current versions of tags.
+
+        Versions of all tags are got and values are cached by three cache
+        requests at most. Values with tags invalidated after
+        'computed_since' are not cached.
+
+        """
+        entries = {
+            key: (value, set(tags)) for key, (value, tags) in entries.items()
+        }
+        versions = cls.get_versions(
+            {tag for _, tags in entries.values() for tag in tags}
+        )
+        expires = time() + timeout
+        cache.set_many(
+            {
+                key: {
+                    "tags": {tag: versions[tag] for tag in tags},
+                    "value": value,
+                    "expires": expires,
+                }
+                for key, (value, tags) in entries.items()
+                if not cls._is_invalidated_since(
+                    [versions[tag] for tag in tags], computed_since,
+                )
+            },
+            timeout,
+        )
+
+    @classmethod
+    def get_versions(cls, tags: Iterable[str]) -> dict[str, str]:
+        """Get {tag: version} of tags, create versions of new tags."""
+
+        tags_keys = cls._get_tags_keys(set(tags))
+        tags_versions = cache.get_many(tags_keys.values())
+        new_versions = {
+            tag_key: f"0:{uuid4().hex}"
+            for tag_key in tags_keys.values()
+            if tag_key not in tags_versions
+        }
+        if new_versions:
+            cache.set_many(new_versions, timeout=None)
+            tags_versions.update(new_versions)
+
+        return {
+            tag: tags_versions[tag_key] for tag, tag_key in tags_keys.items()
+        }
+
+    @classmethod
+    def get_existing_versions(
+            cls, tags: Iterable[str],
+    ) -> Optional[dict[str, str]]:
+        """Get {tag: version} of tags without creating versions of new tags.
+
+        Return None if any tag has no version yet (nothing is cached with
+        it), so unknown tags (e.g. of missed entities) do not leave
+        versions in cache.
+
+        """
+        tags_keys = cls._get_tags_keys(set(tags))
+        tags_versions = cache.get_many(tags_keys.values())
+        if len(tags_versions) < len(tags_keys):
+            return None
+
+        return {
+            tag: tags_versions[tag_key] for tag, tag_key in tags_keys.items()
+        }
+
+    @classmethod
+    def invalidate(cls, tags: Iterable[str]) -> None:
+        """Invalidate tags after commit of current transaction.
+
+        All entries tagged with any of the tags are considered as missed.
+
+        """
+        tags_keys = cls._get_tags_keys(set(tags))
+        if not tags_keys:
+            return
+
+        def set_new_versions() -> None:
+            app_logger.debug(f"Invalidate cache tags {tags_keys.keys()}")
+            cache.set_many(
+                {
+                    tag_key: f"{time()}:{uuid4().hex}"
+                    for tag_key in tags_keys.values()
+                },
+                timeout=None,
+            )
+
+        transaction.on_commit(set_new_versions)
+
+    @staticmethod
+    def _is_invalidated_since(
+            versions: Iterable[str], since: Optional[float],
+    ) -> bool:
+        """Check that any of versions is set by invalidation after since.
+
+        Timestamps of versions are compared with allowance for clock skew
+        of processes.
+
+        """
+        if since is None:
+            return False
+
+        for version in versions:
+            invalidated_at, separator, _ = str(version).partition(":")
+            if not separator:
+                continue
+            try:
+                if float(invalidated_at) >= since - cache_clock_skew:
+                    return True
+            except ValueError:
+                continue
+        return False
+
+
+class SingleFlight:
+    """Class for collapsing concurrent recomputes of the same cache key.
+
+    Lock is taken with atomic 'cache.add' (SET NX for django-redis), so only
+    one caller across all processes recomputes key. Other callers get stale
+    value if it is available or wait for value computed by lock owner.
+    If value is not computed during wait timeout then fallback is used as
+    per settings: 'compute' - compute value anyway, 'error' - raise
+    CacheLockTimeoutError. Computed, collapsed and timed out recomputes
+    are counted per cache key prefix.
+
+    """
+
+    @staticmethod
+    def acquire(key: str) -> bool:
+        """Take recompute lock for key."""
+
+        return cache.add(
+            cache_lock_key.format(key=key),
+            1,
+            settings.SHOP_CACHE_LOCK_TIMEOUT,
+        )
+
+    @staticmethod
+    def release(key: str) -> None:
+        """Release recompute lock for key."""
+
+        cache.delete(cache_lock_key.format(key=key))
+
+    @classmethod
+    def get_or_set(
+            cls, key: str, compute: Callable[[], Any], timeout: int,
+    ) -> Any:
+        """Get cached value or compute and cache it by one caller only."""
+
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        def compute_and_set() -> Any:
+            computed_value = compute()
+            cache.set(key, computed_value, timeout)
+            return computed_value
+
+        return cls.compute(key, compute_and_set, lambda: cache.get(key))
+
+    @classmethod
+    def compute(
+            cls,
+            key: str,
+            compute: Callable[[], Any],
+            get_cached: Callable[[], Optional[Any]],
+            stale_value: Optional[Any] = None,
+    ) -> Any:
+        """Compute value by lock owner, others wait or get stale value.
+
+        Args:
+            key (str): cache key
+            compute (Callable): function computing and caching value
+            get_cached (Callable): function getting cached value or None
+            stale_value (Optional[Any]): value returned if lock is taken
+
+        """
+        if cls.acquire(key):
+            cls.count(key, "computed")
+            try:
+                return compute()
+            finally:
+                cls.release(key)
+
+        cls.count(key, "collapsed")
+        if stale_value is not None:
+            return stale_value
+
+        deadline = monotonic() + settings.SHOP_CACHE_LOCK_WAIT
+        while monotonic() < deadline:
+            sleep(cache_lock_poll_interval)
+            value = get_cached()
+            if value is not None:
+                return value
+
+        cls.count(key, "timed_out")
+        app_logger.warning(f"Cache {key=} is not computed by lock owner")
+        if settings.SHOP_CACHE_LOCK_FALLBACK == "error":
+            raise CacheLockTimeoutError(key)
+        return compute()
+
+    @staticmethod
+    def count(key: str, event: str) -> None:
+        """Increase metric counter of event for cache key prefix."""
+
+        metric_key = cache_metric_key.format(
+            name=key.split(":", 1)[0], event=event,
+        )
+        cache.add(metric_key, 0, timeout=None)
+        try:
+            cache.incr(metric_key)
+        except ValueError:
+            app_logger.debug(f"Cache metric {metric_key=} is not cached")
+
+    @staticmethod
+    def get_metrics(names: Iterable[str]) -> dict[str, dict[str, int]]:
+        """Get metrics counters {name: {event: counter}}."""
+
+        metrics_keys = {
+            (name, event): cache_metric_key.format(name=name, event=event)
+            for name in names
+            for event in cache_metrics_events
+        }
+        counters = cache.get_many(metrics_keys.values())
+        metrics = {name: {} for name in names}
+        for (name, event), metric_key in metrics_keys.items():
+            metrics[name][event] = counters.get(metric_key, 0)
+        return metrics
+
+
+class StaleWhileRevalidateCache:
+    """Class for caching values which are served stale while refreshing.
+
+    Expired value is returned as is and only one caller (across processes)
+    schedules its recompute in background thread. If value is missed or
+    invalidated by tags then it is recomputed with SingleFlight.
+
+    """
+
+    _executor = ThreadPoolExecutor(
+        max_workers=cache_refresh_workers,
+        thread_name_prefix="cache_refresh",
+    )
+
+    @classmethod
+    def get_or_set(
+            cls,
+            key: str,
+            compute: Callable[[], tuple[Any, Iterable[str]]],
+            timeout: int,
+            stale_timeout: int = cache_stale_timeout,
+    ) -> Any:
+        """Get cached value or compute and cache it.
+
+        Args:
+            key (str): cache key
+            compute (Callable): function returning value and its cache tags
+            timeout (int): seconds while value is fresh
+            stale_timeout (int): seconds while expired value is served
+
+        """
+        entry = TaggedCache.get_entry(key)
+        if entry is None:
+            app_logger.debug(f"Cache {key=} is missed")
+            return SingleFlight.compute(
+                key,
+                lambda: cls._refresh(key, compute, timeout, stale_timeout),
+                lambda: TaggedCache.get(key),
+            )
+
+        if entry.get("expires", 0) <= time():
+            if SingleFlight.acquire(key):
+                app_logger.debug(f"Cache {key=} is stale, refresh it")
+                SingleFlight.count(key, "computed")
+                cls._executor.submit(
+                    cls._refresh_in_background,
+                    key, compute, timeout, stale_timeout,
+                )
+            else:
+                SingleFlight.count(key, "collapsed")
+        return entry["value"]
+
+    @classmethod
+    def refresh(
+            cls,
+            key: str,
+            compute: Callable[[], tuple[Any, Iterable[str]]],
+            timeout: int,
+            stale_timeout: int = cache_stale_timeout,
+    ) -> None:
+        """Recompute and cache value in background thread.
+
+        Is used for write-through of changed data, so readers get new value
+        without recompute on request. Nothing is done if value is being
+        recomputed by other caller.
+
+        """
+        if SingleFlight.acquire(key):
+            app_logger.debug(f"Cache {key=} is refreshed after changes")
+            SingleFlight.count(key, "computed")
+            cls._executor.submit(
+                cls._refresh_in_background,
+                key, compute, timeout, stale_timeout,
+            )
+
+    @staticmethod
+    def _refresh(
+            key: str,
+            compute: Callable[[], tuple[Any, Iterable[str]]],
+            timeout: int,
+            stale_timeout: int,
+    ) -> Any:
+        """Compute value and cache it with its tags."""
+
+        computed_since = time()
+        value, tags = compute()
+        TaggedCache.set(
+            key, value, tags, timeout, stale_timeout, computed_since,
+        )
+        return value
+
+    @classmethod
+    def _refresh_in_background(
+            cls,
+            key: str,
+            compute: Callable[[], tuple[Any, Iterable[str]]],
+            timeout: int,
+            stale_timeout: int,
+    ) -> None:
+        """Refresh value in worker thread and release refresh lock."""
+
+        try:
+            cls._refresh(key, compute, timeout, stale_timeout)
+        except Exception:
+            app_logger.error(f"Cache {key=} refresh error: {tb_format_exc()}")
+        finally:
+            SingleFlight.release(key)
+            connections.close_all()
+
+
+class RenderedResponse:
+    """Class for caching responses as rendered JSON bytes.
+
+    Rendered response {'body', 'status', 'etag'} is cached as is, so cache
+    hit is returned as HttpResponse without DRF content negotiation and
+    rendering. Body is rendered by DRF JSONRenderer (same as Response).
+
+    """
+
+    content_type = "application/json"
+    _renderer = JSONRenderer()
+
+    @classmethod
+    def render(cls, data: Any, status: int = 200) -> dict:
+        """Render data to JSON bytes."""
+
+        return cls.from_body(cls._renderer.render(data), status)
+
+    @staticmethod
+    def from_body(body: bytes, status: int = 200) -> dict:
+        """Get rendered response with ETag from JSON bytes."""
+
+        return {
+            "body": body,
+            "status": status,
+            "etag": f'"{sha256(body).hexdigest()[:32]}"',
+        }
+
+    @classmethod
+    def join(cls, bodies: Iterable[bytes]) -> dict:
+        """Get rendered response of JSON array from rendered items."""
+
+        return cls.from_body(b"[" + b",".join(bodies) + b"]")
+
+    @classmethod
+    def to_response(
+            cls, rendered: dict, request: Optional[HttpRequest] = None,
+    ) -> HttpResponse:
+        """Get HttpResponse from rendered response.
+
+        If request is set and its If-None-Match matches ETag of rendered
+        response then '304 Not Modified' is returned.
+
+        """
+        if (
+                request is not None and
+                rendered["status"] == 200 and
+                VersionETag.is_not_modified(request, rendered["etag"])
+        ):
+            return VersionETag.not_modified(rendered["etag"])
+
+        response = HttpResponse(
+            rendered["body"],
+            content_type=cls.content_type,
+            status=rendered["status"],
+        )
+        response["ETag"] = rendered["etag"]
+        return response
+
+
+class VersionETag:
+    """Class for conditional GET with ETag built from tags versions.
+
+    Tags versions are entities versions, they are changed by signals with
+    invalidation of cached responses. So ETag is checked by one cache
+    request without DB queries and serialization.
+
+    """
+
+    @staticmethod
+    def build(tags: Iterable[str], *parts: Any) -> Optional[str]:
+        """Build ETag from tags versions and extra parts (e.g. request).
+
+        Return None if any tag has no version yet.
+
+        """
+        versions = TaggedCache.get_existing_versions(tags)
+        if versions is None:
+            return None
+
+        dumped_versions = json_dumps(
+            [versions, parts], sort_keys=True, default=str,
+        )
+        return f'"{sha256(dumped_versions.encode()).hexdigest()[:32]}"'
+
+    @staticmethod
+    def is_not_modified(request: HttpRequest, etag: str) -> bool:
+        """Check that ETag matches If-None-Match header (weak comparison)."""
+
+        if_none_match = request.headers.get("If-None-Match")
+        if not if_none_match:
+            return False
+
+        etags = parse_etags(if_none_match)
+        return "*" in etags or etag in [
+            request_etag.removeprefix("W/") for request_etag in etags
+        ]
+
+    @staticmethod
+    def not_modified(etag: str) -> HttpResponse:
+        """Get '304 Not Modified' response with ETag."""
+
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
+        return response
+
+
+def conditional_by_versions(
+        get_tags: Callable[..., Optional[Iterable[str]]],
+) -> Callable:
+    """Decorate GET method of view with ETag built from tags versions.
+
+    'get_tags' gets tags of response from view args (request, *args,
+    **kwargs), ETag is not used if tags are None or any tag has no version
+    yet (versions are not created by conditional GET). Request full path
+    is part of ETag. If ETag matches If-None-Match then 304 is returned without
+    calling view.
+
+    """
+    def decorator(view_method: Callable) -> Callable:
+        @wraps(view_method)
+        def wrapper(self, request: HttpRequest, *args, **kwargs) -> Any:
+            tags = get_tags(request, *args, **kwargs)
+            if tags is None:
+                return view_method(self, request, *args, **kwargs)
+
+            etag = VersionETag.build(tags, request.get_full_path())
+            if etag is None:
+                return view_method(self, request, *args, **kwargs)
+
+            if VersionETag.is_not_modified(request, etag):
+                return VersionETag.not_modified(etag)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response["ETag"] = etag
+            return response
+
+        return wrapper
+
+    return decorator
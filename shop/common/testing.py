@@ -0,0 +1,318 @@
+"""Module with helpers for tests of SQL queries and cache budgets."""
+
+from datetime import timedelta
+from decimal import Decimal
+from json import dumps as json_dumps
+from typing import Any, Callable, Optional
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.constants import ORDER_STATUSES
+from orders.models import (
+    DeliveryType,
+    Order,
+    OrderAndProduct,
+    OrderStatus,
+    PaymentType,
+)
+from products.models import (
+    Category,
+    CategoryImage,
+    Product,
+    ProductAndSpecification,
+    ProductAndTag,
+    ProductImage,
+    ProductReview,
+    ProductSpecification,
+    ProductTag,
+)
+
+cache_methods = (
+    "add",
+    "get",
+    "set",
+    "touch",
+    "delete",
+    "get_many",
+    "set_many",
+    "delete_many",
+    "has_key",
+    "incr",
+    "decr",
+    "get_or_set",
+    "clear",
+)
+
+
+class CacheCallsCounter:
+    """Context manager for counting round trips to default cache.
+
+    Nested calls of cache methods (e.g. 'get_many' of local memory cache
+    calls 'get' for every key) are counted as one round trip.
+
+    """
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        self._depth = 0
+        self._patchers = []
+
+    def __enter__(self) -> "CacheCallsCounter":
+        backend = caches["default"]
+        for method_name in cache_methods:
+            patcher = patch.object(
+                backend,
+                method_name,
+                self._count(method_name, getattr(backend, method_name)),
+            )
+            patcher.start()
+            self._patchers.append(patcher)
+        return self
+
+    def __exit__(self, *args) -> None:
+        for patcher in reversed(self._patchers):
+            patcher.stop()
+        self._patchers = []
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    def _count(self, method_name: str, method: Callable) -> Callable:
+        """Wrap cache method to count its outermost calls."""
+
+        def counted_method(*args, **kwargs) -> Any:
+            if self._depth == 0:
+                key = args[0] if args else ""
+                self.calls.append(f"{method_name} {key}")
+            self._depth += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._depth -= 1
+
+        return counted_method
+
+
+class QueryBudgetTestCase(TestCase):
+    """Base class for tests of SQL queries and cache round trips budgets.
+
+    Endpoint is requested with clean cache by default (worst case) and
+    report with all SQL queries and cache calls of request is printed if
+    any budget is exceeded.
+
+    """
+
+    total_products = 30
+    total_tags = 4
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Seed categories, products with related data and user."""
+
+        cls.user = User.objects.create_user(
+            username="buyer", password="buyer_password", first_name="Buyer",
+        )
+        cls._create_orders_types()
+        cls._create_categories()
+        cls._create_products()
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def request_with_budget(
+            self,
+            method: str,
+            url: str,
+            max_queries: int,
+            max_cache_calls: int,
+            data: Optional[Any] = None,
+            clear_cache: bool = True,
+            expected_status: int = 200,
+    ) -> tuple[HttpResponse, int, int]:
+        """Request endpoint and check SQL queries and cache calls budgets.
+
+        Returns:
+            tuple[HttpResponse, int, int]: response, total SQL queries and
+            total cache calls of request
+
+        """
+        if clear_cache:
+            cache.clear()
+
+        with (
+            CaptureQueriesContext(connection) as queries,
+            CacheCallsCounter() as cache_calls,
+        ):
+            if method == "get":
+                response = self.client.get(url, data)
+            else:
+                response = getattr(self.client, method)(
+                    url, json_dumps(data), content_type="application/json",
+                )
+
+        self.assertEqual(response.status_code, expected_status, url)
+        if len(queries) > max_queries or len(cache_calls) > max_cache_calls:
+            report = self._get_report(
+                method, url, queries.captured_queries, cache_calls.calls,
+            )
+            print(report)
+            self.fail(
+                f"{method.upper()} {url}: {len(queries)} SQL queries "
+                f"(budget {max_queries}), {len(cache_calls)} cache calls "
+                f"(budget {max_cache_calls})"
+            )
+
+        return response, len(queries), len(cache_calls)
+
+    @staticmethod
+    def _get_report(
+            method: str, url: str, queries: list[dict], cache_calls: list[str],
+    ) -> str:
+        """Get report with SQL queries and cache calls of request."""
+
+        report = [f"\n{method.upper()} {url}", f"SQL queries: {len(queries)}"]
+        report.extend(
+            f"  {number}. {query['sql']}"
+            for number, query in enumerate(queries, 1)
+        )
+        report.append(f"Cache calls: {len(cache_calls)}")
+        report.extend(
+            f"  {number}. {cache_call}"
+            for number, cache_call in enumerate(cache_calls, 1)
+        )
+        return "\n".join(report)
+
+    @staticmethod
+    def _create_orders_types() -> None:
+        """Create order statuses, delivery and payment types."""
+
+        OrderStatus.objects.bulk_create(
+            OrderStatus(name=name) for name in ORDER_STATUSES.values()
+        )
+        DeliveryType.objects.bulk_create([
+            DeliveryType(
+                name="ordinary",
+                price=Decimal(200),
+                free_delivery_order_price=Decimal(2000),
+            ),
+            DeliveryType(name="express", price=Decimal(500)),
+        ])
+        PaymentType.objects.bulk_create(
+            PaymentType(name=name) for name in ("online", "someone")
+        )
+
+    @classmethod
+    def _create_categories(cls) -> None:
+        """Create two root categories with two subcategories each."""
+
+        cls.categories = []
+        for root_number in range(2):
+            root = Category(
+                title=f"Category {root_number}",
+                image=CategoryImage.objects.create(
+                    src=f"categories/{root_number}.png",
+                ),
+            )
+            root.save()
+            cls.categories.append(root)
+            for number in range(2):
+                subcategory = Category(
+                    title=f"Subcategory {root_number}.{number}",
+                    parent=root,
+                    image=CategoryImage.objects.create(
+                        src=f"categories/{root_number}_{number}.png",
+                    ),
+                )
+                subcategory.save()
+                cls.categories.append(subcategory)
+
+    @classmethod
+    def _create_products(cls) -> None:
+        """Create products with images, tags, reviews and specifications.
+
+        Objects are created one by one (not by bulk create), so signals
+        maintain search index, counters, rating and categories tags as in
+        production.
+
+        """
+        tags = [
+            ProductTag.objects.create(name=f"Tag {number}")
+            for number in range(cls.total_tags)
+        ]
+        specification = ProductSpecification.objects.create(
+            name="Weight", value="1 kg",
+        )
+        today = timezone.localdate()
+        cls.products = []
+        for number in range(cls.total_products):
+            price = Decimal(100 + number * 10)
+            sales_price = price - 50 if number % 3 == 0 else None
+            product = Product.objects.create(
+                title=f"Product {number}",
+                category=cls.categories[number % len(cls.categories)],
+                price=price,
+                sales_price=sales_price,
+                sales_from=today - timedelta(days=1) if sales_price else None,
+                sales_to=today + timedelta(days=10) if sales_price else None,
+                received_amount=100,
+                count=100,
+                free_delivery=number % 2 == 0,
+                sorting_index=number % 5,
+                is_limited=number % 4 == 0,
+                is_sales=sales_price is not None,
+            )
+            for image_number in range(2):
+                ProductImage.objects.create(
+                    product=product,
+                    src=f"products/{product.id}_{image_number}.png",
+                    alt=f"{product.title} image {image_number}",
+                )
+            for tag in tags[:number % cls.total_tags + 1]:
+                ProductAndTag.objects.create(product=product, tag=tag)
+            for review_number in range(3):
+                ProductReview.objects.create(
+                    product=product,
+                    author=f"Author {review_number}",
+                    email=f"author{review_number}@example.com",
+                    text="Review text",
+                    rate=review_number + 1,
+                )
+            ProductAndSpecification.objects.create(
+                product=product, specification=specification,
+            )
+            product.refresh_from_db()
+            cls.products.append(product)
+
+    @classmethod
+    def create_orders(cls, total_orders: int) -> list[Order]:
+        """Create user's orders with three products each."""
+
+        status = OrderStatus.objects.get(name=ORDER_STATUSES["created"])
+        orders = []
+        for number in range(total_orders):
+            order = Order.objects.create(
+                created_by=cls.user,
+                products_cost=Decimal(300),
+                total_cost=Decimal(300),
+                status=status,
+            )
+            OrderAndProduct.bulk_add(
+                [
+                    {
+                        "product_id": product.id,
+                        "total_quantity": 1,
+                        "total_price": product.price,
+                    }
+                    for product in cls.products[number:number + 3]
+                ],
+                order.id,
+            )
+            orders.append(order)
+        return orders
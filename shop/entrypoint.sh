@@ -27,6 +27,27 @@ echo "Loading fixtures in DB..."
 python manage.py loaddata ./fixtures/my_shop.json
 
 
+# Rebuild denormalized data (signals and save() are skipped for fixtures)
+echo "Rebuilding category closure..."
+python manage.py rebuild_category_closure
+echo "Recounting product counters..."
+python manage.py recount_product_counters
+echo "Reconciling product ratings..."
+python manage.py reconcile_product_ratings
+echo "Recounting categories tags..."
+python manage.py recount_category_tags
+echo "Refreshing product final prices..."
+python manage.py refresh_final_prices
+echo "Rebuilding product popularity..."
+python manage.py rebuild_popularity
+echo "Rebuilding product search index..."
+python manage.py rebuild_search_index
+echo "Reconciling stock reservation counters..."
+python manage.py reconcile_stock
+echo "Warming up products cache..."
+python manage.py warm_products_cache
+
+
 # Starting NGINX, GUNICORN and Django app My_Shop
 echo "Starting My_Shop..."
 /usr/bin/supervisord -c /etc/supervisor/conf.d/supervisord.ini
\ No newline at end of file
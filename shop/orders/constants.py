@@ -11,3 +11,5 @@ ORDER_STATUSES = {
 ORDER_PAYMENT_CHANNEL = "order_payment_channel"
 CARD_NUMBER_LENGTH = 16
 CARD_CODE_LENGTH = 3
+BASKET_CACHE_TIMEOUT = 360
+BASKET_CACHE_TAG = "basket:{session_key}"
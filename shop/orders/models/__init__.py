@@ -1,4 +1,4 @@
-from .common import Product, Category
+from .common import Product, ProductSales, Category
 from .delivery_type import DeliveryType
 from .order import Order, OrderAndProduct
 from .order_status import OrderStatus
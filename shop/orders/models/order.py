@@ -1,13 +1,15 @@
 """App db model Order with intermediate table for Product."""
 
+from datetime import date
 from decimal import Decimal
 from typing import Optional
 
 from django.contrib.auth.models import User
 from django.db import models, transaction
 from django.db.models import QuerySet, F, Sum
+from django.utils import timezone
 
-from . import Product
+from . import Product, ProductSales
 from orders.exceptions import OrderException
 
 
@@ -58,15 +60,26 @@ class OrderAndProduct(models.Model):
     def custom_delete(self) -> None:
         """Delete instance in transaction with related objects updates.
 
-        Delete instance, update related Product and Order as per instance
-        details.
+        Delete instance, update related Product (remains and sold counter)
+        and Order as per instance details. Invalidate cached catalog pages
+        and reservation counter of product as remains are updated without
+        Product signals.
 
         """
+        from products.services import CatalogHandler
+        from products.services.stock_reservation import StockReservation
 
         with transaction.atomic():
             (
                 Product.objects.filter(id=self.product.id).
-                update(count=(F("count") + self.total_quantity))
+                update(
+                    count=(F("count") + self.total_quantity),
+                    total_sold=(F("total_sold") - self.total_quantity),
+                )
+            )
+            ProductSales.add_sold(
+                {self.product.id: -self.total_quantity},
+                self.order.get_created_date(),
             )
             (
                 Order.objects.filter(id=self.order.id).
@@ -77,6 +90,11 @@ class OrderAndProduct(models.Model):
             )
             self.delete()
 
+        CatalogHandler.invalidate_stock_cache(
+            {self.product.id: self.total_quantity},
+        )
+        StockReservation.forget([self.product.id])
+
     def custom_create(self) -> None:
         """Create instance in transaction with related objects updates.
 
@@ -97,7 +115,12 @@ class OrderAndProduct(models.Model):
                     f"purchase!"
                 )
             product.count -= self.total_quantity
+            product.total_sold += self.total_quantity
             product.save()
+            ProductSales.add_sold(
+                {product.id: self.total_quantity},
+                self.order.get_created_date(),
+            )
             (
                 Order.objects.filter(id=self.order.id).
                 update(
@@ -130,7 +153,12 @@ class OrderAndProduct(models.Model):
                     f"{product.count} '{product.title}' are available to purchase!"
                 )
             product.count -= extra_products_qnty
+            product.total_sold += extra_products_qnty
             product.save()
+            ProductSales.add_sold(
+                {product.id: extra_products_qnty},
+                self.order.get_created_date(),
+            )
             extra_products_price = self.total_price - previous_total_price
             (
                 Order.objects.filter(id=self.order.id).
@@ -196,21 +224,25 @@ class Order(models.Model):
 
         return f"Order id: {self.id} created by user: {self.created_by.id}"
 
+    def get_created_date(self) -> date:
+        """Get local date of order creation."""
+
+        return timezone.localdate(self.created_at)
+
     @classmethod
     def get_by_id_with_prefetch(cls, order_id: int) -> Optional["Order"]:
         """Get active order by id with prefetch related data."""
 
         return (
             cls.objects.
-            select_related("created_by", "created_by__profile").
-            prefetch_related(
-                "products",
-                "products__images",
-                "products__tags",
-                "products__reviews",
-                "products__specifications",
-                "orderandproduct_set",
+            select_related(
+                "created_by",
+                "created_by__profile",
+                "delivery_type",
+                "payment_type",
+                "status",
             ).
+            prefetch_related("orderandproduct_set").
             get(id=order_id, is_active=True)
         )
 
@@ -220,15 +252,14 @@ class Order(models.Model):
 
         return (
             cls.objects.
-            select_related("created_by", "created_by__profile").
-            prefetch_related(
-                "products",
-                "products__images",
-                "products__tags",
-                "products__reviews",
-                "products__specifications",
-                "orderandproduct_set",
+            select_related(
+                "created_by",
+                "created_by__profile",
+                "delivery_type",
+                "payment_type",
+                "status",
             ).
+            prefetch_related("orderandproduct_set").
             filter(created_by=user, is_active=True)
         )
 
@@ -1,4 +1,4 @@
-from .basket import BasketAddItemSerializer, BucketProductSerializer
+from .basket import BasketAddItemSerializer
 from .order import (
     OrderConfirmationSerializer,
     OrderedProductSerializer,
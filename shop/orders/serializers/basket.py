@@ -4,7 +4,6 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from orders.models import Product
-from products.serializers import OutSpecialProductSerializer
 
 
 class BasketAddItemSerializer(serializers.Serializer):
@@ -35,23 +34,3 @@ class BasketAddItemSerializer(serializers.Serializer):
             )
         return data
 
-
-class BucketProductSerializer(OutSpecialProductSerializer):
-    """Serializing db model 'Product' for basket."""
-
-    count = serializers.SerializerMethodField()
-
-    class Meta(OutSpecialProductSerializer.Meta):  # Inherit Meta class
-        fields = OutSpecialProductSerializer.Meta.fields
-
-    def get_count(self, obj: Product) -> int:
-        """Override model 'count' field.
-
-        Set user required quantity 'count' instead of product available
-        quantity 'count'.
-
-        """
-        if obj.required_amount <= obj.count:
-            return obj.required_amount
-        else:
-            return obj.count
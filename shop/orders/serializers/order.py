@@ -2,14 +2,14 @@
 
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Iterable, Optional
 
 from rest_framework import serializers
 
 from common.validators import validate_full_name, validate_phone_number
-from orders.models import Order, PaymentType, DeliveryType
+from orders.models import Order, PaymentType, DeliveryType, Product
 from orders.validators import validate_address, validate_city_name
-from products.serializers import OutSpecialProductSerializer
+from products.serializers import ProductCardSerializer
 
 
 allowed_payment_types = PaymentType.objects.values_list("name", flat=True)
@@ -241,19 +241,41 @@ class OutOrderSerializer(serializers.ModelSerializer):
         return None
 
     def get_products(self, obj: Order) -> list:
-        """Get ordered product."""
+        """Get ordered products with purchased total quantity.
 
-        products = obj.products.filter(is_active=True).all()
-        products_data = []
-        if not products:
-            return products_data
-        for i_product in products:
-            i_product_data = OutSpecialProductSerializer(i_product).data
-            # Override with product purchased total quantity
-            ordered_product = (
-                obj.orderandproduct_set.filter(product=i_product).first()
-            )
-            i_product_data["count"] = ordered_product.total_quantity
-            products_data.append(i_product_data)
+        Products cards are taken from context 'products_cards' if it is set
+        (see 'get_products_cards') else selected for current order.
+
+        """
+        products_cards = self.context.get("products_cards")
+        if products_cards is None:
+            products_cards = self.get_products_cards([obj])
 
+        products_data = []
+        for ordered_product in obj.orderandproduct_set.all():
+            product_data = products_cards.get(ordered_product.product_id)
+            if product_data:
+                # Override with product purchased total quantity
+                products_data.append(
+                    {**product_data, "count": ordered_product.total_quantity}
+                )
         return products_data
+
+    @staticmethod
+    def get_products_cards(orders: Iterable[Order]) -> dict[int, dict]:
+        """Get {product id: card} of active products for orders.
+
+        Orders 'orderandproduct_set' should be prefetched.
+
+        """
+        products_ids = {
+            ordered_product.product_id
+            for order in orders
+            for ordered_product in order.orderandproduct_set.all()
+        }
+        return {
+            product_data["id"]: product_data
+            for product_data in ProductCardSerializer.serialize(
+                Product.objects.filter(id__in=products_ids, is_active=True),
+            )
+        }
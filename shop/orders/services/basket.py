@@ -1,4 +1,5 @@
 from traceback import format_exc as tb_format_exc
+from typing import Optional
 
 from django.core.cache import cache
 from rest_framework.exceptions import ValidationError
@@ -10,21 +11,26 @@ from rest_framework.status import (
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
+from common.cache import SingleFlight, TaggedCache, build_cache_key
 from common.custom_logger import app_logger
 from common.utils import server_error
-from orders.serializers import BasketAddItemSerializer, BucketProductSerializer
+from orders.constants import BASKET_CACHE_TAG, BASKET_CACHE_TIMEOUT
+from orders.serializers import BasketAddItemSerializer
+from products.constants import PRODUCT_CACHE_TAG
 from products.models import Product
+from products.serializers import ProductCardSerializer
 
 
 class BasketHandler:
     """Class for handling business logic bucket related endpoints."""
 
+    _cache_key_prefix = "basket"
+
     @classmethod
     def add_product(cls, request: Request) -> Response:
         """Handle logic to add or increase quantity of product in bucket.
 
         Steps:
-        - remove cashed response
         - validate request body
         - add or increase quantity of product in bucket
         - cached succeed response
@@ -32,13 +38,14 @@ class BasketHandler:
 
         """
         try:
-            cache.delete(request.session.get("basket"))
             product = BasketAddItemSerializer(data=request.data)
             product.is_valid(raise_exception=True)
             cls._add_product_to_user(product.data, request)
+            cls.invalidate_basket_cache(request.session.session_key)
+            cache_key = cls._get_basket_cache_key(request)
             user_basket = cls._get_user_basket(request)
             response = (user_basket, HTTP_200_OK)
-            cache.set(request.session["basket"], response, 360)
+            cache.set(cache_key, response, BASKET_CACHE_TIMEOUT)
             return Response(*response)
         except ValidationError as exc:
             return Response({"error": str(exc)}, HTTP_400_BAD_REQUEST)
@@ -51,18 +58,17 @@ class BasketHandler:
         """Handle logic to get bucket products.
 
         Return cached response if found. Else get bucket products, cached
-        and return response.
+        and return response. Cache key is built from bucket content and
+        products versions, so equal buckets are computed once and cached
+        response is consistent with ETag of products versions.
 
         """
         try:
-            cached_response = cache.get(request.session.get("basket"))
-            if cached_response:
-                app_logger.debug(f"{cached_response=}")
-                return Response(*cached_response)
-
-            user_basket = cls._get_user_basket(request)
-            response = (user_basket, HTTP_200_OK)
-            cache.set(request.session["basket"], response, 360)
+            response = SingleFlight.get_or_set(
+                cls._get_basket_cache_key(request),
+                lambda: (cls._get_user_basket(request), HTTP_200_OK),
+                BASKET_CACHE_TIMEOUT,
+            )
             return Response(*response)
         except Exception:
             app_logger.error(tb_format_exc())
@@ -73,7 +79,6 @@ class BasketHandler:
         """Handle logic to remove or reduce quantity of product in bucket.
 
         Steps:
-        - remove cashed response
         - validate request body
         - remove or reduce quantity of product in bucket
         - cached succeed response
@@ -81,13 +86,14 @@ class BasketHandler:
 
         """
         try:
-            cache.delete(request.session.get("basket"))
             product = BasketAddItemSerializer(data=request.data)
             product.is_valid(raise_exception=True)
             cls._remove_product_from_user(product.data, request)
+            cls.invalidate_basket_cache(request.session.session_key)
+            cache_key = cls._get_basket_cache_key(request)
             user_basket = cls._get_user_basket(request)
             response = (user_basket, HTTP_200_OK)
-            cache.set(request.session["basket"], response, 360)
+            cache.set(cache_key, response, BASKET_CACHE_TIMEOUT)
             return Response(*response)
         except ValidationError as exc:
             return Response({"error": str(exc)}, HTTP_400_BAD_REQUEST)
@@ -95,6 +101,56 @@ class BasketHandler:
             app_logger.error(tb_format_exc())
             return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @classmethod
+    def get_basket_cache_tags(cls, request: Request) -> Optional[list[str]]:
+        """Get tags of bucket response (bucket and its products versions).
+
+        Return None if session is not created yet.
+
+        """
+        session_key = request.session.session_key
+        if not session_key:
+            return None
+
+        return [
+            BASKET_CACHE_TAG.format(session_key=session_key),
+            *cls._get_basket_products_tags(request),
+        ]
+
+    @staticmethod
+    def invalidate_basket_cache(session_key: Optional[str]) -> None:
+        """Change version of bucket in session after bucket is changed."""
+
+        if session_key:
+            TaggedCache.invalidate(
+                [BASKET_CACHE_TAG.format(session_key=session_key)]
+            )
+
+    @classmethod
+    def _get_basket_cache_key(cls, request: Request) -> str:
+        """Get cache key built from bucket content and its products versions.
+
+        Products versions are read before bucket products are selected, so
+        response of changed products is not cached under their new versions.
+
+        """
+        products_versions = TaggedCache.get_versions(
+            cls._get_basket_products_tags(request),
+        )
+        return build_cache_key(
+            cls._cache_key_prefix,
+            [request.session.get("basket") or {}, products_versions],
+        )
+
+    @staticmethod
+    def _get_basket_products_tags(request: Request) -> list[str]:
+        """Get tags of products in bucket."""
+
+        return [
+            PRODUCT_CACHE_TAG.format(id=product_id)
+            for product_id in request.session.get("basket") or {}
+        ]
+
     @staticmethod
     def _add_product_to_user(product_data: dict, request: Request) -> None:
         """Add or increase quantity of product in bucket(session)."""
@@ -142,13 +198,15 @@ class BasketHandler:
         products_ids = [
             int(product_id) for product_id in request.session["basket"].keys()
         ]
-        basket_products = (
-            Product.objects.prefetch_related("images", "tags", "reviews").
-            filter(id__in=products_ids, is_active=True)
+        basket_data = ProductCardSerializer.serialize(
+            Product.objects.filter(id__in=products_ids, is_active=True),
         )
-        for i_product in basket_products:
-            i_product.required_amount = (
-                request.session["basket"][str(i_product.id)]["count"]
+        for i_product_data in basket_data:
+            # Set user required quantity instead of available quantity
+            required_amount = (
+                request.session["basket"][str(i_product_data["id"])]["count"]
+            )
+            i_product_data["count"] = min(
+                required_amount, i_product_data["count"],
             )
-            basket_data.append(BucketProductSerializer(i_product).data)
         return basket_data
@@ -4,7 +4,7 @@ from typing import Optional
 from django.contrib.auth.models import User
 from django.contrib.sessions.backends.db import SessionStore
 from django.db import transaction
-from django.db.models import QuerySet
+from django.utils import timezone
 
 from rest_framework.exceptions import ValidationError
 
@@ -15,6 +15,7 @@ from rest_framework.status import (
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
+from .basket import BasketHandler
 from .common import DeliveryService
 from common.custom_logger import app_logger
 from common.utils import server_error
@@ -25,6 +26,7 @@ from orders.models import (
     OrderAndProduct,
     OrderStatus,
     Product,
+    ProductSales,
     PaymentType,
 )
 from orders.serializers import (
@@ -32,6 +34,8 @@ from orders.serializers import (
     OrderedProductSerializer,
     OutOrderSerializer,
 )
+from products.services import CatalogHandler
+from products.services.stock_reservation import StockReservation
 
 empty_order_error = {"error": "Order should include at least 1 Product!"}
 unavailable_products_error = "Following products are not available: {products}"
@@ -66,11 +70,19 @@ class OrderHandler:
         """Handle logic to get user's active orders."""
 
         try:
-            orders = (
+            orders = list(
                 Order.get_user_orders_with_prefetch(user).
                 order_by("-created_at")
             )
-            orders_data = OutOrderSerializer(orders, many=True).data
+            orders_data = OutOrderSerializer(
+                orders,
+                many=True,
+                context={
+                    "products_cards": (
+                        OutOrderSerializer.get_products_cards(orders)
+                    ),
+                },
+            ).data
             return Response(orders_data, HTTP_200_OK)
         except Exception:
             app_logger.error(tb_format_exc())
@@ -82,38 +94,65 @@ class OrderHandler:
     ) -> Response:
         """Handle logic for creating 'init' order.
 
-        If request body is valid then check and reduce stock products quantity
-        (lock ordered products in db while updating them), create order with
-        status "Created" and clean basket.  Return corresponding response.
+        If request body is valid then reserve ordered quantities (if cache
+        is Redis), create order with status "Created", reduce stock products
+        quantity by one conditional update and clean basket. Stock update is
+        run after order is created, so ordered products rows are locked only
+        for inserts of order products and sold quantities which follow it
+        (they are not inserted before update as insert of rows referencing
+        products takes shared locks of products rows and concurrent orders
+        would deadlock on update). Reservation is confirmed if order is
+        created and released otherwise. Return corresponding response.
 
         """
 
         try:
             order_data = cls._get_init_order_data(order_details)
-            products_ids = list(order_data["products"].keys())
-            with transaction.atomic():
-                stock_products = Product.select_available_products(
-                    products_ids
-                )
-                if len(order_data["products"]) != stock_products.count():
-                    cls._raise_unavailable_products_error(products_ids)
-
-                order = Order.objects.create(
-                    created_by=user,
-                    products_cost=order_data["cost"],
-                    total_cost=order_data["cost"],
-                    status=OrderStatus.objects.get(name="created"),
-                )
-                cls._reduce_stock_products(
-                    stock_products, order_data["products"]
-                )
-                OrderAndProduct.bulk_add(
-                    order_data["products"].values(), order.id
+            products_quantities = {
+                product_id: ordered_product["total_quantity"]
+                for product_id, ordered_product
+                in order_data["products"].items()
+            }
+            reservation_token, reserved_shortages = (
+                StockReservation.reserve(products_quantities)
+            )
+            if reserved_shortages:
+                cls._raise_products_shortages_error(
+                    Product.get_stock_shortages(
+                        products_quantities, reserved_shortages,
+                    ),
+                    products_quantities,
                 )
+
+            try:
+                status = OrderStatus.objects.get(name="created")
+                with transaction.atomic():
+                    order = Order.objects.create(
+                        created_by=user,
+                        products_cost=order_data["cost"],
+                        total_cost=order_data["cost"],
+                        status=status,
+                    )
+                    cls._reduce_stock_products(products_quantities)
+                    OrderAndProduct.bulk_add(
+                        order_data["products"].values(), order.id
+                    )
+                    ProductSales.add_sold(
+                        products_quantities, timezone.localdate(),
+                    )
+            except Exception:
+                StockReservation.release(reservation_token)
+                raise
+
+            StockReservation.confirm(reservation_token)
+            CatalogHandler.invalidate_stock_cache(products_quantities)
             session.pop("basket", None)
+            BasketHandler.invalidate_basket_cache(session.session_key)
             return Response({"orderId": order.id}, HTTP_200_OK)
         except ValidationError as exc:
             return Response({"error": str(exc)}, HTTP_400_BAD_REQUEST)
+        except OrderException as exc:
+            return Response({"error": exc.message}, HTTP_400_BAD_REQUEST)
         except Exception:
             app_logger.error(tb_format_exc())
             return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
@@ -203,31 +242,43 @@ class OrderHandler:
 
         return {"products": products, "cost": order_cost}
 
-    @staticmethod
-    def _raise_unavailable_products_error(products_ids: list[int]) -> None:
-        """Raise error if product in order is not available in stock."""
+    @classmethod
+    def _reduce_stock_products(cls, products_quantities: dict) -> None:
+        """Reduce stock products quantity according to ordered quantity.
 
-        unavailable_products = Product.get_unavailable_products(products_ids)
-        products_titles = unavailable_products.values_list("title", flat=True)
-        raise OrderException(
-            unavailable_products_error.format(products=products_titles)
-        )
+        Increase products sold counter by the same quantity. Raise error
+        with every product which is not available or short of quantity.
+
+        """
+        products_shortages = Product.reduce_stock(products_quantities)
+        if products_shortages:
+            cls._raise_products_shortages_error(
+                products_shortages, products_quantities,
+            )
 
     @staticmethod
-    def _reduce_stock_products(
-        stock_products: QuerySet, ordered_products: dict,
+    def _raise_products_shortages_error(
+        products_shortages: list[dict], products_quantities: dict,
     ) -> None:
-        """Reduce stock products quantity according to ordered quantity."""
-
-        for stock_product in stock_products:
-            ordered_product = ordered_products[stock_product.id]
-            if stock_product.count < ordered_product["total_quantity"]:
-                raise OrderException(purchased_qnty_error.format(
-                    available_qnty=stock_product.count,
-                    title=stock_product.title,
-                    purchased_qnty=ordered_product["total_quantity"],
-                    )
-                )
-
-            stock_product.count -= ordered_product["total_quantity"]
-            stock_product.save()
+        """Raise error with every product which is short of quantity."""
+
+        unavailable_titles = [
+            product["title"] or product["id"]
+            for product in products_shortages
+            if product["count"] <= 0
+        ]
+        errors = [
+            purchased_qnty_error.format(
+                available_qnty=product["count"],
+                title=product["title"],
+                purchased_qnty=products_quantities[product["id"]],
+            )
+            for product in products_shortages
+            if product["count"] > 0
+        ]
+        if unavailable_titles:
+            errors.insert(
+                0,
+                unavailable_products_error.format(products=unavailable_titles),
+            )
+        raise OrderException(" ".join(errors))
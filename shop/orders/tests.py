@@ -1,3 +1,289 @@
-from django.test import TestCase
+"""Budgets of SQL queries and cache round trips for 'Orders' endpoints.
 
-# Create your tests here.
+Run with SHOP_TESTING=True (SQLite and local memory cache).
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps as json_dumps
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from common.testing import QueryBudgetTestCase
+from orders.models import Order, Product
+from products.constants import STOCK_RESERVATIONS_KEY
+from products.services.stock_reservation import StockReservation
+
+
+class OrdersQueryBudgetTest(QueryBudgetTestCase):
+    """Check that basket and orders endpoints cost fixed number of queries.
+
+    Session and savepoints queries are included in budgets.
+
+    """
+
+    def _fill_basket(self, total_products: int) -> None:
+        """Add products to basket of client session."""
+
+        for product in self.products[:total_products]:
+            self.client.post(
+                reverse("orders:basket_crud"),
+                json_dumps({"id": product.id, "count": 1}),
+                content_type="application/json",
+            )
+
+    def test_basket(self) -> None:
+        url = reverse("orders:basket_crud")
+        self.request_with_budget("get", url, 4, 7)
+        self.request_with_budget(
+            "post", url, 11, 3, {"id": self.products[0].id, "count": 2},
+        )
+        self.request_with_budget("get", url, 4, 9)
+        self.request_with_budget("get", url, 1, 3, clear_cache=False)
+        self.request_with_budget(
+            "delete", url, 8, 3, {"id": self.products[0].id, "count": 1},
+        )
+
+    def test_basket_refreshed_with_products(self) -> None:
+        url = reverse("orders:basket_crud")
+        self._fill_basket(1)
+        self.request_with_budget("get", url, 4, 9)
+        product = Product.objects.get(id=self.products[0].id)
+        product.title = "Renamed product"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response, _, _ = self.request_with_budget(
+            "get", url, 4, 9, clear_cache=False,
+        )
+        self.assertEqual(response.json()[0]["title"], "Renamed product")
+
+    def test_basket_independent_of_products_total(self) -> None:
+        url = reverse("orders:basket_crud")
+        self._fill_basket(2)
+        _, small_basket_queries, small_basket_cache_calls = (
+            self.request_with_budget("get", url, 4, 9)
+        )
+        self._fill_basket(8)
+        _, big_basket_queries, big_basket_cache_calls = (
+            self.request_with_budget("get", url, 4, 9)
+        )
+        self.assertEqual(small_basket_queries, big_basket_queries)
+        self.assertEqual(small_basket_cache_calls, big_basket_cache_calls)
+
+    def test_orders(self) -> None:
+        self.client.force_login(self.user)
+        url = reverse("orders:order_create_or_get_orders")
+        self.create_orders(1)
+        _, one_order_queries, _ = self.request_with_budget("get", url, 7, 0)
+        self.create_orders(5)
+        _, many_orders_queries, _ = self.request_with_budget("get", url, 7, 0)
+        self.assertEqual(one_order_queries, many_orders_queries)
+
+    def test_order(self) -> None:
+        self.client.force_login(self.user)
+        order = self.create_orders(1)[0]
+        self.request_with_budget(
+            "get",
+            reverse("orders:order_update_or_get", kwargs={"id": order.id}),
+            7,
+            0,
+        )
+
+    def test_create_order(self) -> None:
+        self.client.force_login(self.user)
+        self._fill_basket(2)
+        self.request_with_budget(
+            "post",
+            reverse("orders:order_create_or_get_orders"),
+            19,
+            0,
+            [
+                {"id": product.id, "price": str(product.price), "count": 1}
+                for product in self.products[:2]
+            ],
+        )
+
+    def test_create_order_with_shortage(self) -> None:
+        self.client.force_login(self.user)
+        products = self.products[:3]
+        stock_before = list(
+            Product.objects.
+            filter(id__in=[product.id for product in products]).
+            order_by("id").
+            values_list("id", "count", "total_sold")
+        )
+        response, _, _ = self.request_with_budget(
+            "post",
+            reverse("orders:order_create_or_get_orders"),
+            12,
+            0,
+            [
+                {
+                    "id": product.id,
+                    "price": str(product.price),
+                    "count": product.count + number % 2,
+                }
+                for number, product in enumerate(products)
+            ],
+            expected_status=400,
+        )
+        self.assertIn(products[1].title, response.data["error"])
+        self.assertNotIn(products[0].title, response.data["error"])
+        self.assertEqual(
+            list(
+                Product.objects.
+                filter(id__in=[product.id for product in products]).
+                order_by("id").
+                values_list("id", "count", "total_sold")
+            ),
+            stock_before,
+        )
+        self.assertFalse(Order.objects.exists())
+
+    def test_reduce_stock_with_shortage(self) -> None:
+        products = self.products[:3]
+        products_ids = [product.id for product in products]
+        stock_before = list(
+            Product.objects.
+            filter(id__in=products_ids).
+            order_by("id").
+            values_list("id", "count", "total_sold")
+        )
+        products_shortages = Product.reduce_stock(
+            {
+                product.id: product.count + number % 2
+                for number, product in enumerate(products)
+            }
+        )
+        self.assertEqual(
+            products_shortages,
+            [
+                {
+                    "id": products[1].id,
+                    "title": products[1].title,
+                    "count": products[1].count,
+                },
+            ],
+        )
+        self.assertEqual(
+            list(
+                Product.objects.
+                filter(id__in=products_ids).
+                order_by("id").
+                values_list("id", "count", "total_sold")
+            ),
+            stock_before,
+        )
+
+    def test_confirm_order(self) -> None:
+        self.client.force_login(self.user)
+        order = self.create_orders(1)[0]
+        self.request_with_budget(
+            "post",
+            reverse("orders:order_update_or_get", kwargs={"id": order.id}),
+            11,
+            0,
+            {
+                "fullName": "Buyer Name",
+                "email": "buyer@example.com",
+                "phone": "+79876543210",
+                "paymentType": "online",
+                "city": "Moscow",
+                "address": "Red square, 1",
+                "deliveryType": "ordinary",
+            },
+        )
+
+    @patch("orders.services.payment.conduct_order_payment")
+    def test_pay_order(self, conduct_order_payment) -> None:
+        self.client.force_login(self.user)
+        order = self.create_orders(1)[0]
+        self.request_with_budget(
+            "post",
+            reverse("orders:payment", kwargs={"id": order.id}),
+            5,
+            0,
+            {
+                "number": "1234567812345678",
+                "name": "Buyer Name",
+                "month": 1,
+                "year": 99,
+                "code": "123",
+            },
+        )
+        conduct_order_payment.delay.assert_called_once()
+
+
+@skipIf(
+    StockReservation._get_redis() is None,
+    "Redis cache is required for stock reservation",
+)
+class StockReservationTest(QueryBudgetTestCase):
+    """Check reservation of products stock in Redis for checkout."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.redis = StockReservation._get_redis()
+        self.product = self.products[0]
+        self.counter_key = StockReservation._get_counter_key(self.product.id)
+        self.redis.delete(
+            self.counter_key, cache.make_key(STOCK_RESERVATIONS_KEY),
+        )
+
+    def test_concurrent_reservations(self) -> None:
+        Product.objects.filter(id=self.product.id).update(count=5)
+        StockReservation._create_counters(self.redis, [self.product.id])
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            reservations = list(
+                executor.map(
+                    lambda _: StockReservation.reserve({self.product.id: 1}),
+                    range(10),
+                )
+            )
+
+        tokens = [token for token, _ in reservations if token is not None]
+        shortages = [shortages for _, shortages in reservations if shortages]
+        self.assertEqual(len(tokens), 5)
+        self.assertEqual(shortages, [{self.product.id: 0}] * 5)
+        self.assertEqual(int(self.redis.get(self.counter_key)), 0)
+
+        for token in tokens:
+            StockReservation.release(token)
+        self.assertEqual(int(self.redis.get(self.counter_key)), 5)
+
+    def test_release_reservation_of_failed_order(self) -> None:
+        self.client.force_login(self.user)
+        StockReservation._create_counters(self.redis, [self.product.id])
+        Product.objects.filter(id=self.product.id).update(count=1)
+
+        response = self.client.post(
+            reverse("orders:order_create_or_get_orders"),
+            json_dumps(
+                [
+                    {
+                        "id": self.product.id,
+                        "price": str(self.product.price),
+                        "count": 2,
+                    },
+                ],
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            int(self.redis.get(self.counter_key)), self.product.count,
+        )
+        self.assertEqual(
+            self.redis.zcard(cache.make_key(STOCK_RESERVATIONS_KEY)), 0,
+        )
+        self.assertEqual(
+            Product.objects.values_list("count", flat=True).get(
+                id=self.product.id,
+            ),
+            1,
+        )
+        self.assertFalse(Order.objects.exists())
@@ -6,10 +6,12 @@ from rest_framework.response import Response
 from rest_framework.request import Request
 
 from .services import BasketHandler, OrderHandler, PaymentHandler
+from common.cache import conditional_by_versions
 
 
 class BasketView(APIView):
 
+    @conditional_by_versions(BasketHandler.get_basket_cache_tags)
     def get(self, request: Request) -> Response:
         """Get products from user's bucket."""
 
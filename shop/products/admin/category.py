@@ -17,8 +17,49 @@ from products.forms import (
     CategoryImageForm,
 )
 
-from products.models import Category, CategoryImage
-from products.services import category_max_nesting_level
+from products.models import Category, CategoryImage, CategoryTag
+from products.services import (
+    CatalogHandler,
+    CategoryHandler,
+    category_max_nesting_level,
+)
+from products.services.category_tags import CategoryTagsMap
+
+
+@admin.action(description="Archive items")
+def archive_categories(
+        self, request: HttpRequest, queryset: QuerySet,
+) -> None:
+    """Archive categories and invalidate cached responses with them.
+
+    Categories are updated by query set (without signals), so tags of
+    categories and their ancestors are recounted here.
+
+    """
+    categories_ids = list(queryset.values_list("id", flat=True))
+    archive_items(self, request, queryset)
+    CategoryTag.recount_ancestors(categories_ids)
+    CategoryTagsMap.invalidate()
+    CatalogHandler.invalidate_categories_cache(categories_ids)
+    CategoryHandler.invalidate_categories_tree_cache()
+
+
+@admin.action(description="Restore items")
+def restore_categories(
+        self, request: HttpRequest, queryset: QuerySet,
+) -> None:
+    """Restore categories and invalidate cached responses with them.
+
+    Categories are updated by query set (without signals), so tags of
+    categories and their ancestors are recounted here.
+
+    """
+    categories_ids = list(queryset.values_list("id", flat=True))
+    restore_items(self, request, queryset)
+    CategoryTag.recount_ancestors(categories_ids)
+    CategoryTagsMap.invalidate()
+    CatalogHandler.invalidate_categories_cache(categories_ids)
+    CategoryHandler.invalidate_categories_tree_cache()
 
 
 class SubcategoryInline(admin.StackedInline):
@@ -81,7 +122,7 @@ class SubcategoryInline(admin.StackedInline):
 class CategoryAdmin(admin.ModelAdmin):
     """Model admin class for 'Category' model."""
 
-    actions = (archive_items, restore_items)
+    actions = (archive_categories, restore_categories)
     list_max_show_all = 20
     inlines = (SubcategoryInline,)
     form = CategoryForm
@@ -133,7 +174,7 @@ class CategoryAdmin(admin.ModelAdmin):
     def delete_queryset(self, request: HttpRequest, queryset:QuerySet) -> None:
         """Override method. Instances are archived instead of deletion."""
 
-        queryset.update(is_active=False)
+        archive_categories(self, request, queryset)
 
     def formfield_for_foreignkey(
             self, db_field: ForeignKey, request: HttpRequest, **kwargs,
@@ -1,7 +1,7 @@
 """Admin models for products."""
 
 from django.contrib import admin
-from django.db.models import QuerySet, Sum
+from django.db.models import QuerySet
 from django.http import HttpRequest
 
 from common.admin import archive_items, restore_items
@@ -19,6 +19,31 @@ from products.models import (
     ProductTag,
     ProductAndTag,
 )
+from products.services import CatalogHandler
+
+
+@admin.action(description="Archive items")
+def archive_products(
+        self, request: HttpRequest, queryset: QuerySet,
+) -> None:
+    """Archive products and invalidate cached responses with them."""
+
+    archive_items(self, request, queryset)
+    CatalogHandler.invalidate_products_categories_cache(
+        list(queryset.values_list("id", flat=True))
+    )
+
+
+@admin.action(description="Restore items")
+def restore_products(
+        self, request: HttpRequest, queryset: QuerySet,
+) -> None:
+    """Restore products and invalidate cached responses with them."""
+
+    restore_items(self, request, queryset)
+    CatalogHandler.invalidate_products_categories_cache(
+        list(queryset.values_list("id", flat=True))
+    )
 
 
 class ProductImageInline(admin.StackedInline):
@@ -73,7 +98,7 @@ class ProductSpecificationInline(admin.StackedInline):
 class ProductAdmin(admin.ModelAdmin):
     """Model admin class for 'Product' model."""
 
-    actions = (archive_items, restore_items)
+    actions = (archive_products, restore_products)
     list_max_show_all = 20
     form = ProductForm
     inlines = [
@@ -144,7 +169,7 @@ class ProductAdmin(admin.ModelAdmin):
     def delete_queryset(self, request: HttpRequest, queryset:QuerySet) -> None:
         """Override method. Instances are archived instead of deletion."""
 
-        queryset.update(is_active=False)
+        archive_products(self, request, queryset)
 
     def delete_model(self, request: HttpRequest, obj: Product) -> None:
         """Override method. Instance is archived instead of deletion."""
@@ -170,12 +195,8 @@ class ProductAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
     def get_sold_products(self, obj: Product) -> int:
-        """Get parent category."""
+        """Get total sold products."""
 
-        return (
-            obj.orderandproduct_set.
-            aggregate(total_sailed=Sum("total_quantity"))
-            ["total_sailed"]
-        )
+        return obj.total_sold
 
     get_sold_products.short_description = "Sold products"
@@ -1,3 +1,33 @@
 """Module with constants for app 'Orders'."""
 
 DEFAULT_PAGINATION_LIMIT = 20
+
+CATALOG_CACHE_TIMEOUT = 600
+CATALOG_CACHE_STALE_TIMEOUT = 300
+CATEGORIES_CACHE_TIMEOUT = 86400
+SALES_CACHE_TIMEOUT = 21600
+PRODUCTS_CACHE_TIMEOUT = 600
+PRODUCTS_CACHE_STALE_TIMEOUT = 300
+CATALOG_COUNT_CACHE_TIMEOUT = 3600
+CATALOG_COUNT_CAP = 10000
+CATALOG_FACETS_PRICE_BUCKETS = (0, 100, 500, 1000, 5000, 10000)
+PRODUCT_CACHE_TAG = "product:{id}"
+CATEGORY_CACHE_TAG = "category:{id}"
+ALL_CATEGORIES_CACHE_TAG = "category:all"
+CATEGORIES_TREE_CACHE_TAG = "category:tree"
+POPULAR_CACHE_TAG = "popular"
+CATALOG_INDEX_VERSION_KEY = "catalog_index:version"
+CATALOG_INDEX_CHANGES_KEY = "catalog_index:changes:{version}"
+CATALOG_INDEX_CHANGES_TIMEOUT = 86400
+BANNER_POOL_KEY = "banner_pool:ids"
+BANNER_POOL_BUILT_KEY = "banner_pool:built"
+POPULARITY_WINDOW_DAYS = 7
+SALES_FEED_KEY = "sales_feed"
+SALES_FEED_CACHE_TAG = "sales_feed"
+CATEGORY_TAGS_KEY = "category_tags"
+CATEGORY_TAGS_CACHE_TIMEOUT = 86400
+STOCK_COUNTER_KEY = "stock:{id}"
+STOCK_RESERVATION_KEY = "stock_reservation:{token}"
+STOCK_RESERVATIONS_KEY = "stock_reservations"
+STOCK_RESERVATION_TIMEOUT = 300
+MAX_REVIEWS_LIMIT = 100
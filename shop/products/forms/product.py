@@ -5,7 +5,6 @@ from typing import Optional
 
 from django import forms
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
 from rest_framework.fields import ImageField
 
 from common.validators import validate_image_src
@@ -125,12 +124,7 @@ class ProductForm(forms.ModelForm):
                 "Remains amount 'count' can not be more that received amount."
             )
 
-        sold_amount = (
-            self.instance.orderandproduct_set.
-            aggregate(total_sailed=Sum("total_quantity"))
-        )
-        sold_amount = sold_amount["total_sailed"] or 0
-        if count > (received_amount - sold_amount):
+        if count > (received_amount - self.instance.total_sold):
             raise ValidationError(
                 "Summ of 'count'(remains) and 'sold' products can not be more "
                 "then received amount!."
@@ -0,0 +1,157 @@
+"""Command to compare catalog columnar index with ORM catalog queries."""
+
+from random import Random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.models import Category, Product, ProductAndTag, ProductTag
+from products.services.catalog import CatalogHandler
+from products.services.common import apply_pagination_to_qs
+from products.services.product_index import ProductColumnarIndex, np
+
+benchmark_batch_size = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark catalog index against ORM on generated products. "
+        "Products are created in transaction which is rolled back."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10000, 100000, 1000000],
+            help="Total products for benchmark runs",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Repeats of every catalog query",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Generate products up to every size and measure catalog queries."""
+
+        if np is None:
+            raise CommandError("NumPy is required for catalog index")
+
+        with transaction.atomic():
+            category = Category.objects.filter(is_active=True).first()
+            if not category:
+                raise CommandError("Active category is required for benchmark")
+
+            tags_ids = list(ProductTag.objects.values_list("id", flat=True))
+            queries = self._get_queries(category.id, tags_ids)
+            generator = Random(0)
+            for size in sorted(options["sizes"]):
+                self._create_products(size, category.id, tags_ids, generator)
+                self._report(size, queries, options["repeat"])
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _get_queries(category_id: int, tags_ids: list[int]) -> list[dict]:
+        """Get validated catalog query params for benchmark."""
+
+        def get_query(**params) -> dict:
+            query = {
+                "category_id": None,
+                "filters": {},
+                "search": None,
+                "tags": [],
+                "sort": "-created_date",
+                "pagination": {"current_page": 1, "limit": 20, "cursor": None},
+                "facets": False,
+            }
+            query.update(params)
+            return query
+
+        return [
+            get_query(),
+            get_query(category_id=category_id, sort="final_price"),
+            get_query(
+                filters={"count__gte": 1, "final_price__lte": 500},
+                sort="-rating",
+            ),
+            get_query(
+                tags=tags_ids[:2],
+                filters={"free_delivery": True},
+                sort="-review_count",
+                pagination={"current_page": 50, "limit": 20, "cursor": None},
+            ),
+        ]
+
+    @staticmethod
+    def _create_products(
+            size: int,
+            category_id: int,
+            tags_ids: list[int],
+            generator: Random,
+    ) -> None:
+        """Create products with random values until total is size."""
+
+        total_products = Product.objects.count()
+        while total_products < size:
+            batch_size = min(benchmark_batch_size, size - total_products)
+            products = []
+            for number in range(total_products, total_products + batch_size):
+                price = generator.randint(1, 10000)
+                products.append(Product(
+                    title=f"Benchmark product {number}",
+                    category_id=category_id,
+                    price=price,
+                    final_price=price,
+                    received_amount=100,
+                    count=generator.randint(0, 100),
+                    free_delivery=generator.random() < 0.3,
+                    rating=generator.randint(1, 50) / 10,
+                    review_count=generator.randint(0, 500),
+                ))
+            products = Product.objects.bulk_create(products)
+            if tags_ids:
+                ProductAndTag.objects.bulk_create(
+                    ProductAndTag(
+                        product_id=product.id,
+                        tag_id=generator.choice(tags_ids),
+                    )
+                    for product in products
+                )
+            total_products += batch_size
+
+    def _report(self, size: int, queries: list[dict], repeat: int) -> None:
+        """Measure ORM and index catalog queries and write results."""
+
+        started = perf_counter()
+        for _ in range(repeat):
+            for query in queries:
+                catalog_qs = CatalogHandler._add_sort_to_qs(
+                    CatalogHandler._get_filtered_qs(query), query["sort"],
+                ).prefetch_related(None)
+                list(apply_pagination_to_qs(
+                    catalog_qs.values_list("id", flat=True),
+                    query["pagination"]["current_page"],
+                    query["pagination"]["limit"],
+                ))
+                catalog_qs.order_by().count()
+        orm_time = (perf_counter() - started) / (repeat * len(queries))
+
+        index = ProductColumnarIndex()
+        started = perf_counter()
+        index.build()
+        build_time = perf_counter() - started
+        started = perf_counter()
+        for _ in range(repeat):
+            for query in queries:
+                index.search(query)
+        index_time = (perf_counter() - started) / (repeat * len(queries))
+
+        self.stdout.write(
+            f"{size} products: ORM {orm_time * 1000:.2f} ms/query, "
+            f"index {index_time * 1000:.2f} ms/query, "
+            f"index build {build_time:.2f} s"
+        )
@@ -0,0 +1,23 @@
+"""Command to rebuild closure table of categories tree."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.models import CategoryClosure
+
+
+class Command(BaseCommand):
+    help = "Rebuild CategoryClosure rows from Category parents."
+
+    def handle(self, *args, **options) -> None:
+        """Rebuild closure rows for all categories."""
+
+        total_categories = CategoryClosure.rebuild()
+        app_logger.info(
+            f"Category closure is rebuilt for {total_categories=}"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Category closure is rebuilt for {total_categories}",
+            )
+        )
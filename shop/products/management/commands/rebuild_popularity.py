@@ -0,0 +1,25 @@
+"""Command to rebuild daily sales rollup and Product popularity."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.models import ProductSales
+from products.services.catalog import CatalogHandler
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild ProductSales from orders and recount Product 'popularity'."
+    )
+
+    def handle(self, *args, **options) -> None:
+        """Rebuild sales rollup for popularity window."""
+
+        products_ids = ProductSales.rebuild()
+        CatalogHandler.invalidate_popularity_cache(products_ids)
+        app_logger.info(f"Popularity is changed for {len(products_ids)=}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Popularity is changed for {len(products_ids)} products",
+            )
+        )
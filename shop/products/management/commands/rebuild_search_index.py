@@ -0,0 +1,19 @@
+"""Command to rebuild full-text search documents of products."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.services.search import ProductSearch
+
+
+class Command(BaseCommand):
+    help = "Rebuild Product search documents used by catalog search."
+
+    def handle(self, *args, **options) -> None:
+        """Rebuild search documents of all products by batches."""
+
+        total_products = ProductSearch.rebuild()
+        app_logger.info(f"Search index is rebuilt for {total_products=}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Search index is rebuilt for {total_products}")
+        )
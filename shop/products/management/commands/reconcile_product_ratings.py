@@ -0,0 +1,24 @@
+"""Command to repair drift of materialized Product rating."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount Product 'rating', 'rating_sum' and 'review_count' from "
+        "reviews where they drifted."
+    )
+
+    def handle(self, *args, **options) -> None:
+        """Recount rating of products with drifted counters."""
+
+        total_products = Product.recount_ratings()
+        app_logger.info(f"Rating is reconciled for {total_products=}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rating is reconciled for {total_products} products",
+            )
+        )
@@ -0,0 +1,24 @@
+"""Command to sync stock reservation counters with Product 'count'."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.services.stock_reservation import StockReservation
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync stock reservation counters in Redis with Product 'count' "
+        "less active reservations."
+    )
+
+    def handle(self, *args, **options) -> None:
+        """Reconcile stock reservation counters."""
+
+        total_products = StockReservation.reconcile()
+        app_logger.info(f"Stock is reconciled for {total_products=}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stock is reconciled for {total_products} products",
+            )
+        )
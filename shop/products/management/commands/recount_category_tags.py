@@ -0,0 +1,19 @@
+"""Command to rebuild materialized categories tags."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.models import CategoryTag
+
+
+class Command(BaseCommand):
+    help = "Recount CategoryTag (tags of categories) from products tags."
+
+    def handle(self, *args, **options) -> None:
+        """Recount tags of all categories."""
+
+        total_rows = CategoryTag.recount()
+        app_logger.info(f"Categories tags are recounted: {total_rows=}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Categories tags are recounted: {total_rows}")
+        )
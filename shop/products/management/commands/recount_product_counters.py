@@ -0,0 +1,19 @@
+"""Command to rebuild denormalized Product counters."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recount Product 'total_sold' and 'review_count' from scratch."
+
+    def handle(self, *args, **options) -> None:
+        """Recount counters for all products in one UPDATE query."""
+
+        total_products = Product.recount_counters()
+        app_logger.info(f"Counters are recounted for {total_products=}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Counters are recounted for {total_products}")
+        )
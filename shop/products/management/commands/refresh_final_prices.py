@@ -0,0 +1,21 @@
+"""Command to recount materialized Product final price."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recount Product 'final_price' as per current sales windows."
+
+    def handle(self, *args, **options) -> None:
+        """Update final price of products where it is outdated."""
+
+        total_products = len(Product.refresh_final_prices())
+        app_logger.info(f"Final price is refreshed for {total_products=}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Final price is refreshed for {total_products}",
+            )
+        )
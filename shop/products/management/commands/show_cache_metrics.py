@@ -0,0 +1,32 @@
+"""Command to show metrics of single-flight cache recomputes."""
+
+from django.core.management.base import BaseCommand
+
+from common.cache import SingleFlight
+
+default_cache_names = [
+    "catalog", "category_tree", "sales", "basket", "product",
+]
+
+
+class Command(BaseCommand):
+    help = "Show computed, collapsed and timed out cache recomputes."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "names",
+            nargs="*",
+            default=default_cache_names,
+            help="Cache keys prefixes",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Write metrics counters per cache key prefix."""
+
+        metrics = SingleFlight.get_metrics(options["names"])
+        for name, counters in metrics.items():
+            self.stdout.write(
+                f"{name}: " + ", ".join(
+                    f"{event}={counter}" for event, counter in counters.items()
+                )
+            )
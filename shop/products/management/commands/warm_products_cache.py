@@ -0,0 +1,31 @@
+"""Command to cache details of top popular products."""
+
+from django.core.management.base import BaseCommand
+
+from common.custom_logger import app_logger
+from products.services import ProductHandler
+
+default_total_products = 100
+
+
+class Command(BaseCommand):
+    help = "Cache rendered details of top N popular products after deploy."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--total",
+            type=int,
+            default=default_total_products,
+            help="Total products to cache",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Render and cache details of top popular products."""
+
+        total_products = ProductHandler.warm_products_cache(options["total"])
+        app_logger.info(f"Products details are cached for {total_products=}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Products details are cached for {total_products} products",
+            )
+        )
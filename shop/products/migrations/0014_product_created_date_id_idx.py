@@ -0,0 +1,20 @@
+# Generated by Django 5.1 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0013_alter_product_full_description"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["created_date", "id"],
+                name="product_created_date_id_idx",
+            ),
+        ),
+    ]
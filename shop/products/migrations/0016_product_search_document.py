@@ -0,0 +1,47 @@
+# Generated by Django 5.1 on 2026-10-17 12:20
+
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+
+sql_create_fulltext_index = (
+    "CREATE FULLTEXT INDEX product_search_document_ft "
+    "ON products_product (search_document)"
+)
+sql_drop_fulltext_index = (
+    "DROP INDEX product_search_document_ft ON products_product"
+)
+
+
+def create_fulltext_index(
+    apps: StateApps, schema_editor: BaseDatabaseSchemaEditor,
+) -> None:
+    """Create FULLTEXT index for MySQL only."""
+
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(sql_create_fulltext_index)
+
+
+def drop_fulltext_index(
+    apps: StateApps, schema_editor: BaseDatabaseSchemaEditor,
+) -> None:
+    """Drop FULLTEXT index for MySQL only."""
+
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(sql_drop_fulltext_index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0015_product_total_sold_product_review_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_document",
+            field=models.TextField(default="", editable=False),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1 on 2026-10-17 14:20
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def populate_final_price(apps, schema_editor) -> None:
+    """Set final price as sales price for products on sales else price."""
+
+    product_model = apps.get_model("products", "Product")
+    today_date = date.today()
+    on_sales_filter = (
+        Q(is_sales=True) &
+        Q(sales_price__isnull=False) &
+        (Q(sales_from__isnull=True) | Q(sales_from__lte=today_date)) &
+        (Q(sales_to__isnull=True) | Q(sales_to__gte=today_date))
+    )
+    product_model.objects.filter(on_sales_filter).update(
+        final_price=F("sales_price"),
+    )
+    product_model.objects.exclude(on_sales_filter).update(
+        final_price=F("price"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0016_product_search_document"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="final_price",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=12,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["final_price", "id"],
+                name="product_final_price_id_idx",
+            ),
+        ),
+        migrations.RunPython(populate_final_price, migrations.RunPython.noop),
+    ]
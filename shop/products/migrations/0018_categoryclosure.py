@@ -0,0 +1,78 @@
+# Generated by Django 5.1 on 2026-10-17 15:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_category_closure(apps, schema_editor) -> None:
+    """Create closure rows for every category and each of its ancestors."""
+
+    category_model = apps.get_model("products", "Category")
+    closure_model = apps.get_model("products", "CategoryClosure")
+    parents = dict(category_model.objects.values_list("id", "parent_id"))
+    rows = []
+    for category_id in parents:
+        ancestor_id, depth = category_id, 0
+        while ancestor_id and depth <= len(parents):
+            rows.append(
+                closure_model(
+                    ancestor_id=ancestor_id,
+                    descendant_id=category_id,
+                    depth=depth,
+                )
+            )
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    closure_model.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0017_product_final_price"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveSmallIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.category",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["descendant", "depth"],
+                        name="category_closure_desc_idx",
+                    ),
+                ],
+                "unique_together": {("ancestor", "descendant")},
+            },
+        ),
+        migrations.RunPython(
+            populate_category_closure, migrations.RunPython.noop,
+        ),
+    ]
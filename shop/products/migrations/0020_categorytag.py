@@ -0,0 +1,50 @@
+# Generated by Django 5.1 on 2026-10-17 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0019_product_popularity_productsales"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("products_count", models.IntegerField(default=0)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.category",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.producttag",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Category: tag",
+                "verbose_name_plural": "Categories: tags",
+                "unique_together": {("category", "tag")},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-17 18:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rating_sum(apps, schema_editor) -> None:
+    """Set rating sum as sum of rates of product reviews."""
+
+    product_model = apps.get_model("products", "Product")
+    review_model = apps.get_model("products", "ProductReview")
+    rating_sum_sq = (
+        review_model.objects.
+        filter(product_id=OuterRef("id")).
+        values("product_id").
+        annotate(total=Sum("rate")).
+        values("total")
+    )
+    product_model.objects.update(
+        rating_sum=Coalesce(Subquery(rating_sum_sq), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0020_categorytag"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_sum, migrations.RunPython.noop),
+    ]
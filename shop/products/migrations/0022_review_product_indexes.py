@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0021_product_rating_sum"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productreview",
+            index=models.Index(
+                fields=["product", "date", "id"],
+                name="review_product_date_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productreview",
+            index=models.Index(
+                fields=["product", "rate", "id"],
+                name="review_product_rate_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1 on 2026-10-17 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0022_review_product_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="rating",
+            field=models.DecimalField(
+                decimal_places=1, default=0, max_digits=2,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["rating", "id"], name="product_rating_id_idx",
+            ),
+        ),
+    ]
@@ -1,8 +1,10 @@
-from .category import Category
+from .category import Category, CategoryClosure
 from .category_image import CategoryImage, get_category_image_saving_path
+from .category_tag import CategoryTag
 from .product import Product
 from .product_image import ProductImage, get_product_image_saving_path
 from .product_review import ProductReview
+from .product_sales import ProductSales
 from .product_specification import (
     ProductAndSpecification,
     ProductSpecification,
@@ -2,65 +2,13 @@
 
 from typing import Optional
 
-from django.db import models, connection
-from django.db.models import QuerySet
+from django.db import models, transaction
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q, QuerySet
 
-from .product_tag import ProductTag
 from common.custom_logger import app_logger
 
 unavailable_image = "Image is currently unavailable!"
 
-sql_get_active_root_category = """
-    WITH RECURSIVE RootCategory AS (
-    SELECT id, parent_id, is_active
-    FROM products_category AS pc
-    WHERE id = %s
-
-    UNION ALL
-
-    SELECT pc.id, pc.parent_id, pc.is_active
-    FROM products_category AS pc
-    INNER JOIN RootCategory AS rc ON pc.id = rc.parent_id
-    WHERE pc.is_active is TRUE
-    )
-    SELECT rc.id
-    FROM RootCategory AS rc
-    WHERE parent_id is NULL;
-"""
-sql_get_active_nesting_level = """
-    WITH RECURSIVE NestingLevel AS (
-    SELECT id, parent_id, is_active, 0 AS depth
-    FROM products_category AS pc
-    WHERE id = %s
-
-    UNION ALL
-
-    SELECT pc.id, pc.parent_id, pc.is_active, depth + 1
-    FROM products_category AS pc
-    INNER JOIN NestingLevel AS nl ON nl.parent_id = pc.id
-    WHERE pc.is_active is TRUE
-    )
-    SELECT MAX(depth)
-    FROM NestingLevel;
-"""
-sql_get_subcategories_max_nesting_level = """
-    WITH RECURSIVE NestingLevel AS (
-    SELECT id, parent_id, is_active, 0 AS depth
-    FROM products_category AS pc
-    WHERE id = %s
-
-    UNION ALL
-
-    SELECT pc.id, pc.parent_id, pc.is_active, depth + 1
-    FROM products_category AS pc
-    INNER JOIN NestingLevel AS nl ON nl.id = pc.parent_id
-    WHERE pc.is_active is TRUE
-    )
-    SELECT MAX(depth)
-    FROM NestingLevel;
-"""
-
-
 class Category(models.Model):
     title = models.CharField(
         max_length=150,
@@ -95,65 +43,264 @@ class Category(models.Model):
 
         return f"Category id: {self.id} title: {self.title}"
 
+    def save(self, *args, **kwargs) -> None:
+        """Save instance and maintain category closure table.
+
+        Closure rows are added for new category and rebuilt for category
+        subtree if parent is changed. Previous parent id is kept in instance
+        for signals.
+
+        """
+        is_created = self._state.adding
+        previous_parent_id = None
+        if not is_created:
+            previous_parent_id = (
+                Category.objects.
+                filter(id=self.id).
+                values_list("parent_id", flat=True).
+                first()
+            )
+        self._previous_parent_id = previous_parent_id
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_created:
+                CategoryClosure.add_category(self.id, self.parent_id)
+            elif previous_parent_id != self.parent_id:
+                CategoryClosure.move_category(self.id, self.parent_id)
+
     @staticmethod
     def get_nesting_level(category_id: int) -> int:
-        """Get category nesting level (root category nesting level = 0)."""
+        """Get category nesting level (root category nesting level = 0).
 
-        with connection.cursor() as cursor:
-            cursor.execute(sql_get_active_nesting_level, [category_id])
-            nesting_level = cursor.fetchone()
-        return nesting_level[0] if nesting_level else 0
+        Nesting level is counted by active ancestors, up to the nearest
+        inactive one.
+
+        """
+        depths = (
+            CategoryClosure.objects.
+            filter(descendant_id=category_id, depth__gt=0).
+            aggregate(
+                max_depth=Max("depth"),
+                inactive_depth=Min(
+                    "depth", filter=Q(ancestor__is_active=False),
+                ),
+            )
+        )
+        if depths["inactive_depth"] is not None:
+            return depths["inactive_depth"] - 1
+
+        return depths["max_depth"] or 0
 
     @staticmethod
     def get_subcategories_rel_nesting_level(category_id: int) -> int:
-        """Get max relative nesting level of subcategories from category.
+        """Get max relative nesting level of active subcategories.
 
         Count relative nesting level from category_id.
 
         """
-        with connection.cursor() as cursor:
-            cursor.execute(
-                sql_get_subcategories_max_nesting_level,
-                [category_id],
-            )
-            max_sub_nesting = cursor.fetchone()
-            app_logger.debug(f"{category_id=} {max_sub_nesting=}")
-        return max_sub_nesting[0] if max_sub_nesting else 0
+        max_sub_nesting = (
+            CategoryClosure.get_active_rows().
+            filter(ancestor_id=category_id).
+            aggregate(depth=Max("depth"))["depth"]
+        )
+        app_logger.debug(f"{category_id=} {max_sub_nesting=}")
+        return max_sub_nesting or 0
 
     def get_root_category_id(self) -> Optional[int]:
-        """Get root category id."""
+        """Get root category id if all ancestors are active."""
 
-        if self.parent is None:
+        if self.parent_id is None:
             return None
 
-        with connection.cursor() as cursor:
-            cursor.execute(sql_get_active_root_category, [self.id])
-            root_category_id = cursor.fetchone()
-        return root_category_id[0] if root_category_id else None
-
-    @classmethod
-    def get_category_related_tags(cls, category_id: int) -> QuerySet:
-        """Get tags related to category and its subcategories."""
-
-        related_categories_ids = [category_id]
-        related_categories_ids.extend(
-            cls.objects.filter(
-                id=category_id, is_active=True, subcategories__is_active=True,
-            ).values_list("subcategories__id", flat=True)
+        ancestors = (
+            CategoryClosure.objects.
+            filter(descendant_id=self.id, depth__gt=0).
+            aggregate(
+                root_id=Max(
+                    "ancestor_id", filter=Q(ancestor__parent__isnull=True),
+                ),
+                total_inactive=Count(
+                    "ancestor_id", filter=Q(ancestor__is_active=False),
+                ),
+            )
         )
+        if ancestors["total_inactive"]:
+            return None
+
+        return ancestors["root_id"]
+
+    @staticmethod
+    def get_descendants_ids(category_id: int) -> QuerySet:
+        """Get ids of category and its active subcategories of any depth."""
+
         return (
-            ProductTag.objects.
-            filter(products__category_id__in=related_categories_ids).
-            distinct()
+            CategoryClosure.get_active_rows().
+            filter(ancestor_id=category_id).
+            values("descendant_id")
         )
 
     @classmethod
-    def get_root_categories_with_prefetch(cls) -> QuerySet:
-        """Get active root categories with prefetch subcategories."""
+    def get_tree_rows(cls) -> QuerySet:
+        """Get values of active categories with images sorted by title."""
 
         return (
-            cls.objects.filter(is_active=True, parent__isnull=True).
-            select_related("image").
-            prefetch_related("subcategories").
-            order_by("title")
+            cls.objects.
+            filter(is_active=True).
+            order_by("title").
+            values("id", "title", "parent_id", "image__src", "image__alt")
         )
+
+
+class CategoryClosure(models.Model):
+    """Closure table of categories tree.
+
+    Table has row for every category and each of its ancestors (including
+    category itself with depth=0), so subtree or ancestors of category of
+    any depth are selected by one indexed lookup.
+
+    """
+
+    ancestor = models.ForeignKey(
+        to="Category", on_delete=models.CASCADE, related_name="+",
+    )
+    descendant = models.ForeignKey(
+        to="Category", on_delete=models.CASCADE, related_name="+",
+    )
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = (("ancestor", "descendant"),)
+        indexes = [
+            models.Index(
+                fields=["descendant", "depth"],
+                name="category_closure_desc_idx",
+            ),
+        ]
+
+    @classmethod
+    def get_active_rows(cls) -> QuerySet:
+        """Get rows of active subcategories of ancestors.
+
+        Row is excluded if descendant or any category between it and
+        ancestor is inactive (ancestor itself may be inactive), so inactive
+        subcategory hides its whole subtree.
+
+        """
+        return cls.objects.exclude(
+            Exists(
+                cls.objects.filter(
+                    descendant_id=OuterRef("descendant_id"),
+                    depth__lt=OuterRef("depth"),
+                    ancestor__is_active=False,
+                )
+            )
+        )
+
+    @classmethod
+    def add_category(cls, category_id: int, parent_id: Optional[int]) -> None:
+        """Add rows for new category."""
+
+        rows = [
+            cls(ancestor_id=category_id, descendant_id=category_id, depth=0),
+        ]
+        if parent_id:
+            rows.extend(
+                cls(
+                    ancestor_id=ancestor_id,
+                    descendant_id=category_id,
+                    depth=depth + 1,
+                )
+                for ancestor_id, depth in (
+                    cls.objects.
+                    filter(descendant_id=parent_id).
+                    values_list("ancestor_id", "depth")
+                )
+            )
+        cls.objects.bulk_create(rows)
+
+    @classmethod
+    def move_category(cls, category_id: int, parent_id: Optional[int]) -> None:
+        """Rebuild rows of category subtree linked with previous ancestors.
+
+        Rows between previous ancestors and subtree are deleted and rows
+        between new ancestors and subtree are added.
+
+        """
+        subtree = list(
+            cls.objects.
+            filter(ancestor_id=category_id).
+            values_list("descendant_id", "depth")
+        )
+        cls.detach_subtree(category_id, [category_id])
+        if not parent_id:
+            return
+
+        ancestors = (
+            cls.objects.
+            filter(descendant_id=parent_id).
+            values_list("ancestor_id", "depth")
+        )
+        cls.objects.bulk_create(
+            cls(
+                ancestor_id=ancestor_id,
+                descendant_id=descendant_id,
+                depth=ancestor_depth + 1 + descendant_depth,
+            )
+            for ancestor_id, ancestor_depth in ancestors
+            for descendant_id, descendant_depth in subtree
+        )
+
+    @classmethod
+    def detach_subtree(cls, category_id: int, roots_ids: list[int]) -> None:
+        """Delete rows between ancestors of category and subtree of roots.
+
+        Used to detach category subtree (roots_ids = [category id]) from
+        its ancestors or subcategories (roots_ids = subcategories ids) from
+        category before deleting.
+
+        """
+        ancestors_ids = list(
+            cls.objects.
+            filter(descendant_id=category_id).
+            exclude(ancestor_id__in=roots_ids).
+            values_list("ancestor_id", flat=True)
+        )
+        descendants_ids = list(
+            cls.objects.
+            filter(ancestor_id__in=roots_ids).
+            values_list("descendant_id", flat=True)
+        )
+        (
+            cls.objects.
+            filter(
+                ancestor_id__in=ancestors_ids,
+                descendant_id__in=descendants_ids,
+            ).
+            delete()
+        )
+
+    @classmethod
+    def rebuild(cls) -> int:
+        """Rebuild closure table from categories parents.
+
+        Return total categories.
+
+        """
+        parents = dict(Category.objects.values_list("id", "parent_id"))
+        rows = []
+        for category_id in parents:
+            ancestor_id, depth = category_id, 0
+            while ancestor_id and depth <= len(parents):
+                rows.append(
+                    cls(
+                        ancestor_id=ancestor_id,
+                        descendant_id=category_id,
+                        depth=depth,
+                    )
+                )
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+        return len(parents)
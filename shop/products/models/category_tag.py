@@ -0,0 +1,146 @@
+"""App db model CategoryTag (materialized tags of categories)."""
+
+from typing import Iterable, Optional
+
+from django.db import models, transaction
+from django.db.models import Count, F, Q, QuerySet
+
+from .category import Category, CategoryClosure
+from .product_tag import ProductTag
+from common.custom_logger import app_logger
+
+
+class CategoryTag(models.Model):
+    """Model Class keeps total products with tag per category.
+
+    Products of category and of its active subcategories of any depth are
+    counted. Row is kept while category has products with tag.
+
+    """
+
+    category = models.ForeignKey(
+        to=Category,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=False,
+    )
+    tag = models.ForeignKey(
+        to=ProductTag,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=False,
+    )
+    products_count = models.IntegerField(default=0, null=False)
+
+    class Meta:
+        verbose_name = "Category: tag"
+        verbose_name_plural = "Categories: tags"
+        unique_together = (("category", "tag"),)
+
+    def __str__(self) -> str:
+        """String representation of instance."""
+
+        return (
+            f"Category id: {self.category_id} has {self.products_count} "
+            f"products with tag id: {self.tag_id}"
+        )
+
+    @classmethod
+    def change_products_count(
+            cls, product_id: int, tag_id: int, products_count: int,
+    ) -> None:
+        """Change total products with tag for categories of product.
+
+        Products count is negative if tag is removed from product. Rows are
+        created (ignoring existed ones) and changed for all counting
+        categories by four queries at most.
+
+        """
+        categories_ids = list(
+            cls._get_counting_categories(
+                Q(descendant__products__id=product_id),
+            ).
+            values_list("ancestor_id", flat=True)
+        )
+        if not categories_ids:
+            return
+
+        with transaction.atomic():
+            if products_count > 0:
+                cls.objects.bulk_create(
+                    [
+                        cls(category_id=category_id, tag_id=tag_id)
+                        for category_id in categories_ids
+                    ],
+                    ignore_conflicts=True,
+                )
+            rows = cls.objects.filter(
+                category_id__in=categories_ids, tag_id=tag_id,
+            )
+            rows.update(products_count=F("products_count") + products_count)
+            if products_count < 0:
+                rows.filter(products_count__lte=0).delete()
+
+    @classmethod
+    def recount(cls, categories_ids: Optional[Iterable[int]] = None) -> int:
+        """Recount rows of categories (all if not set) from products tags.
+
+        Return total rows of categories.
+
+        """
+        rows = cls.objects.all()
+        counting_categories = cls._get_counting_categories(
+            Q(descendant__products__productandtag__isnull=False),
+        )
+        if categories_ids is not None:
+            categories_ids = set(categories_ids)
+            rows = rows.filter(category_id__in=categories_ids)
+            counting_categories = counting_categories.filter(
+                ancestor_id__in=categories_ids,
+            )
+
+        categories_tags = (
+            counting_categories.
+            values(
+                category_id=F("ancestor_id"),
+                tag_id=F("descendant__products__productandtag__tag_id"),
+            ).
+            annotate(
+                products_count=Count("descendant__products__productandtag"),
+            ).
+            order_by()
+        )
+        with transaction.atomic():
+            rows.delete()
+            created_rows = cls.objects.bulk_create(
+                [cls(**category_tag) for category_tag in categories_tags],
+                batch_size=1000,
+            )
+
+        app_logger.debug(f"Categories tags are recounted: {categories_ids=}")
+        return len(created_rows)
+
+    @classmethod
+    def recount_ancestors(cls, categories_ids: Iterable[Optional[int]]) -> int:
+        """Recount rows of categories and their ancestors of any depth."""
+
+        return cls.recount(
+            CategoryClosure.objects.
+            filter(
+                descendant_id__in=[
+                    category_id
+                    for category_id in categories_ids
+                    if category_id is not None
+                ],
+            ).
+            values_list("ancestor_id", flat=True)
+        )
+
+    @staticmethod
+    def _get_counting_categories(condition: Q) -> QuerySet:
+        """Get closure rows of categories which count products of subtree.
+
+        Products of inactive subcategory are counted by subcategory only.
+
+        """
+        return CategoryClosure.get_active_rows().filter(condition)
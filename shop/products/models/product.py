@@ -1,13 +1,51 @@
 """App db model Product."""
 
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
-
-from django.db import models
-from django.db.models import QuerySet, Q, Sum
+from typing import Iterable, Optional
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    FloatField,
+    Min,
+    OuterRef,
+    QuerySet,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.expressions import Combinable
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django.utils import timezone
 
 from .product_review import ProductReview
-from common.custom_logger import app_logger
+
+# Fields which define membership or order of product in catalog pages,
+# search results and special products lists ('count' is compared as
+# availability only)
+catalog_fields = (
+    "is_active",
+    "category_id",
+    "title",
+    "shot_description",
+    "full_description",
+    "final_price",
+    "free_delivery",
+    "rating",
+    "review_count",
+    "sorting_index",
+    "is_limited",
+    "is_sales",
+    "sales_price",
+    "sales_from",
+    "sales_to",
+)
 
 
 class Product(models.Model):
@@ -40,45 +78,126 @@ class Product(models.Model):
     full_description = models.CharField(
         max_length=5000, default="See short description",
     )
-    rating = models.DecimalField(
-        max_digits=2, decimal_places=1, null=True, blank=True,
-    )
+    rating = models.DecimalField(max_digits=2, decimal_places=1, default=0)
     sorting_index = models.PositiveSmallIntegerField(
         default=0, null=True, blank=True, db_index=True,
     )
     is_active = models.BooleanField(default=True, db_index=True)
     is_limited = models.BooleanField(default=False, db_index=True, null=False)
     is_sales = models.BooleanField(default=False, db_index=True, null=False)
+    total_sold = models.PositiveIntegerField(default=0, editable=False)
+    popularity = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    search_document = models.TextField(default="", editable=False)
+    final_price = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False,
+    )
 
     class Meta:
         verbose_name = "Product: full details"
         verbose_name_plural = "Products: full details"
+        indexes = [
+            models.Index(
+                fields=["created_date", "id"],
+                name="product_created_date_id_idx",
+            ),
+            models.Index(
+                fields=["total_sold", "id"],
+                name="product_total_sold_id_idx",
+            ),
+            models.Index(
+                fields=["review_count", "id"],
+                name="product_review_count_id_idx",
+            ),
+            models.Index(
+                fields=["rating", "id"],
+                name="product_rating_id_idx",
+            ),
+            models.Index(
+                fields=["sorting_index", "popularity", "total_sold"],
+                name="product_popularity_window_idx",
+            ),
+            models.Index(
+                fields=["final_price", "id"],
+                name="product_final_price_id_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         """String representation of Product object."""
 
         return f"ID {self.id}: {self.title} - {self.count_final_price()} $"
 
-    def add_new_review(self, new_review_data: dict) -> None:
-        """Add new review to product."""
+    def build_search_document(self) -> str:
+        """Build text for full-text search index.
 
-        app_logger.debug(f"Adding new review {new_review_data=}, {self=}")
-        product_review = ProductReview(**new_review_data, product=self)
-        product_review.save()
-        self.reviews.add(product_review)
-        self.save()
+        Document includes title, short and full descriptions, tags names and
+        specifications values. Tags and specifications should be prefetched.
 
-    def count_final_price(self) -> Decimal:
+        """
+        document_parts = [
+            self.title, self.shot_description, self.full_description,
+        ]
+        document_parts.extend(tag.name for tag in self.tags.all())
+        document_parts.extend(
+            specification.value
+            for specification in self.specifications.all()
+        )
+        return " ".join(document_parts)
+
+    @classmethod
+    def from_db(cls, db, field_names, values) -> "Product":
+        """Create instance from db row and keep loaded catalog values."""
+
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_category_id = instance.__dict__.get("category_id")
+        instance._loaded_catalog_values = instance.get_catalog_values()
+        return instance
+
+    def save(self, *args, **kwargs) -> None:
+        """Recount materialized final price and save instance.
+
+        Category id before saving is kept as '_previous_category_id' (it is
+        considered as unchanged if instance is not loaded from db).
+        '_is_catalog_changed' is set if any of catalog fields or
+        availability is changed (or instance is not loaded from db).
+
+        """
+        self.final_price = self.get_actual_price()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "final_price"}
+        self._previous_category_id = getattr(
+            self, "_loaded_category_id", self.category_id,
+        )
+        catalog_values = self.get_catalog_values()
+        self._is_catalog_changed = (
+            getattr(self, "_loaded_catalog_values", None) != catalog_values
+        )
+        super().save(*args, **kwargs)
+        self._loaded_category_id = self.category_id
+        self._loaded_catalog_values = catalog_values
+
+    def get_catalog_values(self) -> tuple:
+        """Get values of catalog fields and availability of product."""
+
+        values = self.__dict__
+        return (
+            *(values.get(field) for field in catalog_fields),
+            (values.get("count") or 0) > 0,
+        )
+
+    def get_actual_price(self) -> Decimal:
         """Get product price bases sales if available.
 
         If Product sales flag is activated, sales price is set, today date is
         between sales dates if set then use sales price else ordinary price.
         """
 
-        today_date = date.today()
+        today_date = timezone.localdate()
         if (
                 self.is_sales and
-                self.sales_price and
+                self.sales_price is not None and
                 (self.sales_from is None or self.sales_from <= today_date) and
                 (self.sales_to is None or today_date <= self.sales_to)
         ):
@@ -86,41 +205,151 @@ class Product(models.Model):
 
         return self.price
 
+    def count_final_price(self) -> Decimal:
+        """Get product final price (materialized price bases sales)."""
+
+        return self.final_price
+
+    @staticmethod
+    def get_on_sales_filter(on_date: date) -> Q:
+        """Get filter of products with active sales price on date."""
+
+        return (
+            Q(is_sales=True) &
+            Q(sales_price__isnull=False) &
+            (Q(sales_from__isnull=True) | Q(sales_from__lte=on_date)) &
+            (Q(sales_to__isnull=True) | Q(sales_to__gte=on_date))
+        )
+
+    @classmethod
+    def refresh_final_prices(cls) -> list[int]:
+        """Recount final price of products if sales window is opened/closed.
+
+        Return ids of products with updated final price.
+
+        """
+        on_sales_filter = cls.get_on_sales_filter(timezone.localdate())
+        to_sales_price_qs = cls.objects.filter(
+            on_sales_filter & ~Q(final_price=F("sales_price"))
+        )
+        to_price_qs = cls.objects.filter(
+            ~on_sales_filter & ~Q(final_price=F("price"))
+        )
+        products_ids = list(to_sales_price_qs.values_list("id", flat=True))
+        products_ids.extend(to_price_qs.values_list("id", flat=True))
+        if products_ids:
+            to_sales_price_qs.update(final_price=F("sales_price"))
+            to_price_qs.update(final_price=F("price"))
+        return products_ids
+
+    @classmethod
+    def change_rating(
+            cls, product_id: int, rates_sum: int, total_reviews: int,
+    ) -> None:
+        """Add rates sum and total reviews to product rating counters.
+
+        Values are negative if reviews are deleted. Counters and rating are
+        changed atomically by one UPDATE query.
+
+        """
+        new_rating_sum = F("rating_sum") + rates_sum
+        new_review_count = F("review_count") + total_reviews
+        # Rating is assigned first as it is counted from previous counters
+        # values (MySQL assigns columns from left to right).
+        (
+            cls.objects.
+            filter(id=product_id).
+            update(
+                rating=cls._get_rating(new_rating_sum, new_review_count),
+                rating_sum=new_rating_sum,
+                review_count=new_review_count,
+            )
+        )
+
+    @classmethod
+    def recount_ratings(
+            cls, products_ids: Optional[Iterable[int]] = None,
+    ) -> int:
+        """Recount rating of all products (or products ids) from reviews.
+
+        Only products with counters different from reviews are updated.
+        Return total updated products.
+
+        """
+        rating_sum_sq = (
+            ProductReview.objects.
+            filter(product_id=OuterRef("id")).
+            values("product_id").
+            annotate(total=Sum("rate")).
+            values("total")
+        )
+        review_count_sq = (
+            ProductReview.objects.
+            filter(product_id=OuterRef("id")).
+            values("product_id").
+            annotate(total=Count("id")).
+            values("total")
+        )
+        actual_rating_sum = Coalesce(Subquery(rating_sum_sq), 0)
+        actual_review_count = Coalesce(Subquery(review_count_sq), 0)
+        query_set = cls.objects.all()
+        if products_ids is not None:
+            query_set = query_set.filter(id__in=products_ids)
+        drifted_ids = list(
+            query_set.
+            annotate(
+                actual_rating_sum=actual_rating_sum,
+                actual_review_count=actual_review_count,
+            ).
+            filter(
+                ~Q(rating_sum=F("actual_rating_sum")) |
+                ~Q(review_count=F("actual_review_count"))
+            ).
+            values_list("id", flat=True)
+        )
+        if drifted_ids:
+            (
+                cls.objects.
+                filter(id__in=drifted_ids).
+                update(
+                    rating=cls._get_rating(
+                        actual_rating_sum, actual_review_count,
+                    ),
+                    rating_sum=actual_rating_sum,
+                    review_count=actual_review_count,
+                )
+            )
+        return len(drifted_ids)
+
     @classmethod
     def get_limited_products(cls, total_products: int) -> QuerySet:
         """Get limited products."""
 
         return (
             cls.objects.
-            select_related("category").
-            prefetch_related("images", "reviews", "tags").
             filter(is_active=True, count__gt=0, is_limited=True).
             order_by("rating", "count", "price")
             [:total_products]
         )
 
     @classmethod
-    def get_banners_products(cls, products_ids: list[int]) -> QuerySet:
-        """Get banners products."""
-
-        return (
-            cls.objects.
-            select_related("category").
-            prefetch_related("images", "reviews", "tags").
-            filter(id__in=products_ids)
-        )
+    def get_popular_products(
+            cls,
+            total_products: int,
+            categories_ids: Optional[Iterable[int] | QuerySet] = None,
+    ) -> QuerySet:
+        """Get popular products (of categories if set).
 
-    @classmethod
-    def get_popular_products(cls, total_products: int) -> QuerySet:
-        """Get popular products."""
+        Products are ranked by sorting index and sold quantity in
+        popularity window ('popularity'), total sold is tie-breaker.
 
+        """
+        query_set = cls.objects.filter(is_active=True, count__gt=0)
+        if categories_ids is not None:
+            query_set = query_set.filter(category_id__in=categories_ids)
         return (
-            cls.objects.
-            select_related("category").
-            prefetch_related("images", "reviews", "tags").
-            filter(is_active=True, count__gt=0).
-            annotate(total_sailed=Sum("orderandproduct__total_quantity")).
-            order_by("-sorting_index", "-total_sailed")
+            query_set.
+            order_by("-sorting_index", "-popularity", "-total_sold")
             [:total_products]
         )
 
@@ -128,47 +357,145 @@ class Product(models.Model):
     def get_sales_products(cls) -> QuerySet:
         """Get sales products."""
 
-        today_date = date.today()
         return (
             cls.objects.
             prefetch_related("images").
             filter(
                 Q(is_active=True) &
                 Q(count__gte=1) &
-                Q(is_sales=True) &
-                (Q(sales_from__isnull=True) | Q(sales_from__lte=today_date)) &
-                (Q(sales_to__isnull=True) | Q(sales_to__gte=today_date))
+                cls.get_on_sales_filter(timezone.localdate())
             ).
             order_by("id")
         )
 
     @classmethod
-    def get_unavailable_products(cls, products_ids: list[int]) -> QuerySet:
-        """Get unavailable products.
+    def get_sales_products_ids(
+            cls, products_ids: Optional[Iterable[int]] = None,
+    ) -> list[int]:
+        """Get ids of sales products (among products ids if set) in order."""
+
+        query_set = cls.get_sales_products().prefetch_related(None)
+        if products_ids is not None:
+            query_set = query_set.filter(id__in=products_ids)
+        return list(query_set.values_list("id", flat=True))
+
+    @classmethod
+    def get_next_sales_boundary(cls, on_date: date) -> Optional[date]:
+        """Get nearest date after on date when any sales window opens/closes.
 
-        Product considered is unavailable if is_active=False or count <= 0.
+        Sales window is closed from the next day after 'sales_to'.
 
         """
-        return (
-            Product.objects.
-            filter(
-                (Q(is_active=False) | Q(count__lte=0)) & Q(id__in=products_ids)
+        boundaries = (
+            cls.objects.
+            filter(is_sales=True, sales_price__isnull=False).
+            aggregate(
+                next_from=Min("sales_from", filter=Q(sales_from__gt=on_date)),
+                next_to=Min("sales_to", filter=Q(sales_to__gte=on_date)),
             )
         )
+        next_dates = [
+            boundaries["next_from"],
+            (
+                boundaries["next_to"] + timedelta(days=1)
+                if boundaries["next_to"] else None
+            ),
+        ]
+        return min(
+            (next_date for next_date in next_dates if next_date),
+            default=None,
+        )
 
     @classmethod
-    def select_available_products(
-            cls, products_ids: list[int],
-    ) -> QuerySet:
-        """Select available products for update.
+    def reduce_stock(cls, products_quantities: dict[int, int]) -> list[dict]:
+        """Reduce stock quantity and increase sold counter of products.
 
-        Product considered is available if is_active=True and count > 0.
+        Products {id: quantity} are changed by one conditional UPDATE (rows
+        are taken in id order, so concurrent orders lock them in the same
+        order) if every product is active and has enough quantity.
+        Otherwise nothing is changed and shortages [{'id', 'title',
+        'count'}] are returned, where 'count' is available quantity and
+        'title' is None for not existed product.
 
         """
-        return (
+        if not products_quantities:
+            return []
+
+        products_ids = sorted(products_quantities)
+        quantity = cls._get_quantity_case(products_quantities)
+        with transaction.atomic():
+            total_reduced = (
+                cls.objects.
+                filter(
+                    id__in=products_ids, is_active=True, count__gte=quantity,
+                ).
+                order_by("id").
+                update(
+                    count=F("count") - quantity,
+                    total_sold=F("total_sold") + quantity,
+                )
+            )
+            if total_reduced == len(products_ids):
+                return []
+
+            transaction.set_rollback(True)
+
+        return cls.get_stock_shortages(products_quantities)
+
+    @classmethod
+    def get_stock_shortages(
+            cls,
+            products_quantities: dict[int, int],
+            available_counts: Optional[dict[int, int]] = None,
+    ) -> list[dict]:
+        """Get products which are short of ordered quantity {id: quantity}.
+
+        Return [{'id', 'title', 'count'}], where 'count' is available
+        quantity (taken from available counts {id: quantity} if product is
+        there) and 'title' is None for not existed product.
+
+        """
+        products = {
+            product.id: product
+            for product in (
+                cls.objects.
+                filter(id__in=products_quantities.keys()).
+                only("id", "title", "count", "is_active")
+            )
+        }
+        products_shortages = []
+        for product_id in sorted(products_quantities):
+            product = products.get(product_id)
+            available_count = 0
+            if product is not None and product.is_active:
+                available_count = product.count
+            if available_counts is not None:
+                available_count = available_counts.get(
+                    product_id, available_count,
+                )
+            if available_count < products_quantities[product_id]:
+                products_shortages.append(
+                    {
+                        "id": product_id,
+                        "title": product.title if product else None,
+                        "count": available_count,
+                    }
+                )
+        return products_shortages
+
+    @classmethod
+    def get_available_counts(
+            cls, products_ids: Iterable[int],
+    ) -> dict[int, int]:
+        """Get {id: quantity available to order} (0 if not active)."""
+
+        return dict(
             cls.objects.
-            select_for_update().
-            filter(is_active=True, count__gt=0, id__in=products_ids)
+            filter(id__in=products_ids).
+            values_list(
+                "id",
+                Case(When(is_active=True, then=F("count")), default=Value(0)),
+            )
         )
 
     @classmethod
@@ -181,22 +508,121 @@ class Product(models.Model):
         return cls.objects.filter(is_active=True, count__gt=0)
 
     @classmethod
-    def get_by_id_with_prefetch(cls, id: int) -> QuerySet:
-        """Get active Product object with prefetch related data."""
+    def get_by_id_with_prefetch(
+            cls, id: int, total_reviews: Optional[int] = None,
+    ) -> "Product":
+        """Get active Product object with prefetch related data.
 
-        return (
+        Reviews are loaded by separate query and set to 'latest_reviews'
+        attribute: all reviews in order of adding or only latest total
+        reviews if total is set.
+
+        """
+        product = (
             cls.objects.
             select_related("category").
-            prefetch_related("images", "reviews", "tags", "specifications").
+            prefetch_related("images", "tags", "specifications").
             get(id=id, is_active=True)
         )
+        product.latest_reviews = list(
+            ProductReview.get_product_reviews(id).order_by("id")
+            if total_reviews is None
+            else ProductReview.get_latest_reviews(id, total_reviews)
+        )
+        return product
+
+    @classmethod
+    def recount_counters(cls) -> int:
+        """Recount 'total_sold' and 'review_count' for all products.
+
+        Counters are rebuilt from order lines and reviews from scratch.
+        Return total updated products.
+
+        """
+        order_and_product = apps.get_model("orders", "OrderAndProduct")
+        total_sold_sq = (
+            order_and_product.objects.
+            filter(product_id=OuterRef("id")).
+            values("product_id").
+            annotate(total=Sum("total_quantity")).
+            values("total")
+        )
+        review_count_sq = (
+            ProductReview.objects.
+            filter(product_id=OuterRef("id")).
+            values("product_id").
+            annotate(total=Count("id")).
+            values("total")
+        )
+        return cls.objects.update(
+            total_sold=Coalesce(Subquery(total_sold_sq), 0),
+            review_count=Coalesce(Subquery(review_count_sq), 0),
+        )
 
     @classmethod
-    def get_products_ids(cls) -> list:
-        """Get all active and available Products ids."""
+    def refresh_search_documents(cls, products_ids: list[int]) -> dict:
+        """Rebuild and save search documents for products.
+
+        Return dict with rebuilt documents {product id: document}.
+
+        """
+        products = list(
+            cls.objects.
+            prefetch_related("tags", "specifications").
+            filter(id__in=products_ids)
+        )
+        for product in products:
+            product.search_document = product.build_search_document()
+        cls.objects.bulk_update(products, ["search_document"], batch_size=500)
+        return {product.id: product.search_document for product in products}
+
+    @classmethod
+    def get_active_products_ids(cls, products_ids: Iterable[int]) -> list:
+        """Get ids of active products among products ids."""
 
         return list(
-                Product.objects.
-                filter(is_active=True, count__gt=0).
-                values_list("id", flat=True)
-            )
+            cls.objects.
+            filter(id__in=products_ids, is_active=True).
+            values_list("id", flat=True)
+        )
+
+    @classmethod
+    def get_products_ids(
+            cls, products_ids: Optional[Iterable[int]] = None,
+    ) -> list:
+        """Get all (or among products ids) active and available ids."""
+
+        query_set = cls.objects.filter(is_active=True, count__gt=0)
+        if products_ids is not None:
+            query_set = query_set.filter(id__in=products_ids)
+        return list(query_set.values_list("id", flat=True))
+
+    @staticmethod
+    def _get_rating(
+            rating_sum: Combinable, review_count: Combinable,
+    ) -> Round:
+        """Get rating expression (average rate) from rating counters.
+
+        Rating is 0 if product has no reviews.
+
+        """
+        return Round(
+            Coalesce(
+                Cast(rating_sum, output_field=FloatField()) /
+                NullIf(review_count, 0),
+                0.0,
+            ),
+            1,
+        )
+
+    @staticmethod
+    def _get_quantity_case(products_quantities: dict[int, int]) -> Case:
+        """Get expression of quantity per product id."""
+
+        return Case(
+            *[
+                When(id=product_id, then=Value(quantity))
+                for product_id, quantity in products_quantities.items()
+            ],
+            default=Value(0),
+        )
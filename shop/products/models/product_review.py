@@ -1,6 +1,14 @@
 """App db model ProductReview."""
 
-from django.db import models
+from contextlib import contextmanager
+from threading import local
+from typing import Iterator, Optional
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Count, QuerySet
+
+_deferred_rating = local()
 
 
 class ProductReview(models.Model):
@@ -21,8 +29,105 @@ class ProductReview(models.Model):
         unique_together = (("email", "product"),)
         verbose_name = "Product: review"
         verbose_name_plural = "Products: reviews"
+        indexes = [
+            models.Index(
+                fields=["product", "date", "id"],
+                name="review_product_date_id_idx",
+            ),
+            models.Index(
+                fields=["product", "rate", "id"],
+                name="review_product_rate_id_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         """String representation of ProductReview object."""
 
         return f"Product review: {self.id} for product: {self.product.title}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values) -> "ProductReview":
+        """Create instance from db row and keep loaded product id and rate."""
+
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = (
+            instance.__dict__.get("product_id"), instance.__dict__.get("rate"),
+        )
+        return instance
+
+    def save(self, *args, **kwargs) -> None:
+        """Save instance in transaction with product rating change.
+
+        Product rating is changed by post_save signal, product id and rate
+        before saving are kept as '_previous_rating' (None if instance is
+        not loaded from db).
+
+        """
+        self._previous_rating = getattr(self, "_loaded_rating", None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_rating = (self.product_id, self.rate)
+
+    @classmethod
+    def get_product_reviews(cls, product_id: int) -> QuerySet:
+        """Get reviews of product."""
+
+        return cls.objects.filter(product_id=product_id)
+
+    @classmethod
+    def get_latest_reviews(
+            cls, product_id: int, total_reviews: int,
+    ) -> QuerySet:
+        """Get latest total reviews of product."""
+
+        if not total_reviews:
+            return cls.objects.none()
+
+        return (
+            cls.get_product_reviews(product_id).
+            order_by("-date", "-id")[:total_reviews]
+        )
+
+    @classmethod
+    def get_rates_histogram(cls, product_id: int) -> dict[int, int]:
+        """Get {rate: total reviews} of product reviews."""
+
+        return dict(
+            cls.get_product_reviews(product_id).
+            values_list("rate").
+            annotate(total=Count("id")).
+            order_by()
+        )
+
+    @staticmethod
+    @contextmanager
+    def defer_rating_recount() -> Iterator[None]:
+        """Defer rating changes of reviews saved/deleted in context.
+
+        Is used for bulk imports of reviews: rating of changed products is
+        recounted by one set-based update at the end of context.
+
+        """
+        previous_products_ids = getattr(_deferred_rating, "products_ids", None)
+        products_ids = set()
+        _deferred_rating.products_ids = products_ids
+        try:
+            yield
+        finally:
+            _deferred_rating.products_ids = previous_products_ids
+
+        if products_ids:
+            apps.get_model("products", "Product").recount_ratings(products_ids)
+
+    @staticmethod
+    def is_rating_deferred(products_ids: list[Optional[int]]) -> bool:
+        """Check that rating recount is deferred, keep products ids if so."""
+
+        deferred_products_ids = getattr(_deferred_rating, "products_ids", None)
+        if deferred_products_ids is None:
+            return False
+
+        deferred_products_ids.update(
+            product_id for product_id in products_ids if product_id
+        )
+        return True
@@ -0,0 +1,178 @@
+"""App db model ProductSales (daily rollup of sold products)."""
+
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from .product import Product
+from common.custom_logger import app_logger
+from products.constants import POPULARITY_WINDOW_DAYS
+
+
+class ProductSales(models.Model):
+    """Model Class keeps total sold quantity of product per day.
+
+    Rollup is incremented with order lines changes and is used to count
+    Product 'popularity' (sold quantity for last POPULARITY_WINDOW_DAYS).
+
+    """
+
+    product = models.ForeignKey(
+        to=Product,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=False,
+    )
+    date = models.DateField(null=False, db_index=True)
+    quantity = models.IntegerField(default=0, null=False)
+
+    class Meta:
+        verbose_name = "Product: daily sales"
+        verbose_name_plural = "Products: daily sales"
+        unique_together = (("product", "date"),)
+
+    def __str__(self) -> str:
+        """String representation of instance."""
+
+        return (
+            f"Product id: {self.product_id} sold {self.quantity} "
+            f"on {self.date}"
+        )
+
+    @staticmethod
+    def get_window_start() -> date:
+        """Get first date of popularity window."""
+
+        return (
+            timezone.localdate() - timedelta(days=POPULARITY_WINDOW_DAYS - 1)
+        )
+
+    @classmethod
+    def add_sold(
+            cls, products_quantities: dict[int, int], sold_date: date,
+    ) -> None:
+        """Add sold quantities {product id: quantity} on date.
+
+        Quantity is negative if products are returned. Product popularity is
+        changed as well if date is in popularity window. Rollup rows are
+        created (ignoring existed ones) and incremented with two queries for
+        any number of products.
+
+        """
+        products_quantities = {
+            product_id: quantity
+            for product_id, quantity in products_quantities.items()
+            if quantity
+        }
+        if not products_quantities:
+            return
+
+        products_ids = list(products_quantities.keys())
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                [
+                    cls(product_id=product_id, date=sold_date)
+                    for product_id in products_ids
+                ],
+                ignore_conflicts=True,
+            )
+            (
+                cls.objects.
+                filter(product_id__in=products_ids, date=sold_date).
+                update(
+                    quantity=F("quantity") + cls._get_quantity_case(
+                        "product_id", products_quantities,
+                    ),
+                )
+            )
+            if sold_date >= cls.get_window_start():
+                (
+                    Product.objects.
+                    filter(id__in=products_ids).
+                    update(
+                        popularity=Greatest(
+                            F("popularity") + cls._get_quantity_case(
+                                "id", products_quantities,
+                            ),
+                            0,
+                        )
+                    )
+                )
+
+    @classmethod
+    def rebuild(cls) -> list[int]:
+        """Rebuild rollup for popularity window from order lines.
+
+        Rows out of window are deleted and Product 'popularity' is recounted
+        for all products. Return ids of products which popularity is
+        changed.
+
+        """
+        order_and_product = apps.get_model("orders", "OrderAndProduct")
+        window_start = cls.get_window_start()
+        daily_sales = (
+            order_and_product.objects.
+            filter(order__created_at__date__gte=window_start).
+            annotate(date=TruncDate("order__created_at")).
+            values("product_id", "date").
+            annotate(quantity=Sum("total_quantity"))
+        )
+        with transaction.atomic():
+            previous_popularity = cls._get_products_popularity()
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                [cls(**sales) for sales in daily_sales],
+                batch_size=1000,
+            )
+            popularity_sq = (
+                cls.objects.
+                filter(product_id=OuterRef("id")).
+                values("product_id").
+                annotate(total=Sum("quantity")).
+                values("total")
+            )
+            Product.objects.update(
+                popularity=Greatest(Coalesce(Subquery(popularity_sq), 0), 0),
+            )
+            popularity = cls._get_products_popularity()
+
+        products_ids = [
+            product_id
+            for product_id in previous_popularity.keys() | popularity.keys()
+            if (
+                previous_popularity.get(product_id) !=
+                popularity.get(product_id)
+            )
+        ]
+        app_logger.info(
+            f"Popularity is rebuilt, {len(products_ids)} products are changed"
+        )
+        return products_ids
+
+    @staticmethod
+    def _get_products_popularity() -> dict[int, int]:
+        """Get {product id: popularity} of products with popularity."""
+
+        return dict(
+            Product.objects.
+            filter(popularity__gt=0).
+            values_list("id", "popularity")
+        )
+
+    @staticmethod
+    def _get_quantity_case(
+            field: str, products_quantities: dict[int, int],
+    ) -> Case:
+        """Get expression of quantity per product id field value."""
+
+        return Case(
+            *[
+                When(**{field: product_id}, then=Value(quantity))
+                for product_id, quantity in products_quantities.items()
+            ],
+            default=Value(0),
+        )
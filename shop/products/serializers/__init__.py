@@ -7,6 +7,11 @@ from .product import (
     OutSalesProductSerializer,
     OutProductFullSerializer,
     OutSpecialProductSerializer,
+    ProductCardSerializer,
+)
+from .product_review import (
+    InProductDetailsSerializer,
+    InProductReviewsSerializer,
+    ProductReviewSerializer,
 )
-from .product_review import ProductReviewSerializer
 from .product_tag import ProductTagSerializer
@@ -8,7 +8,7 @@ from rest_framework.exceptions import ValidationError
 from common.custom_logger import app_logger
 from products.models import Category
 
-sort_items = ["rating", "price", "reviews", "date"]
+sort_items = ["rating", "price", "reviews", "date", "relevance"]
 sort_types = ["dec", "inc"]
 
 
@@ -32,6 +32,10 @@ class CatalogQueryParamsSerializer(serializers.Serializer):
     )
     sort = serializers.CharField(required=False, default="date")
     sortType = serializers.CharField(required=False, default="dec")
+    cursor = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True,
+    )
+    facets = serializers.BooleanField(required=False, default=False)
 
     def validate_category(self, value: int) -> int:
         """Extra category id validation. Check that category id is existed"""
@@ -73,11 +77,15 @@ class CatalogQueryParamsSerializer(serializers.Serializer):
                 else None
             ),
             "filters": self._get_filter_items(instance),
+            "search": instance.get("name") or None,
+            "tags": sorted(set(instance.get("tags", []))),
             "sort": self._get_sort_item(instance),
             "pagination": {
                 "current_page": instance["currentPage"],
                 "limit": instance["limit"],
+                "cursor": instance.get("cursor"),
             },
+            "facets": instance["facets"],
         }
 
     @staticmethod
@@ -89,12 +97,6 @@ class CatalogQueryParamsSerializer(serializers.Serializer):
 
         """
         filter_items = {}
-        if instance.get("name"):
-            filter_items["title__icontains"] = instance["name"]
-
-        if instance.get("tags"):
-            filter_items["tags__id__in"] = instance["tags"]
-
         if instance.get("available"):
             filter_items["count__gte"] = 1
 
@@ -102,10 +104,10 @@ class CatalogQueryParamsSerializer(serializers.Serializer):
             filter_items["free_delivery"] = instance["freeDelivery"]
 
         if instance.get("minPrice") is not None:
-            filter_items["price__gte"] = instance["minPrice"]
+            filter_items["final_price__gte"] = instance["minPrice"]
 
         if instance.get("maxPrice") is not None:
-            filter_items["price__lte"] = instance["maxPrice"]
+            filter_items["final_price__lte"] = instance["maxPrice"]
 
         return filter_items
 
@@ -114,18 +116,24 @@ class CatalogQueryParamsSerializer(serializers.Serializer):
         """Create str for order_by method in query set.
 
         Drop fields if value is not set for optional fields and rename fields
-        to use in  order_by method in query set.
+        to use in  order_by method in query set. Sort by 'relevance' is
+        available for search by name only else sort by 'date' is used.
 
         """
         if not instance.get("sort"):
             return
 
-        if instance["sort"] == "date":
+        if (
+                instance["sort"] == "date" or
+                (instance["sort"] == "relevance" and not instance.get("name"))
+        ):
             order_by_field = "created_date"
         elif instance["sort"] == "reviews":
-            order_by_field = "total_reviews"
+            order_by_field = "review_count"
         elif instance["sort"] == "rating":
-            order_by_field = "total_sailed"
+            order_by_field = "rating"
+        elif instance["sort"] == "price":
+            order_by_field = "final_price"
         else:
             order_by_field = instance["sort"]
 
@@ -4,8 +4,7 @@ from typing import Union, Optional
 
 from rest_framework import serializers
 
-from .category_image import CategoryImageSerializer
-from products.models import Category
+from products.models import Category, CategoryImage
 
 
 class InCategoryIdSerializer(serializers.Serializer):
@@ -30,55 +29,48 @@ class InCategoryIdSerializer(serializers.Serializer):
             return {"id": instance["category"]}
 
 
-class OutSubcategorySerializer(serializers.ModelSerializer):
-    """Class is used for serializing subcategory (Category model class).
-
-    Set default value for image field if not provided.
-
-    """
-    image = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Category
-        fields = ("id", "title", "image")
-
-    def get_image(self, obj: Category) -> Union[str, dict]:
-        """set default value for image field if not provided."""
-
-        if obj.image:
-            return CategoryImageSerializer(obj.image).data
-        else:
-            return "Not set"
-
-
-class OutCategoriesTreeSerializer(serializers.ModelSerializer):
+class OutCategoriesTreeSerializer:
     """Class is used for serializing categories tree.
 
-    Serialize only active subcategories and set default value for image field
-    if not provided.
+    Tree is assembled from one flat query of active categories with
+    images: root categories with their active subcategories, both sorted
+    by title. Default value is set for image field if not provided.
 
     """
-    image = serializers.SerializerMethodField()
-    subcategories = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Category
-        fields = ("id", "title", "image", "subcategories")
-
-    def get_image(self, obj: Category) -> Union[str, dict]:
-        """set default value for image field if not provided."""
-
-        if obj.image:
-            return CategoryImageSerializer(obj.image).data
-        else:
+    image_storage = CategoryImage._meta.get_field("src").storage
+
+    @classmethod
+    def serialize(cls) -> list[dict]:
+        """Get active root categories with subcategories."""
+
+        roots = []
+        subcategories = {}
+        for category in Category.get_tree_rows():
+            category_data = {
+                "id": category["id"],
+                "title": category["title"],
+                "image": cls._get_image(category),
+            }
+            if category["parent_id"] is None:
+                category_data["subcategories"] = []
+                roots.append(category_data)
+            else:
+                subcategories.setdefault(category["parent_id"], []).append(
+                    category_data,
+                )
+
+        for root in roots:
+            root["subcategories"] = subcategories.get(root["id"], [])
+        return roots
+
+    @classmethod
+    def _get_image(cls, category: dict) -> Union[str, dict]:
+        """Get image data of category or default value if not provided."""
+
+        if not category["image__src"]:
             return "Not set"
 
-    def get_subcategories(self, obj: Category) -> Union[list, list[dict]]:
-        """Serialize only active subcategories else pass."""
-
-        subcategories = []
-        for subcategory in obj.subcategories.order_by("title").all():
-            if subcategory.is_active:
-                subcategories.append(OutSubcategorySerializer(subcategory).data)
-
-        return subcategories
+        return {
+            "src": cls.image_storage.url(category["image__src"]),
+            "alt": category["image__alt"],
+        }
@@ -1,15 +1,27 @@
 """Serializers with related model Product."""
 
 from datetime import datetime, date
-from typing import Optional
+from decimal import Decimal
+from typing import Iterable, Optional
 
+from django.db.models import QuerySet
 from rest_framework import serializers
 
 from .product_tag import ProductTagSerializer, SpecificProductTagSerializer
 from .product_review import ProductReviewSerializer
 from .product_specification import ProductSpecificationsSerializer
 from .product_image import ProductImageSerializer
-from products.models import Product, ProductImage
+from products.models import Product, ProductAndTag, ProductImage
+
+rating_field = serializers.DecimalField(max_digits=2, decimal_places=1)
+
+
+def get_rating_representation(
+        rating: Decimal, review_count: int,
+) -> Optional[str]:
+    """Get Product rating as in responses, None if it has no reviews."""
+
+    return rating_field.to_representation(rating) if review_count else None
 
 
 class CommonProductSerializer(serializers.ModelSerializer):
@@ -21,6 +33,7 @@ class CommonProductSerializer(serializers.ModelSerializer):
     description = serializers.SerializerMethodField()
     freeDelivery = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
+    rating = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -70,6 +83,11 @@ class CommonProductSerializer(serializers.ModelSerializer):
             return [{"alt": ""}]
         return ProductImageSerializer(images, many=True).data
 
+    def get_rating(self, obj: Product) -> Optional[str]:
+        """Get Product rating, None if Product has no reviews."""
+
+        return get_rating_representation(obj.rating, obj.review_count)
+
 
 class OutSpecialProductSerializer(CommonProductSerializer):
     """Class is used to serialize Product for group specific format.
@@ -87,10 +105,129 @@ class OutSpecialProductSerializer(CommonProductSerializer):
         return obj.reviews.count() if hasattr(obj, "reviews") else 0
 
 
+class ProductCardSerializer:
+    """Class is used to serialize Products for listings (product cards).
+
+    Cards have the same format as 'OutSpecialProductSerializer', but are
+    built in one pass from values of products, images and tags, so any
+    number of products costs three queries.
+
+    """
+    products_fields = (
+        "id",
+        "category_id",
+        "final_price",
+        "count",
+        "created_date",
+        "title",
+        "shot_description",
+        "free_delivery",
+        "rating",
+        "review_count",
+    )
+    image_storage = ProductImage._meta.get_field("src").storage
+
+    @classmethod
+    def serialize(cls, query_set: QuerySet) -> list[dict]:
+        """Get cards of products from query set in its order."""
+
+        products = list(
+            query_set.prefetch_related(None).values(*cls.products_fields)
+        )
+        return cls._get_cards(products)
+
+    @classmethod
+    def serialize_ids(cls, products_ids: Iterable[int]) -> list[dict]:
+        """Get cards of products in order of ids, skip not existed ones."""
+
+        products_ids = list(products_ids)
+        products = {
+            product["id"]: product
+            for product in (
+                Product.objects.
+                filter(id__in=products_ids).
+                values(*cls.products_fields)
+            )
+        }
+        return cls._get_cards(
+            [
+                products[product_id]
+                for product_id in products_ids
+                if product_id in products
+            ]
+        )
+
+    @classmethod
+    def _get_cards(cls, products: list[dict]) -> list[dict]:
+        """Build cards from products values with their images and tags."""
+
+        if not products:
+            return []
+
+        products_ids = [product["id"] for product in products]
+        images = cls._get_products_images(products_ids)
+        tags = cls._get_products_tags(products_ids)
+        cards = []
+        for product in products:
+            product_id = product["id"]
+            cards.append({
+                "id": product_id,
+                "category": product["category_id"],
+                "price": float(product["final_price"]),
+                "count": product["count"],
+                "date": product["created_date"],
+                "title": product["title"],
+                "description": product["shot_description"],
+                "freeDelivery": product["free_delivery"],
+                "images": images.get(product_id) or [{"alt": ""}],
+                "rating": get_rating_representation(
+                    product["rating"], product["review_count"],
+                ),
+                "reviews": product["review_count"],
+                "tags": tags.get(product_id, []),
+            })
+        return cards
+
+    @classmethod
+    def _get_products_images(cls, products_ids: list[int]) -> dict:
+        """Get {product id: [image data]} for products."""
+
+        images = {}
+        for product_id, src, alt in (
+                ProductImage.objects.
+                filter(product_id__in=products_ids).
+                order_by("id").
+                values_list("product_id", "src", "alt")
+        ):
+            images.setdefault(product_id, []).append({
+                "src": cls.image_storage.url(src) if src else None,
+                "alt": alt,
+            })
+        return images
+
+    @staticmethod
+    def _get_products_tags(products_ids: list[int]) -> dict:
+        """Get {product id: [tag data]} for products."""
+
+        tags = {}
+        for product_id, tag_id, tag_name in (
+                ProductAndTag.objects.
+                filter(product_id__in=products_ids).
+                order_by("id").
+                values_list("product_id", "tag_id", "tag__name")
+        ):
+            tags.setdefault(product_id, []).append(
+                {"id": tag_id, "name": tag_name},
+            )
+        return tags
+
+
 class OutProductFullSerializer(CommonProductSerializer):
     """Class is used to serialize Product for (GET /product)."""
 
-    reviews = ProductReviewSerializer(many=True, required=False)
+    reviews = ProductReviewSerializer(
+        source="latest_reviews", many=True, required=False,
+    )
     specifications = ProductSpecificationsSerializer(many=True, required=False)
     tags = SpecificProductTagSerializer(many=True, required=False)
     fullDescription = serializers.SerializerMethodField()
@@ -2,8 +2,15 @@
 
 from rest_framework import serializers
 
+from .catalog import sort_types
+from products.constants import (
+    DEFAULT_PAGINATION_LIMIT,
+    MAX_REVIEWS_LIMIT,
+)
 from products.models import ProductReview
 
+review_sort_items = ["date", "rate"]
+
 
 class ProductReviewSerializer(serializers.ModelSerializer):
     """Class is used for serializing ProductReview."""
@@ -11,3 +18,45 @@ class ProductReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductReview
         fields = ("author", "email", "text", "date", "rate")
+
+
+class InProductReviewsSerializer(serializers.Serializer):
+    """Class is used for validation query params for GET product reviews."""
+
+    sort = serializers.ChoiceField(choices=review_sort_items, default="date")
+    sortType = serializers.ChoiceField(choices=sort_types, default="dec")
+    cursor = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True,
+    )
+    limit = serializers.IntegerField(
+        required=False,
+        default=DEFAULT_PAGINATION_LIMIT,
+        min_value=1,
+        max_value=MAX_REVIEWS_LIMIT,
+    )
+
+    def to_representation(self, instance: dict) -> dict:
+        """Sort and arrange validated data in required format."""
+
+        sort_prefix = "-" if instance["sortType"] == "dec" else ""
+        return {
+            "sort": sort_prefix + instance["sort"],
+            "cursor": instance.get("cursor") or None,
+            "limit": instance["limit"],
+        }
+
+
+class InProductDetailsSerializer(serializers.Serializer):
+    """Class is used for validation query params for GET product."""
+
+    reviews = serializers.IntegerField(
+        required=False,
+        default=None,
+        min_value=0,
+        max_value=MAX_REVIEWS_LIMIT,
+    )
+
+    def to_representation(self, instance: dict) -> dict:
+        """Sort and arrange validated data in required format."""
+
+        return {"total_reviews": instance["reviews"]}
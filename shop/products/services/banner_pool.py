@@ -0,0 +1,125 @@
+"""Pool of ids of products for banners (active and available products)."""
+
+from array import array
+from random import sample
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from common.custom_logger import app_logger
+from products.constants import BANNER_POOL_BUILT_KEY, BANNER_POOL_KEY
+from products.models import Product
+
+pool_build_batch_size = 1000
+
+
+class BannerProductsPool:
+    """Class keeps ids of products which can be shown in banners.
+
+    With Redis cache ids are kept in Redis set and random ids are taken
+    with SRANDMEMBER, so sampling costs O(k) whatever total products. Set
+    is built on first use and updated for changed products by signals.
+    With other caches ids are cached as compact array which is rebuilt
+    after products changes.
+
+    """
+
+    @classmethod
+    def sample(cls, total_products: int) -> list[int]:
+        """Get up to total products random distinct ids."""
+
+        redis = cls._get_redis()
+        if redis is None:
+            return cls._sample_array(total_products)
+
+        pool_key = cache.make_key(BANNER_POOL_KEY)
+        products_ids = redis.srandmember(pool_key, total_products)
+        if not products_ids and not redis.exists(
+                cache.make_key(BANNER_POOL_BUILT_KEY),
+        ):
+            cls._build_set(redis)
+            products_ids = redis.srandmember(pool_key, total_products)
+        return [int(product_id) for product_id in products_ids]
+
+    @classmethod
+    def refresh(cls, products_ids: Iterable[int]) -> None:
+        """Add or remove changed products after commit of transaction."""
+
+        products_ids = set(products_ids)
+        if not products_ids:
+            return
+
+        def refresh_pool() -> None:
+            redis = cls._get_redis()
+            if redis is None:
+                cache.delete(BANNER_POOL_KEY)
+                return
+
+            if not redis.exists(cache.make_key(BANNER_POOL_BUILT_KEY)):
+                return
+
+            pool_key = cache.make_key(BANNER_POOL_KEY)
+            available_ids = set(Product.get_products_ids(products_ids))
+            unavailable_ids = products_ids - available_ids
+            pipeline = redis.pipeline()
+            if available_ids:
+                pipeline.sadd(pool_key, *available_ids)
+            if unavailable_ids:
+                pipeline.srem(pool_key, *unavailable_ids)
+            pipeline.execute()
+
+        transaction.on_commit(refresh_pool)
+
+    @staticmethod
+    def _get_redis():
+        """Get Redis client of default cache or None for other caches."""
+
+        try:
+            return get_redis_connection("default")
+        except NotImplementedError:
+            return None
+
+    @staticmethod
+    def _build_set(redis) -> None:
+        """Build Redis set from all available products ids.
+
+        Set is filled under temporary key and renamed, so readers never
+        see partially built pool.
+
+        """
+        products_ids = Product.get_products_ids()
+        pool_key = cache.make_key(BANNER_POOL_KEY)
+        building_key = f"{pool_key}:building"
+        pipeline = redis.pipeline()
+        pipeline.delete(building_key)
+        for start in range(0, len(products_ids), pool_build_batch_size):
+            pipeline.sadd(
+                building_key,
+                *products_ids[start:start + pool_build_batch_size],
+            )
+        if products_ids:
+            pipeline.rename(building_key, pool_key)
+        else:
+            pipeline.delete(pool_key)
+        pipeline.set(cache.make_key(BANNER_POOL_BUILT_KEY), 1)
+        pipeline.execute()
+        app_logger.info(f"Banner pool is built for {len(products_ids)} ids")
+
+    @staticmethod
+    def _sample_array(total_products: int) -> list[int]:
+        """Get random ids from cached array of ids, build it if missed."""
+
+        products_ids = array("q")
+        cached_ids = cache.get(BANNER_POOL_KEY)
+        if cached_ids is None:
+            products_ids.extend(Product.get_products_ids())
+            cache.set(BANNER_POOL_KEY, products_ids.tobytes(), timeout=None)
+        else:
+            products_ids.frombytes(cached_ids)
+
+        rows = sample(
+            range(len(products_ids)), min(total_products, len(products_ids)),
+        )
+        return [products_ids[row] for row in rows]
@@ -1,13 +1,11 @@
 """Handle business logi for catalog related endpoints"""
 
+from time import time
 from traceback import format_exc as tb_format_exc
 from typing import Optional
 
-from django.core.cache import cache
-from django.db import models
-from django.db.models import Case, Count, F, Sum, QuerySet, Q, When
-from django.http import QueryDict
-from django.utils.timezone import now
+from django.db.models import Count, QuerySet, Q
+from django.http import HttpResponse, QueryDict
 
 from rest_framework.status import (
     HTTP_200_OK,
@@ -15,49 +13,226 @@ from rest_framework.status import (
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
 from rest_framework.response import Response
 
-from .common import apply_pagination_to_qs, get_pagination_last_page
+from .banner_pool import BannerProductsPool
+from .common import (
+    apply_keyset_pagination_to_qs,
+    apply_pagination_to_qs,
+    get_pagination_last_page,
+)
+from .product import ProductHandler
+from .product_index import ProductColumnarIndex
+from .sales_feed import SalesFeed
+from .search import ProductSearch
+from common.cache import (
+    RenderedResponse,
+    StaleWhileRevalidateCache,
+    TaggedCache,
+    build_cache_key,
+)
 from common.custom_logger import app_logger
 from common.utils import server_error
-from products.models import Product, Category
+from products.constants import (
+    ALL_CATEGORIES_CACHE_TAG,
+    CATALOG_CACHE_STALE_TIMEOUT,
+    CATALOG_CACHE_TIMEOUT,
+    CATALOG_COUNT_CACHE_TIMEOUT,
+    CATALOG_COUNT_CAP,
+    CATALOG_FACETS_PRICE_BUCKETS,
+    CATEGORY_CACHE_TAG,
+    POPULAR_CACHE_TAG,
+    PRODUCT_CACHE_TAG,
+)
+from products.models import (
+    Category,
+    CategoryClosure,
+    Product,
+    ProductAndTag,
+)
 from products.serializers import (
     CatalogQueryParamsSerializer,
-    OutSpecialProductSerializer,
+    ProductCardSerializer,
 )
 
 
 class CatalogHandler:
     """Class for handling business logic of catalog related endpoints."""
 
-    _base_query_set = (
-        Product.objects.select_related("category").
-        prefetch_related("images", "reviews", "tags").
-        distinct()
-    )
+    _cache_key_prefix = "catalog"
+    _count_cache_key_prefix = "catalog_count"
+    _facets_cache_key_prefix = "catalog_facets"
+    _base_query_set = Product.objects.all()
 
     @classmethod
-    def get_catalog_response(cls, search_details: QueryDict) -> Response:
+    def get_catalog_response(cls, request: Request) -> HttpResponse | Response:
         """Handle logic to get Products as per catalog search details.
 
-        If search_details is cached then return cached response.
+        Validate search details and build canonical cache key from them.
+        If response is cached then return cached response (expired response
+        is returned while it is refreshed in background).
         Else:
-            - Validate search details.
-            - Select Products as per Category id and its subcategories.
+            - Select Products as per Category id and its subcategories of
+              any depth.
               Filter and sort products as per query params and filter
               is_active=True for Product and Category and apply pagination.
-            -Cache response data for 60sec.
+              If query param 'cursor' is set (even blank) then use keyset
+              pagination and return 'next'/'prev' cursors instead of pages.
+              If columnar index is enabled and supports query then page
+              products ids are selected from index.
+            - If query param 'facets' is true then add counts of matched
+              products per tag, price bucket, free delivery and availability.
+            - Cache rendered response tagged with filter category, products
+              and their categories. Cache is invalidated by changes of them.
+        Return '304 Not Modified' if If-None-Match matches ETag of response,
+        so ETag is changed only by changes of the page.
 
         """
         try:
-            response_data = cache.get(str(search_details))
-            app_logger.debug(f"GET CACHE {search_details=} {response_data=}")
-            if response_data:
-                return Response(*response_data)
-
             validated_search_details = cls._get_validated_search_details(
-                search_details,
+                request.query_params,
+            )
+            cache_key = build_cache_key(
+                cls._cache_key_prefix, validated_search_details,
             )
+            rendered_response = StaleWhileRevalidateCache.get_or_set(
+                cache_key,
+                lambda: cls._get_catalog_response_data(
+                    validated_search_details,
+                ),
+                CATALOG_CACHE_TIMEOUT,
+                CATALOG_CACHE_STALE_TIMEOUT,
+            )
+            return RenderedResponse.to_response(rendered_response, request)
+        except ValidationError as exc:
+            return Response({"error": str(exc)}, HTTP_400_BAD_REQUEST)
+        except Exception:
+            app_logger.error(f"{tb_format_exc()}")
+            return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def invalidate_products_cache(products_ids: list[int]) -> None:
+        """Invalidate cached catalog pages which include products.
+
+        Versions of products (ETags) are changed and products are refreshed
+        in columnar index and cached products details as well.
+
+        """
+        tags = [
+            PRODUCT_CACHE_TAG.format(id=product_id)
+            for product_id in products_ids
+        ]
+        TaggedCache.invalidate(tags)
+        ProductColumnarIndex.mark_changed(products_ids)
+        ProductHandler.refresh_products_cache(products_ids)
+
+    @staticmethod
+    def invalidate_categories_cache(categories_ids: list[int]) -> None:
+        """Invalidate cached catalog pages filtered by categories.
+
+        Pages filtered by ancestor categories of any depth and not filtered
+        by category are invalidated as well.
+
+        """
+        categories_ids = {
+            category_id for category_id in categories_ids if category_id
+        }
+        categories_ids.update(
+            CategoryClosure.objects.
+            filter(descendant_id__in=categories_ids).
+            values_list("ancestor_id", flat=True)
+        )
+        tags = [
+            CATEGORY_CACHE_TAG.format(id=category_id)
+            for category_id in categories_ids
+        ]
+        tags.append(ALL_CATEGORIES_CACHE_TAG)
+        TaggedCache.invalidate(tags)
+        ProductColumnarIndex.mark_changed([])
+
+    @staticmethod
+    def invalidate_popularity_cache(products_ids: list[int]) -> None:
+        """Invalidate cached popular products after popularity rebuild.
+
+        Changed products are refreshed in columnar index as well.
+
+        """
+        TaggedCache.invalidate([POPULAR_CACHE_TAG])
+        ProductColumnarIndex.mark_changed(products_ids)
+
+    @classmethod
+    def invalidate_stock_cache(
+            cls, products_quantities: dict[int, int],
+    ) -> None:
+        """Invalidate cached responses with products after stock change.
+
+        Quantities {product id: quantity} are taken from or returned to
+        stock. Pages filtered by categories (and not filtered) are
+        invalidated only for products which stock is at most quantity, as
+        they could become available or unavailable by this change.
+
+        """
+        available_counts = Product.get_available_counts(
+            list(products_quantities),
+        )
+        changed_ids, unchanged_ids = [], []
+        for product_id, quantity in products_quantities.items():
+            if available_counts.get(product_id, 0) <= abs(quantity):
+                changed_ids.append(product_id)
+            else:
+                unchanged_ids.append(product_id)
+        if changed_ids:
+            cls.invalidate_products_categories_cache(changed_ids)
+        if unchanged_ids:
+            cls.invalidate_products_cache(unchanged_ids)
+
+    @classmethod
+    def invalidate_products_categories_cache(
+            cls, products_ids: list[int],
+    ) -> None:
+        """Invalidate cached catalog pages with products and their categories.
+
+        Used if products can be added to or removed from filtered pages
+        (and banner pool or sales feed).
+
+        """
+        cls.invalidate_products_cache(products_ids)
+        BannerProductsPool.refresh(products_ids)
+        SalesFeed.refresh(products_ids)
+        categories_ids = set(
+            CategoryClosure.objects.
+            filter(
+                descendant_id__in=(
+                    Product.objects.
+                    filter(id__in=products_ids).
+                    values("category_id")
+                ),
+            ).
+            values_list("ancestor_id", flat=True)
+        )
+        tags = [
+            CATEGORY_CACHE_TAG.format(id=category_id)
+            for category_id in categories_ids
+        ]
+        tags.append(ALL_CATEGORIES_CACHE_TAG)
+        TaggedCache.invalidate(tags)
+
+    @classmethod
+    def _get_catalog_response_data(
+            cls, validated_search_details: dict,
+    ) -> tuple[dict, set[str]]:
+        """Get rendered catalog response and its cache tags."""
+
+        if cls._is_indexed(validated_search_details):
+            catalog_data = cls._get_indexed_catalog_data(
+                validated_search_details,
+            )
+        elif validated_search_details["pagination"]["cursor"] is not None:
+            catalog_data = cls._get_cursor_catalog_data(
+                validated_search_details,
+            )
+        else:
             catalog_data = {
                 "items": cls._get_products_data(validated_search_details),
                 "currentPage":
@@ -65,20 +240,43 @@ class CatalogHandler:
                 "lastPage":
                     cls._get_catalog_last_page(validated_search_details),
             }
-            response_data = (catalog_data, HTTP_200_OK)
-        except ValidationError as exc:
-            response_data = ({"error": str(exc)}, HTTP_400_BAD_REQUEST)
-        except Exception:
-            app_logger.error(f"{tb_format_exc()}")
-            response_data = (server_error, HTTP_500_INTERNAL_SERVER_ERROR)
+        if validated_search_details["facets"]:
+            catalog_data["facets"] = cls._get_catalog_facets(
+                validated_search_details,
+            )
+        app_logger.debug(f"{catalog_data=}")
+        cache_tags = cls._get_cache_tags(
+            validated_search_details, catalog_data["items"],
+        )
+        return RenderedResponse.render(catalog_data, HTTP_200_OK), cache_tags
+
+    @staticmethod
+    def _get_cache_tags(query_params: dict, products: list) -> set[str]:
+        """Get cache tags for catalog page.
+
+        Tag page with filter category (or all categories), products and
+        categories of products.
 
-        app_logger.debug(f"SET CACHE {search_details=}: {response_data=}")
-        cache.set(str(search_details), response_data, 60)
-        return Response(*response_data)
+        """
+        if query_params["category_id"]:
+            tags = {CATEGORY_CACHE_TAG.format(id=query_params["category_id"])}
+        else:
+            tags = {ALL_CATEGORIES_CACHE_TAG}
+
+        for product in products:
+            tags.add(PRODUCT_CACHE_TAG.format(id=product["id"]))
+            if product["category"]:
+                tags.add(CATEGORY_CACHE_TAG.format(id=product["category"]))
+        return tags
 
     @staticmethod
     def _get_validated_search_details(query_params: QueryDict) -> dict:
-        """Validate and sort request query params."""
+        """Validate and sort request query params.
+
+        Sort by 'relevance' is replaced by sort by 'created_date' if search
+        text has no tokens, as products are not ranked then.
+
+        """
 
         query_params = CatalogQueryParamsSerializer(
             data={
@@ -93,97 +291,256 @@ class CatalogHandler:
                 "sort": query_params.get("sort"),
                 "sortType": query_params.get("sortType"),
                 "tags": query_params.getlist("tags[]"),
+                "cursor": query_params.get("cursor"),
+                "facets": query_params.get("facets", False),
             },
         )
         query_params.is_valid(raise_exception=True)
-        return query_params.data
+        validated_search_details = query_params.data
+        sort = validated_search_details["sort"]
+        if (
+                sort and sort.endswith("relevance") and
+                not ProductSearch.is_ranked(validated_search_details["search"])
+        ):
+            validated_search_details["sort"] = sort.replace(
+                "relevance", "created_date",
+            )
+        return validated_search_details
 
-    @staticmethod
-    def _add_filters_to_qs(
-            query_set: QuerySet, category_id: Optional[int], filters: dict,
-    ) -> QuerySet:
-        """Add filters to catalog query set"""
-        query_set = query_set.filter(Q(is_active=True))
-        if category_id:
+    @classmethod
+    def _get_filtered_qs(cls, query_params: dict) -> QuerySet:
+        """Get catalog query set filtered as per validated query params.
+
+        Products matched search text are annotated with 'relevance'. Tags
+        are filtered with subquery so products are not duplicated by join.
+
+        """
+        query_set = cls._base_query_set.filter(Q(is_active=True))
+        if query_params["category_id"]:
             query_set = query_set.filter(
-                Q(category_id=category_id) | Q(category__parent_id=category_id)
+                category_id__in=Category.get_descendants_ids(
+                    query_params["category_id"],
+                ),
+            )
+        if query_params["tags"]:
+            query_set = query_set.filter(
+                id__in=(
+                    ProductAndTag.objects.
+                    filter(tag_id__in=query_params["tags"]).
+                    values("product_id")
+                )
+            )
+        if query_params["filters"]:
+            query_set = query_set.filter(**query_params["filters"])
+        if query_params["search"]:
+            query_set = ProductSearch.search(
+                query_set, query_params["search"],
             )
-        if filters:
-            query_set = query_set.filter(**filters)
         return query_set
 
     @staticmethod
     def _add_sort_to_qs(query_set: QuerySet, sort: str) -> QuerySet:
-        """Add order by field to query set and annotate it if required."""
+        """Add order by field to query set.
 
-        if not sort:
-            return query_set
+        Id is the last sort key (in direction of sort field) as in catalog
+        index, so products with equal sort values are in the same order.
 
-        if sort.endswith("total_reviews"):
-            query_set = (
-                query_set.annotate(total_reviews=Count("reviews__id")).
-                order_by(sort)
-            )
-        elif sort.endswith("total_sailed"):
-            query_set = (
-                query_set.annotate(
-                    total_sailed=Sum("orderandproduct__total_quantity")
-                ).order_by(sort)
-            )
-        elif sort.endswith("price"):
-            sort = sort.replace("price", "final_price")
-            query_set = (
-                query_set.annotate(final_price=Case(
-                    When(
-                        Q(is_sales=True) &
-                        Q(sales_price__isnull=False) &
-                        (Q(sales_from__lte=now()) | Q(sales_from__isnull=True)) &
-                        (Q(sales_to__gte=now()) | Q(sales_to__isnull=True)),
-                        then=F("sales_price")
-                    ),
-                    default=F("price"),
-                    output_field=models.DecimalField()
-                    )
-                ).order_by(sort)
-            )
-        else:
-            query_set = query_set.order_by(sort)
+        """
+        if not sort:
+            return query_set.order_by("id")
 
-        return query_set
+        id_sort = "-id" if sort.startswith("-") else "id"
+        return query_set.order_by(sort, id_sort)
 
     @classmethod
     def _get_products_data(cls, query_params: dict) -> dict:
         """Get Products data as per validated request query params."""
 
-        catalog_qs = cls._add_filters_to_qs(
-            cls._base_query_set,
-            query_params["category_id"],
-            query_params["filters"],
+        catalog_qs = cls._add_sort_to_qs(
+            cls._get_filtered_qs(query_params), query_params["sort"],
         )
-        catalog_qs = cls._add_sort_to_qs(catalog_qs, query_params["sort"])
         catalog_qs = apply_pagination_to_qs(
             catalog_qs,
             query_params["pagination"]["current_page"],
             query_params["pagination"]["limit"],
         )
         app_logger.debug(f"{catalog_qs=}")
-        catalog_data = OutSpecialProductSerializer(catalog_qs, many=True)
-        app_logger.debug(f"{catalog_data.data=}")
-        return catalog_data.data
+        catalog_data = ProductCardSerializer.serialize(catalog_qs)
+        app_logger.debug(f"{catalog_data=}")
+        return catalog_data
+
+    @staticmethod
+    def _is_indexed(query_params: dict) -> bool:
+        """Check that catalog page is selected from columnar index.
+
+        Fallback to ORM is logged if index is enabled.
+
+        """
+        if not ProductColumnarIndex.is_enabled():
+            return False
+
+        if ProductColumnarIndex.supports(query_params):
+            return True
+
+        app_logger.info(f"Catalog index is not used for {query_params=}")
+        return False
+
+    @classmethod
+    def _get_indexed_catalog_data(cls, query_params: dict) -> dict:
+        """Get Products data page as per validated query params from index.
+
+        Only products of page are selected from DB in order of index.
+
+        """
+        products_ids, total_products = (
+            ProductColumnarIndex.get_index().search(query_params)
+        )
+        return {
+            "items": ProductCardSerializer.serialize_ids(products_ids),
+            "currentPage": query_params["pagination"]["current_page"],
+            "lastPage": get_pagination_last_page(
+                total_products, query_params["pagination"]["limit"],
+            ),
+        }
+
+    @classmethod
+    def _get_cursor_catalog_data(cls, query_params: dict) -> dict:
+        """Get Products data page and cursors as per validated query params.
+
+        Keyset pagination is used, sort key and id of the page boundary
+        products are encoded in 'next'/'prev' cursors.
+
+        """
+        catalog_qs = cls._add_sort_to_qs(
+            cls._get_filtered_qs(query_params), query_params["sort"],
+        )
+        products, next_cursor, prev_cursor = apply_keyset_pagination_to_qs(
+            catalog_qs,
+            query_params["sort"],
+            query_params["pagination"]["cursor"],
+            query_params["pagination"]["limit"],
+        )
+        return {
+            "items": ProductCardSerializer.serialize_ids(
+                product.id for product in products
+            ),
+            "next": next_cursor,
+            "prev": prev_cursor,
+        }
+
+    @staticmethod
+    def _get_filter_set(query_params: dict) -> dict:
+        """Get query params which define matched products set."""
+
+        return {
+            key: query_params[key]
+            for key in ("category_id", "filters", "search", "tags")
+        }
 
     @classmethod
     def _get_catalog_last_page(cls, query_params: dict) -> int:
         """Get last page for catalog pagination.
 
-        Use validated request query params to do define total matched products
-        and then count last page.
-        """
+        Total matched products is cached per filters (without sort and
+        pagination) with own longer TTL and invalidated with catalog pages.
+        Total is capped by CATALOG_COUNT_CAP, so counting of broad filters
+        costs as counting of CATALOG_COUNT_CAP products.
 
-        catalog_qs = cls._add_filters_to_qs(
-            cls._base_query_set,
-            query_params["category_id"],
-            query_params["filters"],
+        """
+        cache_key = build_cache_key(
+            cls._count_cache_key_prefix, cls._get_filter_set(query_params),
         )
+        total_products = TaggedCache.get(cache_key)
+        app_logger.debug(f"GET CACHE {cache_key=} {total_products=}")
+        if total_products is None:
+            computed_since = time()
+            total_products = (
+                cls._get_filtered_qs(query_params).
+                order_by().
+                values("id")
+                [:CATALOG_COUNT_CAP].
+                count()
+            )
+            TaggedCache.set(
+                cache_key,
+                total_products,
+                cls._get_cache_tags(query_params, []),
+                CATALOG_COUNT_CACHE_TIMEOUT,
+                computed_since=computed_since,
+            )
         return get_pagination_last_page(
-            catalog_qs.count(), query_params["pagination"]["limit"],
+            total_products, query_params["pagination"]["limit"],
+        )
+
+    @classmethod
+    def _get_catalog_facets(cls, query_params: dict) -> dict:
+        """Get counts of matched products per filter value.
+
+        Price buckets, free delivery and availability are counted with
+        conditional aggregation in one query and tags in one grouped query.
+        Facets are cached per filters (without sort and pagination) and
+        invalidated with catalog pages.
+
+        """
+        cache_key = build_cache_key(
+            cls._facets_cache_key_prefix, cls._get_filter_set(query_params),
+        )
+        facets = TaggedCache.get(cache_key)
+        app_logger.debug(f"GET CACHE {cache_key=} {facets=}")
+        if facets is not None:
+            return facets
+
+        computed_since = time()
+        filtered_qs = cls._get_filtered_qs(query_params).order_by()
+        price_buckets = list(zip(
+            CATALOG_FACETS_PRICE_BUCKETS,
+            CATALOG_FACETS_PRICE_BUCKETS[1:] + (None,),
+        ))
+        prices_filters = {}
+        for index, (min_price, max_price) in enumerate(price_buckets):
+            price_filter = Q(final_price__gte=min_price)
+            if max_price is not None:
+                price_filter &= Q(final_price__lt=max_price)
+            prices_filters[f"price_{index}"] = Count("id", filter=price_filter)
+        counts = filtered_qs.aggregate(
+            total=Count("id"),
+            free_delivery=Count("id", filter=Q(free_delivery=True)),
+            available=Count("id", filter=Q(count__gte=1)),
+            **prices_filters,
+        )
+        tags_counts = (
+            ProductAndTag.objects.
+            filter(product_id__in=filtered_qs.values("id")).
+            values("tag_id", "tag__name").
+            annotate(count=Count("product_id")).
+            order_by("tag_id")
+        )
+        facets = {
+            "total": counts["total"],
+            "tags": [
+                {
+                    "id": tag_count["tag_id"],
+                    "name": tag_count["tag__name"],
+                    "count": tag_count["count"],
+                }
+                for tag_count in tags_counts
+            ],
+            "prices": [
+                {
+                    "minPrice": min_price,
+                    "maxPrice": max_price,
+                    "count": counts[f"price_{index}"],
+                }
+                for index, (min_price, max_price) in enumerate(price_buckets)
+            ],
+            "freeDelivery": counts["free_delivery"],
+            "available": counts["available"],
+        }
+        TaggedCache.set(
+            cache_key,
+            facets,
+            cls._get_cache_tags(query_params, []),
+            CATALOG_CACHE_TIMEOUT,
+            computed_since=computed_since,
         )
+        return facets
@@ -3,12 +3,17 @@
 from traceback import format_exc as tb_format_exc
 
 from django.core.cache import cache
+from django.http import HttpResponse
 from rest_framework.response import Response
 from rest_framework import status
 
+from common.cache import RenderedResponse, SingleFlight, TaggedCache
 from common.custom_logger import app_logger
 from common.utils import server_error
-from products.models import Category
+from products.constants import (
+    CATEGORIES_CACHE_TIMEOUT,
+    CATEGORIES_TREE_CACHE_TAG,
+)
 from products.serializers import OutCategoriesTreeSerializer
 
 category_max_nesting_level = 1
@@ -17,12 +22,20 @@ category_id_unset_error = {"error": "Category id is not set!"}
 
 
 class CategoryHandler:
-    """Class for handling business logic of category related endpoints."""
+    """Class for handling business logic of category related endpoints.
 
-    _category_tree_cache_key = "Category tree"
+    Rendered categories tree is cached under key with version of
+    categories tree tag, which is changed by any category or category
+    image change. Every process keeps its copy of tree until version is
+    changed, so tree costs one cache request.
+
+    """
+
+    _category_tree_cache_key = "category_tree:{version}"
+    _process_tree: tuple[str, dict] | None = None
 
     @classmethod
-    def get_categories_response(cls) -> Response:
+    def get_categories_response(cls) -> HttpResponse | Response:
         """Get all categories.
 
         Create categories tree with subcategories. Include only active
@@ -30,26 +43,41 @@ class CategoryHandler:
 
         """
         try:
-            response_data = cache.get(cls._category_tree_cache_key)
-            app_logger.debug(
-                f"GET CACHE {cls._category_tree_cache_key=} {response_data=}"
-            )
-            if response_data:
-                return Response(*response_data)
-
-            categories_qs = Category.get_root_categories_with_prefetch()
-            categories_tree_data = OutCategoriesTreeSerializer(
-                categories_qs, many=True,
-            ).data
-            response_data = (categories_tree_data, status.HTTP_200_OK)
+            version = TaggedCache.get_versions(
+                [CATEGORIES_TREE_CACHE_TAG],
+            )[CATEGORIES_TREE_CACHE_TAG]
+            process_tree = cls._process_tree
+            if process_tree is not None and process_tree[0] == version:
+                return RenderedResponse.to_response(process_tree[1])
+
+            cache_key = cls._category_tree_cache_key.format(version=version)
+            rendered_response = cache.get(cache_key)
+            if rendered_response is None:
+                rendered_response = SingleFlight.compute(
+                    cache_key,
+                    lambda: cls._cache_categories_response(cache_key),
+                    lambda: cache.get(cache_key),
+                )
+            cls._process_tree = (version, rendered_response)
+            return RenderedResponse.to_response(rendered_response)
         except Exception:
             app_logger.error(tb_format_exc())
             return Response(
                 server_error, status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        else:
-            app_logger.debug(
-                f"SET CACHE {cls._category_tree_cache_key=}: {response_data=}"
-            )
-            cache.set(cls._category_tree_cache_key, response_data, 60)
-            return Response(*response_data)
+
+    @staticmethod
+    def invalidate_categories_tree_cache() -> None:
+        """Invalidate cached categories tree (and change its version)."""
+
+        TaggedCache.invalidate([CATEGORIES_TREE_CACHE_TAG])
+
+    @staticmethod
+    def _cache_categories_response(cache_key: str) -> dict:
+        """Get rendered categories tree response and cache it."""
+
+        rendered_response = RenderedResponse.render(
+            OutCategoriesTreeSerializer.serialize(), status.HTTP_200_OK,
+        )
+        cache.set(cache_key, rendered_response, CATEGORIES_CACHE_TIMEOUT)
+        return rendered_response
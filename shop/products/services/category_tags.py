@@ -0,0 +1,80 @@
+"""Cached map of categories tags (rendered tags responses)."""
+
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.status import HTTP_200_OK
+
+from common.cache import RenderedResponse, SingleFlight
+from common.custom_logger import app_logger
+from products.constants import CATEGORY_TAGS_CACHE_TIMEOUT, CATEGORY_TAGS_KEY
+from products.models import Category, CategoryTag, ProductTag
+
+
+class CategoryTagsMap:
+    """Class keeps rendered tags responses of all active categories.
+
+    Map {category id: rendered tags} (None key for all tags) is built from
+    CategoryTag rows and cached under one key, so tags of any category are
+    got by one cache request. Map is deleted after changes of products tags,
+    tags or categories and rebuilt on next request.
+
+    """
+
+    @classmethod
+    def get(cls) -> dict[Optional[int], dict]:
+        """Get map of rendered tags responses, build it if missed."""
+
+        categories_tags = cache.get(CATEGORY_TAGS_KEY)
+        if categories_tags is not None:
+            return categories_tags
+
+        return SingleFlight.compute(
+            CATEGORY_TAGS_KEY,
+            cls._build,
+            lambda: cache.get(CATEGORY_TAGS_KEY),
+        )
+
+    @staticmethod
+    def invalidate() -> None:
+        """Delete cached map after commit of transaction."""
+
+        transaction.on_commit(lambda: cache.delete(CATEGORY_TAGS_KEY))
+
+    @staticmethod
+    def _build() -> dict[Optional[int], dict]:
+        """Build map by three queries and cache it."""
+
+        tags = {
+            tag["id"]: tag
+            for tag in ProductTag.objects.order_by("id").values("id", "name")
+        }
+        categories_tags = {
+            category_id: []
+            for category_id in (
+                Category.objects.
+                filter(is_active=True).
+                values_list("id", flat=True)
+            )
+        }
+        for category_id, tag_id in (
+                CategoryTag.objects.
+                order_by("tag_id").
+                values_list("category_id", "tag_id")
+        ):
+            if category_id in categories_tags:
+                categories_tags[category_id].append(tags[tag_id])
+
+        rendered_tags = {
+            None: RenderedResponse.render(list(tags.values()), HTTP_200_OK),
+        }
+        rendered_tags.update(
+            (category_id, RenderedResponse.render(category_tags, HTTP_200_OK))
+            for category_id, category_tags in categories_tags.items()
+        )
+        cache.set(
+            CATEGORY_TAGS_KEY, rendered_tags, CATEGORY_TAGS_CACHE_TIMEOUT,
+        )
+        app_logger.debug(f"Categories tags are built for {len(tags)} tags")
+        return rendered_tags
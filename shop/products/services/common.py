@@ -1,7 +1,18 @@
-from django.db.models import QuerySet
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+from decimal import Decimal
+from json import dumps as json_dumps, loads as json_loads
+from typing import Any, Optional
+
+from django.db.models import Model, QuerySet, Q
+from rest_framework.exceptions import ValidationError
 
 from products.constants import DEFAULT_PAGINATION_LIMIT
 
+invalid_cursor_error = "Cursor is invalid or expired!"
+cursor_directions = ("next", "prev")
+
 
 def apply_pagination_to_qs(
     query_set: QuerySet,
@@ -25,3 +36,96 @@ def get_pagination_last_page(
         return int(total_records / page_limit)
 
     return int(total_records // page_limit + 1)
+
+
+def _to_cursor_value(value: Any) -> Any:
+    """Convert sort key value to json compatible type without losing data."""
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+    elif isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(sort: str, item: Model, direction: str) -> str:
+    """Encode opaque cursor with sort key value and id of boundary item."""
+
+    position = {
+        "sort": sort,
+        "value": _to_cursor_value(getattr(item, sort.lstrip("-"))),
+        "id": item.id,
+        "direction": direction,
+    }
+    return urlsafe_b64encode(json_dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> dict:
+    """Decode cursor and check that it was built for the same sort key."""
+
+    try:
+        position = json_loads(urlsafe_b64decode(cursor.encode()))
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        raise ValidationError(invalid_cursor_error)
+
+    if (
+            not isinstance(position, dict) or
+            position.get("sort") != sort or
+            position.get("direction") not in cursor_directions or
+            not isinstance(position.get("id"), int) or
+            "value" not in position
+    ):
+        raise ValidationError(invalid_cursor_error)
+
+    return position
+
+
+def apply_keyset_pagination_to_qs(
+    query_set: QuerySet,
+    sort: str,
+    cursor: Optional[str],
+    limit: int = DEFAULT_PAGINATION_LIMIT,
+) -> tuple[list, Optional[str], Optional[str]]:
+    """Apply keyset (cursor) pagination to queryset.
+
+    Page is selected with condition on sort key and id (tie-breaker) of the
+    boundary item from cursor instead of OFFSET, so any page costs the same
+    as the first one if sort key is indexed. Sort key must be a field or
+    annotation of query set.
+
+    Returns:
+        tuple[list, Optional[str], Optional[str]]: page items, next and
+        previous page cursors
+
+    """
+    sort_field = sort.lstrip("-")
+    position = decode_cursor(cursor, sort) if cursor else None
+    is_backward = bool(position) and position["direction"] == "prev"
+    is_desc_scan = sort.startswith("-") != is_backward
+    lookup = "lt" if is_desc_scan else "gt"
+    if position:
+        query_set = query_set.filter(
+            Q(**{f"{sort_field}__{lookup}": position["value"]}) |
+            Q(**{
+                sort_field: position["value"],
+                f"id__{lookup}": position["id"],
+            })
+        )
+
+    scan_order = "-" if is_desc_scan else ""
+    query_set = query_set.order_by(scan_order + sort_field, scan_order + "id")
+    items = list(query_set[:limit + 1])
+    has_more = len(items) > limit
+    items = items[:limit]
+    if is_backward:
+        items.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, position is not None
+
+    if not items:
+        return items, None, None
+
+    next_cursor = encode_cursor(sort, items[-1], "next") if has_next else None
+    prev_cursor = encode_cursor(sort, items[0], "prev") if has_prev else None
+    return items, next_cursor, prev_cursor
@@ -1,10 +1,13 @@
 """Handle business logi for products related endpoints"""
 
+from time import time
 from traceback import format_exc as tb_format_exc
-
-from random import sample
+from typing import Iterable, Optional
 
 from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
 from rest_framework.exceptions import ValidationError
 
 from rest_framework.response import Response
@@ -15,16 +18,34 @@ from rest_framework.status import (
     HTTP_400_BAD_REQUEST,
 )
 
-from .common import apply_pagination_to_qs, get_pagination_last_page
+from .banner_pool import BannerProductsPool
+from .common import get_pagination_last_page
+from .sales_feed import SalesFeed
+from common.cache import (
+    RenderedResponse,
+    StaleWhileRevalidateCache,
+    TaggedCache,
+    build_cache_key,
+)
 from common.custom_logger import app_logger
 from common.utils import server_error
-from products.constants import DEFAULT_PAGINATION_LIMIT
-from products.models import Product
+from products.constants import (
+    ALL_CATEGORIES_CACHE_TAG,
+    DEFAULT_PAGINATION_LIMIT,
+    POPULAR_CACHE_TAG,
+    PRODUCT_CACHE_TAG,
+    PRODUCTS_CACHE_STALE_TIMEOUT,
+    PRODUCTS_CACHE_TIMEOUT,
+    SALES_FEED_CACHE_TAG,
+)
+from products.models import Category, Product
 from products.serializers import (
+    InCategoryIdSerializer,
+    InProductDetailsSerializer,
     InSalesProductSerializer,
     OutSalesProductSerializer,
-    OutSpecialProductSerializer,
     OutProductFullSerializer,
+    ProductCardSerializer,
 )
 
 product_id_error = {"error": "Product id is not existed!"}
@@ -36,104 +57,146 @@ total_banners_products = 3
 
 
 class ProductHandler:
-    """Class for handling business logic Product related endpoints"""
+    """Class for handling business logic Product related endpoints
 
-    @staticmethod
-    def get_popular_products_response() -> Response:
-        """Get popular products."""
+    Responses are cached rendered (see RenderedResponse) and tagged with
+    products, so they are invalidated by products changes.
+
+    """
+
+    _sales_cache_key_prefix = "sales"
+    _popular_cache_key_prefix = "popular"
+    _limited_cache_key = "limited"
+    _card_cache_key_prefix = "product_card"
+    _product_cache_key_prefix = "product"
 
+    @classmethod
+    def get_popular_products_response(
+            cls, query_params: dict,
+    ) -> HttpResponse | Response:
+        """Get popular products of all or of requested category.
+
+        Products are ranked by sales for last days (see ProductSales), so
+        only ids of top products are selected and response is joined from
+        cached products cards. Response is invalidated by rebuild of
+        popularity.
+
+        """
         try:
-            popular_products_qs = Product.get_popular_products(
-                total_popular_products,
-            )
-            popular_products = OutSpecialProductSerializer(
-                popular_products_qs, many=True,
+            category_id = None
+            if query_params.get("category"):
+                category = InCategoryIdSerializer(data=query_params)
+                category.is_valid(raise_exception=True)
+                category_id = category.data["id"]
+            rendered_response = StaleWhileRevalidateCache.get_or_set(
+                build_cache_key(cls._popular_cache_key_prefix, category_id),
+                lambda: cls._get_popular_response_data(category_id),
+                PRODUCTS_CACHE_TIMEOUT,
+                PRODUCTS_CACHE_STALE_TIMEOUT,
             )
-            return Response(popular_products.data, HTTP_200_OK)
+            return RenderedResponse.to_response(rendered_response)
+        except ValidationError as exc:
+            return Response({"error": str(exc)}, HTTP_400_BAD_REQUEST)
         except Exception:
             app_logger.error(tb_format_exc())
             return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @staticmethod
-    def get_limited_products_response() -> Response:
+    @classmethod
+    def get_limited_products_response(cls) -> HttpResponse | Response:
         """Get limited products."""
 
         try:
-            limited_products_qs = Product.get_limited_products(
-                total_limited_products,
-            )
-            limited_products = OutSpecialProductSerializer(
-                limited_products_qs, many=True,
+            rendered_response = StaleWhileRevalidateCache.get_or_set(
+                cls._limited_cache_key,
+                lambda: cls._get_special_products_response_data(
+                    Product.get_limited_products(total_limited_products),
+                ),
+                PRODUCTS_CACHE_TIMEOUT,
+                PRODUCTS_CACHE_STALE_TIMEOUT,
             )
-            return Response(limited_products.data, HTTP_200_OK)
+            return RenderedResponse.to_response(rendered_response)
         except Exception:
             app_logger.error(tb_format_exc())
             return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @staticmethod
-    def get_banners_products_response() -> Response:
-        """Get banners products (3 random active products)."""
+    @classmethod
+    def get_banners_products_response(cls) -> HttpResponse | Response:
+        """Get banners products (3 random active products).
 
+        Random ids are taken from banner pool. Every banner product is
+        cached rendered separately, so response is joined from cached
+        products and only missed ones are rendered.
+
+        """
         try:
-            products_ids = Product.get_products_ids()
+            products_ids = BannerProductsPool.sample(total_banners_products)
             if not products_ids:
                 return Response([], HTTP_200_OK)
-            elif total_banners_products > len(products_ids):
-                maxl_banners_products = len(products_ids)
-            else:
-                maxl_banners_products = total_banners_products
-
-            random_products_ids = sample(products_ids, maxl_banners_products)
-            banners_products_qs = Product.get_banners_products(
-                random_products_ids,
-            )
-            banners_products = OutSpecialProductSerializer(
-                banners_products_qs, many=True,
+
+            return RenderedResponse.to_response(
+                RenderedResponse.join(
+                    cls._get_products_cards_bodies(products_ids),
+                )
             )
-            return Response(banners_products.data, HTTP_200_OK)
         except Exception:
             app_logger.error(tb_format_exc())
             return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
 
     @classmethod
-    def get_sales_products_response(cls, query_params: dict) -> Response:
-        """Get sales products response."""
+    def get_sales_products_response(
+            cls, query_params: dict,
+    ) -> HttpResponse | Response:
+        """Get sales products response.
 
-        try:
-            response_data = cache.get(query_params)
-            app_logger.debug(f"GET CACHE {query_params=} {response_data=}")
-            if response_data:
-                return Response(*response_data)
+        Page is built from precomputed sales feed and cached as long as
+        the feed, i.e. till the nearest sales window boundary or changes of
+        sales products.
 
+        """
+        try:
             query_data = InSalesProductSerializer(data=query_params)
             query_data.is_valid(raise_exception=True)
             current_page = query_data.data["current_page"]
-            sales_products_details = {
-                "items": cls._get_sales_products_data(current_page),
-                "currentPage": current_page,
-                "lastPage": get_pagination_last_page(
-                    Product.get_sales_products().count()
-                ),
-            }
-            response_data = (sales_products_details, HTTP_200_OK)
+            cache_key = build_cache_key(
+                cls._sales_cache_key_prefix, current_page,
+            )
+            rendered_response = TaggedCache.get(cache_key)
+            if rendered_response is None:
+                rendered_response = cls._cache_sales_response(
+                    cache_key, current_page,
+                )
+            return RenderedResponse.to_response(rendered_response)
         except ValidationError as exc:
             return Response({"error": str(exc)}, HTTP_400_BAD_REQUEST)
         except Exception:
             app_logger.error(tb_format_exc())
             return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            app_logger.debug(f"SET CACHE {query_params=}: {response_data=}")
-            cache.set(query_params, response_data, 5)
-            return Response(*response_data)
 
-    @staticmethod
-    def get_product_by_id_response(product_id: int) -> Response:
-        """Get product by id."""
+    @classmethod
+    def get_product_by_id_response(
+            cls, product_id: int, query_params: dict,
+    ) -> HttpResponse | Response:
+        """Get product by id with all or latest reviews ('reviews' param).
 
+        Details with all reviews (param is not set) are refreshed after
+        changes of product (see refresh_products_cache).
+
+        """
         try:
-            product = Product.get_by_id_with_prefetch(product_id)
-            product_details = OutProductFullSerializer(product)
-            return Response(product_details.data, HTTP_200_OK)
+            query_data = InProductDetailsSerializer(data=query_params)
+            query_data.is_valid(raise_exception=True)
+            total_reviews = query_data.data["total_reviews"]
+            rendered_response = StaleWhileRevalidateCache.get_or_set(
+                cls._get_product_cache_key(product_id, total_reviews),
+                lambda: cls._get_product_response_data(
+                    product_id, total_reviews,
+                ),
+                PRODUCTS_CACHE_TIMEOUT,
+                PRODUCTS_CACHE_STALE_TIMEOUT,
+            )
+            return RenderedResponse.to_response(rendered_response)
+        except ValidationError as exc:
+            return Response({"error": str(exc)}, HTTP_400_BAD_REQUEST)
         except Product.DoesNotExist:
             app_logger.info(f"Product with id {product_id} does not exist!")
             return Response(product_id_error, HTTP_404_NOT_FOUND)
@@ -141,14 +204,212 @@ class ProductHandler:
             app_logger.error(tb_format_exc())
             return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @classmethod
+    def refresh_products_cache(cls, products_ids: Iterable[int]) -> None:
+        """Re-render cached products details after commit of transaction.
+
+        Write-through for changed products: details of active products which
+        are cached (even if invalidated) are re-rendered in background, so
+        popular products are not missed after changes.
+
+        """
+        products_ids = set(products_ids)
+        if not products_ids:
+            return
+
+        def refresh_products() -> None:
+            cache_keys = {
+                product_id: cls._get_product_cache_key(product_id)
+                for product_id in products_ids
+            }
+            cached_keys = cache.get_many(cache_keys.values()).keys()
+            cached_ids = [
+                product_id
+                for product_id, cache_key in cache_keys.items()
+                if cache_key in cached_keys
+            ]
+            if not cached_ids:
+                return
+
+            for product_id in Product.get_active_products_ids(cached_ids):
+                StaleWhileRevalidateCache.refresh(
+                    cache_keys[product_id],
+                    lambda product_id=product_id: (
+                        cls._get_product_response_data(product_id)
+                    ),
+                    PRODUCTS_CACHE_TIMEOUT,
+                    PRODUCTS_CACHE_STALE_TIMEOUT,
+                )
+
+        transaction.on_commit(refresh_products)
+
+    @classmethod
+    def warm_products_cache(cls, total_products: int) -> int:
+        """Cache details of top popular products.
+
+        Return total cached products.
+
+        """
+        products_ids = list(
+            Product.get_popular_products(total_products).
+            values_list("id", flat=True)
+        )
+        for product_id in products_ids:
+            computed_since = time()
+            rendered_response, cache_tags = cls._get_product_response_data(
+                product_id,
+            )
+            TaggedCache.set(
+                cls._get_product_cache_key(product_id),
+                rendered_response,
+                cache_tags,
+                PRODUCTS_CACHE_TIMEOUT,
+                PRODUCTS_CACHE_STALE_TIMEOUT,
+                computed_since,
+            )
+        return len(products_ids)
+
+    @classmethod
+    def _get_product_cache_key(
+            cls, product_id: int, total_reviews: Optional[int] = None,
+    ) -> str:
+        """Get cache key of rendered product details."""
+
+        if total_reviews is None:
+            return f"{cls._product_cache_key_prefix}:{product_id}"
+
+        return (
+            f"{cls._product_cache_key_prefix}:{product_id}:{total_reviews}"
+        )
+
+    @staticmethod
+    def _get_special_products_response_data(
+            products_qs: QuerySet,
+    ) -> tuple[dict, set[str]]:
+        """Get rendered special products response and its cache tags.
+
+        Response is tagged with all categories tag as well, so it is
+        invalidated by any product change which can change products set.
+
+        """
+        products_data = ProductCardSerializer.serialize(products_qs)
+        cache_tags = {ALL_CATEGORIES_CACHE_TAG}
+        cache_tags.update(
+            PRODUCT_CACHE_TAG.format(id=product["id"])
+            for product in products_data
+        )
+        return RenderedResponse.render(products_data, HTTP_200_OK), cache_tags
+
+    @classmethod
+    def _get_popular_response_data(
+            cls, category_id: Optional[int],
+    ) -> tuple[dict, set[str]]:
+        """Get rendered popular products response and its cache tags."""
+
+        products_ids = list(
+            Product.get_popular_products(
+                total_popular_products,
+                (
+                    Category.get_descendants_ids(category_id)
+                    if category_id else None
+                ),
+            ).
+            values_list("id", flat=True)
+        )
+        cache_tags = {ALL_CATEGORIES_CACHE_TAG, POPULAR_CACHE_TAG}
+        cache_tags.update(
+            PRODUCT_CACHE_TAG.format(id=product_id)
+            for product_id in products_ids
+        )
+        return (
+            RenderedResponse.join(
+                cls._get_products_cards_bodies(products_ids),
+            ),
+            cache_tags,
+        )
+
+    @classmethod
+    def _get_products_cards_bodies(
+            cls, products_ids: list[int],
+    ) -> list[bytes]:
+        """Get rendered products cards, render and cache missed ones.
+
+        Cards are kept in order of ids, missed cards are cached with one
+        cache request.
+
+        """
+        cache_keys = {
+            product_id: f"{cls._card_cache_key_prefix}:{product_id}"
+            for product_id in products_ids
+        }
+        bodies = TaggedCache.get_many(cache_keys.values())
+        missed_ids = [
+            product_id
+            for product_id, cache_key in cache_keys.items()
+            if cache_key not in bodies
+        ]
+        if missed_ids:
+            computed_since = time()
+            missed_bodies = {}
+            for product in ProductCardSerializer.serialize_ids(missed_ids):
+                missed_bodies[cache_keys[product["id"]]] = (
+                    RenderedResponse.render(product)["body"],
+                    [PRODUCT_CACHE_TAG.format(id=product["id"])],
+                )
+            TaggedCache.set_many(
+                missed_bodies, PRODUCTS_CACHE_TIMEOUT, computed_since,
+            )
+            bodies.update(
+                (cache_key, body)
+                for cache_key, (body, _) in missed_bodies.items()
+            )
+        return [
+            bodies[cache_key]
+            for cache_key in cache_keys.values()
+            if cache_key in bodies
+        ]
+
+    @staticmethod
+    def _cache_sales_response(cache_key: str, current_page: int) -> dict:
+        """Get rendered sales products page and cache it as long as feed."""
+
+        computed_since = time()
+        feed = SalesFeed.get()
+        offset = (current_page - 1) * DEFAULT_PAGINATION_LIMIT
+        page_ids = feed["ids"][offset:offset + DEFAULT_PAGINATION_LIMIT]
+        sales_products_details = {
+            "items": OutSalesProductSerializer(
+                Product.get_sales_products().filter(id__in=page_ids),
+                many=True,
+            ).data,
+            "currentPage": current_page,
+            "lastPage": get_pagination_last_page(feed["total"]),
+        }
+        rendered_response = RenderedResponse.render(
+            sales_products_details, HTTP_200_OK,
+        )
+        cache_tags = [SALES_FEED_CACHE_TAG]
+        cache_tags.extend(
+            PRODUCT_CACHE_TAG.format(id=product_id) for product_id in page_ids
+        )
+        TaggedCache.set(
+            cache_key,
+            rendered_response,
+            cache_tags,
+            SalesFeed.get_timeout(feed),
+            computed_since=computed_since,
+        )
+        return rendered_response
+
     @staticmethod
-    def _get_sales_products_data(
-            current_page: int, limit: int = DEFAULT_PAGINATION_LIMIT,
-    ) -> dict:
-        """Get sales Products data."""
-
-        sales_products_qs = Product.get_sales_products()
-        sales_products_qs = apply_pagination_to_qs(
-            sales_products_qs, current_page, limit,
+    def _get_product_response_data(
+            product_id: int, total_reviews: Optional[int] = None,
+    ) -> tuple[dict, list]:
+        """Get rendered product response and its cache tags."""
+
+        product = Product.get_by_id_with_prefetch(product_id, total_reviews)
+        product_details = OutProductFullSerializer(product).data
+        return (
+            RenderedResponse.render(product_details, HTTP_200_OK),
+            [PRODUCT_CACHE_TAG.format(id=product_id)],
         )
-        return OutSalesProductSerializer(sales_products_qs, many=True).data
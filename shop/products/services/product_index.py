@@ -0,0 +1,372 @@
+"""In-memory columnar index of active products for catalog.
+
+NumPy is optional dependency (extra 'catalog-index'), index is disabled if
+it is not installed.
+
+"""
+
+from threading import Lock
+from traceback import format_exc as tb_format_exc
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from common.custom_logger import app_logger
+from products.constants import (
+    CATALOG_INDEX_CHANGES_TIMEOUT,
+    CATALOG_INDEX_CHANGES_KEY,
+    CATALOG_INDEX_VERSION_KEY,
+)
+from products.models import CategoryClosure, Product, ProductAndTag
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+index_columns = {
+    "id": "int64",
+    "category_id": "int64",
+    "final_price": "float64",
+    "count": "int64",
+    "free_delivery": "bool",
+    "created_date": "float64",
+    "total_sold": "int64",
+    "rating": "float64",
+    "review_count": "int64",
+}
+index_filters = {
+    "count__gte",
+    "free_delivery",
+    "final_price__gte",
+    "final_price__lte",
+}
+index_sorts = {"created_date", "review_count", "rating", "final_price"}
+tag_mask_bits = 64
+
+
+class ProductColumnarIndex:
+    """Class keeps active products as NumPy arrays (one per column).
+
+    Catalog filters, sort and pagination are applied with vectorized
+    operations and only ids of products for requested page are returned.
+    Category filter matches category and its subcategories from categories
+    map. Tags of product are kept as bitmask (row of uint64 words).
+
+    Index is built on start of worker process by 'warm_up' (it is built on
+    first use if process is not warmed up). Product changes are journaled in
+    cache by signals ('mark_changed') and applied by every process before
+    query, so all processes are refreshed incrementally. If journal is lost
+    (evicted from cache) then index is rebuilt fully.
+
+    """
+
+    _instance = None
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._columns: Optional[dict] = None
+        self._tag_masks = None
+        self._tags_bits: dict[int, int] = {}
+        self._subcategories: dict[int, list[int]] = {}
+        self._version: Optional[int] = None
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Check that index is switched on in settings and NumPy is set."""
+
+        return settings.SHOP_CATALOG_INDEX and np is not None
+
+    @classmethod
+    def get_index(cls) -> "ProductColumnarIndex":
+        """Get index of current process."""
+
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def warm_up(cls) -> None:
+        """Build index of current process if it is switched on in settings.
+
+        Errors are logged, index is built on first use then.
+
+        """
+        if not settings.SHOP_CATALOG_INDEX:
+            return
+
+        if np is None:
+            app_logger.warning(
+                "NumPy is not installed, catalog is selected by ORM"
+            )
+            return
+
+        try:
+            cls.get_index().build()
+        except Exception:
+            app_logger.error(f"{tb_format_exc()}")
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def supports(query_params: dict) -> bool:
+        """Check that catalog query can be handled by index.
+
+        Full-text search and keyset pagination are handled by ORM.
+
+        """
+        return (
+            not query_params["search"] and
+            query_params["pagination"]["cursor"] is None and
+            set(query_params["filters"]) <= index_filters and
+            (
+                not query_params["sort"] or
+                query_params["sort"].lstrip("-") in index_sorts
+            )
+        )
+
+    @classmethod
+    def mark_changed(cls, products_ids: Iterable[int]) -> None:
+        """Journal changed products after commit of current transaction.
+
+        Empty products ids are journaled to reload categories map only.
+
+        """
+        if not cls.is_enabled():
+            return
+
+        products_ids = list(products_ids)
+
+        def add_changes() -> None:
+            cache.add(CATALOG_INDEX_VERSION_KEY, 0, timeout=None)
+            try:
+                version = cache.incr(CATALOG_INDEX_VERSION_KEY)
+            except ValueError:
+                app_logger.warning("Catalog index version is not cached")
+                return
+
+            cache.set(
+                CATALOG_INDEX_CHANGES_KEY.format(version=version),
+                products_ids,
+                CATALOG_INDEX_CHANGES_TIMEOUT,
+            )
+
+        transaction.on_commit(add_changes)
+
+    def search(self, query_params: dict) -> tuple[list[int], int]:
+        """Get ids of products for page and total matched products.
+
+        Query params are validated catalog query params supported by index.
+
+        """
+        with self._lock:
+            self._sync()
+            selected = self._get_selected_rows(query_params)
+            rows = np.flatnonzero(selected)
+            rows = self._sort_rows(rows, query_params["sort"])
+            limit = query_params["pagination"]["limit"]
+            offset = (query_params["pagination"]["current_page"] - 1) * limit
+            page_rows = rows[offset:offset + limit]
+            return self._columns["id"][page_rows].tolist(), len(rows)
+
+    def build(self) -> int:
+        """Build index from all active products.
+
+        Return total indexed products.
+
+        """
+        with self._lock:
+            return self._build()
+
+    def _build(self) -> int:
+        """Build index from all active products (lock is acquired)."""
+
+        self._version = cache.get(CATALOG_INDEX_VERSION_KEY)
+        self._load_categories()
+        self._columns = self._get_empty_columns()
+        self._tags_bits = {}
+        self._tag_masks = np.zeros((0, 1), dtype="uint64")
+        self._add_products(Product.objects.filter(is_active=True))
+        app_logger.info(
+            f"Catalog index is built for {len(self._columns['id'])} products"
+        )
+        return len(self._columns["id"])
+
+    def _sync(self) -> None:
+        """Build index or apply journaled changes from other processes."""
+
+        if self._columns is None:
+            self._build()
+            return
+
+        version = cache.get(CATALOG_INDEX_VERSION_KEY)
+        if version is None or version == self._version:
+            return
+
+        last_version = self._version or 0
+        changes = cache.get_many([
+            CATALOG_INDEX_CHANGES_KEY.format(version=changes_version)
+            for changes_version in range(last_version + 1, version + 1)
+        ])
+        if version < last_version or len(changes) != version - last_version:
+            app_logger.info("Catalog index journal is lost, rebuild index")
+            self._build()
+            return
+
+        products_ids = set()
+        for changed_ids in changes.values():
+            products_ids.update(changed_ids)
+        self._load_categories()
+        self._refresh_products(products_ids)
+        self._version = version
+
+    @staticmethod
+    def _get_empty_columns() -> dict:
+        """Get columns without rows."""
+
+        return {
+            column: np.empty(0, dtype=dtype)
+            for column, dtype in index_columns.items()
+        }
+
+    def _load_categories(self) -> None:
+        """Load map {category id: [category id, active subcategories ids]}."""
+
+        self._subcategories = {}
+        for ancestor_id, descendant_id in (
+                CategoryClosure.get_active_rows().values_list(
+                    "ancestor_id", "descendant_id",
+                )
+        ):
+            self._subcategories.setdefault(ancestor_id, []).append(
+                descendant_id,
+            )
+
+    def _refresh_products(self, products_ids: set[int]) -> None:
+        """Replace rows of changed products with their current state."""
+
+        if not products_ids:
+            return
+
+        kept = ~np.isin(self._columns["id"], list(products_ids))
+        for column in self._columns:
+            self._columns[column] = self._columns[column][kept]
+        self._tag_masks = self._tag_masks[kept]
+        self._add_products(
+            Product.objects.filter(id__in=products_ids, is_active=True),
+        )
+
+    def _add_products(self, query_set) -> None:
+        """Append rows of products from query set."""
+
+        rows = {column: [] for column in index_columns}
+        for product in query_set.values(
+                "id",
+                "category_id",
+                "final_price",
+                "count",
+                "free_delivery",
+                "created_date",
+                "total_sold",
+                "rating",
+                "review_count",
+        ).iterator():
+            rows["id"].append(product["id"])
+            rows["category_id"].append(product["category_id"] or 0)
+            rows["final_price"].append(float(product["final_price"]))
+            rows["count"].append(product["count"])
+            rows["free_delivery"].append(product["free_delivery"])
+            rows["created_date"].append(product["created_date"].timestamp())
+            rows["total_sold"].append(product["total_sold"])
+            rows["rating"].append(float(product["rating"]))
+            rows["review_count"].append(product["review_count"])
+
+        if not rows["id"]:
+            return
+
+        tags_rows = {product_id: [] for product_id in rows["id"]}
+        for product_id, tag_id in (
+                ProductAndTag.objects.
+                filter(product_id__in=rows["id"]).
+                values_list("product_id", "tag_id")
+        ):
+            tags_rows[product_id].append(self._get_tag_bit(tag_id))
+
+        tag_masks = np.zeros(
+            (len(rows["id"]), self._tag_masks.shape[1]), dtype="uint64",
+        )
+        for row, product_id in enumerate(rows["id"]):
+            for bit in tags_rows[product_id]:
+                tag_masks[row, bit // tag_mask_bits] |= np.uint64(
+                    1 << (bit % tag_mask_bits)
+                )
+
+        for column, dtype in index_columns.items():
+            self._columns[column] = np.concatenate(
+                (self._columns[column], np.array(rows[column], dtype=dtype)),
+            )
+        self._tag_masks = np.concatenate((self._tag_masks, tag_masks))
+
+    def _get_tag_bit(self, tag_id: int) -> int:
+        """Get bit of tag in mask, extend masks with new word if required."""
+
+        if tag_id not in self._tags_bits:
+            self._tags_bits[tag_id] = len(self._tags_bits)
+            words = self._tags_bits[tag_id] // tag_mask_bits + 1
+            if words > self._tag_masks.shape[1]:
+                self._tag_masks = np.pad(
+                    self._tag_masks,
+                    ((0, 0), (0, words - self._tag_masks.shape[1])),
+                )
+        return self._tags_bits[tag_id]
+
+    def _get_selected_rows(self, query_params: dict):
+        """Get boolean mask of rows matched catalog filters."""
+
+        columns = self._columns
+        selected = np.ones(len(columns["id"]), dtype="bool")
+        if query_params["category_id"]:
+            selected &= np.isin(
+                columns["category_id"],
+                self._subcategories.get(query_params["category_id"], []),
+            )
+        if query_params["tags"]:
+            selected &= self._get_tags_rows(query_params["tags"])
+
+        filters = query_params["filters"]
+        if "count__gte" in filters:
+            selected &= columns["count"] >= filters["count__gte"]
+        if "free_delivery" in filters:
+            selected &= columns["free_delivery"] == filters["free_delivery"]
+        if "final_price__gte" in filters:
+            selected &= columns["final_price"] >= filters["final_price__gte"]
+        if "final_price__lte" in filters:
+            selected &= columns["final_price"] <= filters["final_price__lte"]
+        return selected
+
+    def _get_tags_rows(self, tags_ids: list[int]):
+        """Get boolean mask of rows with any of tags."""
+
+        query_mask = np.zeros(self._tag_masks.shape[1], dtype="uint64")
+        for tag_id in tags_ids:
+            bit = self._tags_bits.get(tag_id)
+            if bit is not None:
+                query_mask[bit // tag_mask_bits] |= np.uint64(
+                    1 << (bit % tag_mask_bits)
+                )
+        return (self._tag_masks & query_mask).any(axis=1)
+
+    def _sort_rows(self, rows, sort: Optional[str]):
+        """Sort rows by sort column and id as tie-breaker."""
+
+        ids = self._columns["id"][rows]
+        if not sort:
+            return rows[np.argsort(ids, kind="stable")]
+
+        keys = self._columns[sort.lstrip("-")][rows]
+        if sort.startswith("-"):
+            return rows[np.lexsort((-ids, -keys))]
+        return rows[np.lexsort((ids, keys))]
+
@@ -1,21 +1,30 @@
 """Handle business logi for product review related endpoints"""
 
+from time import time
 from traceback import format_exc as tb_format_exc
 
 from django.db import IntegrityError
+from django.http import HttpResponse
 from rest_framework.exceptions import ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
+from common.cache import TaggedCache
 from common.custom_logger import app_logger
 from common.utils import server_error
+from products.constants import PRODUCT_CACHE_TAG, PRODUCTS_CACHE_TIMEOUT
 from products.models import Product, ProductReview
-from products.serializers import ProductReviewSerializer
+from products.serializers import (
+    InProductReviewsSerializer,
+    ProductReviewSerializer,
+)
+from .common import apply_keyset_pagination_to_qs
 from .product import product_id_error
 
 min_review_rate = 0
@@ -28,6 +37,48 @@ class ProductReviewHandler:
     _review_duplication_error = (
         "User with email '{email}' has already published the review!"
     )
+    _rating_cache_key_prefix = "review_rating"
+
+    @classmethod
+    def get_reviews_response(
+            cls, product_id: int, query_params: dict,
+    ) -> HttpResponse | Response:
+        """Get page of product reviews with product rating summary.
+
+        Keyset pagination is used, reviews are sorted by date or rate and
+        'next'/'prev' cursors are returned. Rating summary (average and
+        histogram of rates) is cached per product.
+
+        """
+        try:
+            query_data = InProductReviewsSerializer(data=query_params)
+            query_data.is_valid(raise_exception=True)
+            query_params = query_data.data
+            if not Product.objects.filter(
+                    id=product_id, is_active=True,
+            ).exists():
+                return Response(product_id_error, HTTP_404_NOT_FOUND)
+
+            reviews, next_cursor, prev_cursor = apply_keyset_pagination_to_qs(
+                ProductReview.get_product_reviews(product_id),
+                query_params["sort"],
+                query_params["cursor"],
+                query_params["limit"],
+            )
+            return Response(
+                {
+                    "items": ProductReviewSerializer(reviews, many=True).data,
+                    "next": next_cursor,
+                    "prev": prev_cursor,
+                    "rating": cls._get_rating_summary(product_id),
+                },
+                HTTP_200_OK,
+            )
+        except ValidationError as exc:
+            return Response({"error": str(exc)}, HTTP_400_BAD_REQUEST)
+        except Exception:
+            app_logger.error(tb_format_exc())
+            return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
 
     @classmethod
     def add_review_response(cls, product_id: int, request: Request) -> Response:
@@ -40,14 +91,15 @@ class ProductReviewHandler:
         try:
             review_data = ProductReviewSerializer(data=request.data)
             review_data.is_valid(raise_exception=True)
+            if not Product.objects.filter(id=product_id).exists():
+                raise Product.DoesNotExist
+
             ProductReview.objects.create(
                 **review_data.data, product_id=product_id,
             )
-            product = (
-                Product.objects.prefetch_related("reviews").get(pk=product_id)
-            )
             product_reviews = ProductReviewSerializer(
-                product.reviews, many=True,
+                ProductReview.get_product_reviews(product_id).order_by("id"),
+                many=True,
             )
             return Response(product_reviews.data, HTTP_200_OK)
         except ValidationError as exc:
@@ -65,3 +117,44 @@ class ProductReviewHandler:
         except Exception:
             app_logger.error(tb_format_exc())
             return Response(server_error, HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @classmethod
+    def _get_rating_summary(cls, product_id: int) -> dict:
+        """Get cached rating summary (average, total and rates histogram).
+
+        Summary is counted by one grouped query, so it is recounted without
+        recompute lock if missed.
+
+        """
+        cache_key = f"{cls._rating_cache_key_prefix}:{product_id}"
+        rating_summary = TaggedCache.get(cache_key)
+        if rating_summary is None:
+            computed_since = time()
+            rating_summary = cls._count_rating_summary(product_id)
+            TaggedCache.set(
+                cache_key,
+                rating_summary,
+                [PRODUCT_CACHE_TAG.format(id=product_id)],
+                PRODUCTS_CACHE_TIMEOUT,
+                computed_since=computed_since,
+            )
+        return rating_summary
+
+    @staticmethod
+    def _count_rating_summary(product_id: int) -> dict:
+        """Count rating summary from histogram of product reviews rates."""
+
+        rates_histogram = ProductReview.get_rates_histogram(product_id)
+        histogram = {
+            rate: rates_histogram.get(rate, 0)
+            for rate in range(min_review_rate, max_review_rate + 1)
+        }
+        total_reviews = sum(histogram.values())
+        rates_sum = sum(rate * total for rate, total in histogram.items())
+        return {
+            "average": (
+                round(rates_sum / total_reviews, 1) if total_reviews else None
+            ),
+            "total": total_reviews,
+            "histogram": histogram,
+        }
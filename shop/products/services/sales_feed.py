@@ -0,0 +1,100 @@
+"""Precomputed feed of sales products (ordered ids and total)."""
+
+from datetime import datetime, time as dt_time
+from time import time
+from typing import Iterable
+
+from django.db import transaction
+from django.utils import timezone
+
+from common.cache import SingleFlight, TaggedCache
+from common.custom_logger import app_logger
+from products.constants import (
+    SALES_CACHE_TIMEOUT,
+    SALES_FEED_CACHE_TAG,
+    SALES_FEED_KEY,
+)
+from products.models import Product
+
+
+class SalesFeed:
+    """Class keeps ordered ids of sales products and their total.
+
+    Feed is cached until the nearest sales window boundary ('sales_from'
+    or the day after 'sales_to'), when set of sales products is changed by
+    date, but not longer than SALES_CACHE_TIMEOUT. Feed and entries built
+    from it are tagged with SALES_FEED_CACHE_TAG, which is invalidated if
+    changed products join or leave the feed.
+
+    """
+
+    @classmethod
+    def get(cls) -> dict:
+        """Get feed {'ids', 'total', 'expires'}, build it if missed."""
+
+        feed = TaggedCache.get(SALES_FEED_KEY)
+        if feed is not None:
+            return feed
+
+        return SingleFlight.compute(
+            SALES_FEED_KEY,
+            cls._build,
+            lambda: TaggedCache.get(SALES_FEED_KEY),
+        )
+
+    @staticmethod
+    def get_timeout(feed: dict) -> int:
+        """Get seconds till feed expiry (one second at least)."""
+
+        return max(int(feed["expires"] - time()), 1)
+
+    @classmethod
+    def refresh(cls, products_ids: Iterable[int]) -> None:
+        """Invalidate feed after commit if changed products join/leave it."""
+
+        products_ids = set(products_ids)
+        if not products_ids:
+            return
+
+        def refresh_feed() -> None:
+            feed = TaggedCache.get(SALES_FEED_KEY)
+            if feed is None:
+                return
+
+            feed_ids = products_ids.intersection(feed["ids"])
+            sales_ids = set(Product.get_sales_products_ids(products_ids))
+            if feed_ids != sales_ids:
+                TaggedCache.invalidate([SALES_FEED_CACHE_TAG])
+
+        transaction.on_commit(refresh_feed)
+
+    @classmethod
+    def _build(cls) -> dict:
+        """Build feed and cache it till the nearest sales boundary."""
+
+        computed_since = time()
+        expires = computed_since + SALES_CACHE_TIMEOUT
+        next_boundary = Product.get_next_sales_boundary(timezone.localdate())
+        if next_boundary:
+            boundary_start = timezone.make_aware(
+                datetime.combine(next_boundary, dt_time.min),
+            )
+            expires = min(expires, boundary_start.timestamp())
+        products_ids = Product.get_sales_products_ids()
+        feed = {
+            "ids": products_ids,
+            "total": len(products_ids),
+            "expires": expires,
+        }
+        TaggedCache.set(
+            SALES_FEED_KEY,
+            feed,
+            [SALES_FEED_CACHE_TAG],
+            cls.get_timeout(feed),
+            computed_since=computed_since,
+        )
+        app_logger.debug(
+            f"Sales feed is built for {len(products_ids)} products till "
+            f"{next_boundary=}"
+        )
+        return feed
@@ -0,0 +1,249 @@
+"""Full-text search of products for catalog."""
+
+from collections import defaultdict
+from math import log
+from re import findall as re_findall
+from threading import Lock
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Case, FloatField, QuerySet, Value, When
+from django.db.models.expressions import RawSQL
+
+from common.custom_logger import app_logger
+from products.models import Product
+
+search_min_token_length = 2
+sql_match_search_document = (
+    "MATCH (products_product.search_document) "
+    "AGAINST (%s IN NATURAL LANGUAGE MODE)"
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text to lowercase word tokens."""
+
+    return [
+        token for token in re_findall(r"\w+", text.lower())
+        if len(token) >= search_min_token_length
+    ]
+
+
+class MySQLFullTextSearchBackend:
+    """Search products with MySQL FULLTEXT index on 'search_document'."""
+
+    def search(self, query_set: QuerySet, text: str) -> QuerySet:
+        """Filter matched products and annotate them with 'relevance'."""
+
+        return (
+            query_set.
+            annotate(
+                relevance=RawSQL(
+                    sql_match_search_document, (text,),
+                    output_field=FloatField(),
+                ),
+            ).
+            filter(relevance__gt=0)
+        )
+
+    def update_documents(self, documents: dict) -> None:
+        """FULLTEXT index is maintained by MySQL."""
+
+    def reset(self) -> None:
+        """FULLTEXT index is maintained by MySQL."""
+
+
+class InvertedIndexSearchBackend:
+    """Search products with in-process inverted index.
+
+    Used for databases without FULLTEXT index support (SQLite for test
+    runs). Index is built from 'search_document' on first search and updated
+    from signals. Lookup cost depends on postings of query tokens only.
+
+    Index is kept in memory of process and updated by signals of this
+    process only, index of other workers gets stale. So backend is allowed
+    for single process runs only (settings SHOP_SEARCH_INPROCESS_INDEX, it
+    is on for test runs).
+
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._postings: Optional[dict[str, dict[int, int]]] = None
+        self._documents_tokens: dict[int, set[str]] = {}
+
+    def search(self, query_set: QuerySet, text: str) -> QuerySet:
+        """Filter matched products and annotate them with 'relevance'."""
+
+        scores = self._get_scores(tokenize(text))
+        if not scores:
+            return query_set.none()
+
+        return (
+            query_set.
+            filter(id__in=scores.keys()).
+            annotate(
+                relevance=Case(
+                    *[
+                        When(id=product_id, then=Value(score))
+                        for product_id, score in scores.items()
+                    ],
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                ),
+            )
+        )
+
+    def update_documents(self, documents: dict) -> None:
+        """Reindex changed products documents {product id: document}."""
+
+        with self._lock:
+            if self._postings is None:
+                return
+
+            for product_id, document in documents.items():
+                self._remove_document(product_id)
+                self._add_document(product_id, document)
+
+    def reset(self) -> None:
+        """Drop index, it will be rebuilt on next search."""
+
+        with self._lock:
+            self._postings = None
+            self._documents_tokens = {}
+
+    def _get_scores(self, query_tokens: list[str]) -> dict[int, float]:
+        """Count tf-idf relevance of products matched any query token."""
+
+        with self._lock:
+            if self._postings is None:
+                self._build()
+
+            total_documents = len(self._documents_tokens) or 1
+            scores = defaultdict(float)
+            for token in set(query_tokens):
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = log(1 + total_documents / len(postings))
+                for product_id, frequency in postings.items():
+                    scores[product_id] += frequency * idf
+
+        return scores
+
+    def _build(self) -> None:
+        """Build index from all products search documents."""
+
+        self._postings = defaultdict(dict)
+        self._documents_tokens = {}
+        documents = (
+            Product.objects.values_list("id", "search_document").iterator()
+        )
+        for product_id, document in documents:
+            self._add_document(product_id, document)
+        app_logger.info(
+            f"Search index is built for {len(self._documents_tokens)} products"
+        )
+
+    def _add_document(self, product_id: int, document: str) -> None:
+        """Add product document tokens to postings."""
+
+        tokens = tokenize(document)
+        for token in tokens:
+            postings = self._postings[token]
+            postings[product_id] = postings.get(product_id, 0) + 1
+        self._documents_tokens[product_id] = set(tokens)
+
+    def _remove_document(self, product_id: int) -> None:
+        """Remove product document tokens from postings."""
+
+        for token in self._documents_tokens.pop(product_id, ()):
+            postings = self._postings.get(token, {})
+            postings.pop(product_id, None)
+            if not postings:
+                self._postings.pop(token, None)
+
+
+class ProductSearch:
+    """Class is used as entry point to full-text search of products.
+
+    Backend is selected as per database vendor: MySQL FULLTEXT index or
+    in-process inverted index (test runs).
+
+    """
+
+    _backend = None
+
+    @classmethod
+    def get_backend(
+            cls,
+    ) -> Optional[MySQLFullTextSearchBackend | InvertedIndexSearchBackend]:
+        """Get search backend for current database.
+
+        Return None if database is not MySQL and in-process index is not
+        allowed in settings.
+
+        """
+        if cls._backend is None:
+            if connection.vendor == "mysql":
+                cls._backend = MySQLFullTextSearchBackend()
+            elif settings.SHOP_SEARCH_INPROCESS_INDEX:
+                cls._backend = InvertedIndexSearchBackend()
+        return cls._backend
+
+    @staticmethod
+    def is_ranked(text: Optional[str]) -> bool:
+        """Check that search by text annotates products 'relevance'."""
+
+        return bool(text and tokenize(text))
+
+    @classmethod
+    def search(cls, query_set: QuerySet, text: str) -> QuerySet:
+        """Filter query set by text and annotate products 'relevance'.
+
+        If text has no tokens (all words are shorter than min token length)
+        then products are filtered by text occurrence in search document
+        without 'relevance' annotation.
+
+        """
+        if not tokenize(text):
+            return query_set.filter(search_document__icontains=text.strip())
+
+        backend = cls.get_backend()
+        if backend is None:
+            raise ImproperlyConfigured(
+                "Full-text search of products requires MySQL, in-process "
+                "index is allowed for test runs (SHOP_SEARCH_INPROCESS_INDEX)"
+            )
+        return backend.search(query_set, text)
+
+    @classmethod
+    def refresh_products(cls, products_ids: list[int]) -> None:
+        """Rebuild search documents of products and update index."""
+
+        if not products_ids:
+            return
+
+        documents = Product.refresh_search_documents(products_ids)
+        backend = cls.get_backend()
+        if backend is not None:
+            backend.update_documents(documents)
+
+    @classmethod
+    def rebuild(cls, batch_size: int = 500) -> int:
+        """Rebuild search documents for all products.
+
+        Return total reindexed products.
+
+        """
+        products_ids = list(Product.objects.values_list("id", flat=True))
+        for start in range(0, len(products_ids), batch_size):
+            Product.refresh_search_documents(
+                products_ids[start:start + batch_size],
+            )
+        backend = cls.get_backend()
+        if backend is not None:
+            backend.reset()
+        return len(products_ids)
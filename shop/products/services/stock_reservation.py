@@ -0,0 +1,259 @@
+"""Reservation of products stock in Redis for checkout."""
+
+from time import time
+from typing import Iterable, Optional
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from common.custom_logger import app_logger
+from products.constants import (
+    STOCK_COUNTER_KEY,
+    STOCK_RESERVATION_KEY,
+    STOCK_RESERVATION_TIMEOUT,
+    STOCK_RESERVATIONS_KEY,
+)
+from products.models import Product
+
+reconcile_batch_size = 1000
+
+# KEYS: reservation, reservations index, counters of products
+# ARGV: token, expiry timestamp, timeout, quantities of products
+# Return {-1} if counter is missed, flat pairs {counter index, available}
+# of short products or empty table if quantities are reserved.
+reserve_script = """
+local shortages = {}
+for i = 3, #KEYS do
+    local available = redis.call("GET", KEYS[i])
+    if not available then
+        return {-1}
+    end
+    if tonumber(available) < tonumber(ARGV[i + 1]) then
+        table.insert(shortages, i - 3)
+        table.insert(shortages, tonumber(available))
+    end
+end
+if #shortages > 0 then
+    return shortages
+end
+for i = 3, #KEYS do
+    redis.call("DECRBY", KEYS[i], ARGV[i + 1])
+    redis.call("HSET", KEYS[1], KEYS[i], ARGV[i + 1])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+redis.call("ZADD", KEYS[2], ARGV[2], ARGV[1])
+return {}
+"""
+
+# KEYS: reservation, reservations index
+# ARGV: token
+release_script = """
+local reserved = redis.call("HGETALL", KEYS[1])
+for i = 1, #reserved, 2 do
+    if redis.call("EXISTS", reserved[i]) == 1 then
+        redis.call("INCRBY", reserved[i], reserved[i + 1])
+    end
+end
+redis.call("DEL", KEYS[1])
+redis.call("ZREM", KEYS[2], ARGV[1])
+return #reserved / 2
+"""
+
+# KEYS: reservations index, counters of products
+# ARGV: now timestamp, reservation key prefix, available quantities in db
+reconcile_script = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", ARGV[1])
+local reserved = {}
+for _, token in ipairs(redis.call("ZRANGE", KEYS[1], 0, -1)) do
+    local quantities = redis.call("HGETALL", ARGV[2] .. token)
+    for i = 1, #quantities, 2 do
+        reserved[quantities[i]] = (
+            (reserved[quantities[i]] or 0) + tonumber(quantities[i + 1])
+        )
+    end
+end
+for i = 2, #KEYS do
+    local available = tonumber(ARGV[i + 1]) - (reserved[KEYS[i]] or 0)
+    redis.call("SET", KEYS[i], math.max(available, 0))
+end
+return #KEYS - 1
+"""
+
+
+class StockReservation:
+    """Class reserves ordered quantities against stock counters in Redis.
+
+    Counter of product keeps quantity available to order (Product 'count'
+    less active reservations). Quantities of all products of order are
+    reserved at once by Lua script, so lost race is rejected in Redis
+    before products rows are locked in db. Reservation is confirmed if
+    order is created or released if it is failed, and it expires in
+    STOCK_RESERVATION_TIMEOUT if neither happens. Counters are created
+    from db on first use, dropped if stock is changed out of checkout and
+    synced with db by 'reconcile'. With other caches reservation is
+    skipped and db conditional update is the only stock check.
+
+    """
+
+    @classmethod
+    def reserve(
+            cls, products_quantities: dict[int, int],
+    ) -> tuple[Optional[str], dict[int, int]]:
+        """Reserve quantities {product id: quantity} of products.
+
+        Return reservation token (None if nothing is reserved) and
+        available quantities {product id: quantity} of products which are
+        short of ordered quantity.
+
+        """
+        redis = cls._get_redis()
+        if redis is None or not products_quantities:
+            return None, {}
+
+        products_ids = sorted(products_quantities)
+        token = uuid4().hex
+        keys = [
+            cache.make_key(STOCK_RESERVATION_KEY.format(token=token)),
+            cache.make_key(STOCK_RESERVATIONS_KEY),
+        ]
+        keys.extend(
+            cls._get_counter_key(product_id) for product_id in products_ids
+        )
+        args = [
+            token,
+            time() + STOCK_RESERVATION_TIMEOUT,
+            STOCK_RESERVATION_TIMEOUT,
+        ]
+        args.extend(
+            products_quantities[product_id] for product_id in products_ids
+        )
+        reserve = redis.register_script(reserve_script)
+        result = reserve(keys=keys, args=args)
+        if result == [-1]:
+            cls._create_counters(redis, products_ids)
+            result = reserve(keys=keys, args=args)
+        if result == [-1]:
+            app_logger.warning(f"Stock is not reserved: {products_ids=}")
+            return None, {}
+
+        if result:
+            return None, {
+                products_ids[int(result[index])]: int(result[index + 1])
+                for index in range(0, len(result), 2)
+            }
+
+        return token, {}
+
+    @classmethod
+    def confirm(cls, token: Optional[str]) -> None:
+        """Confirm reservation as ordered quantities are taken from db."""
+
+        redis = cls._get_redis()
+        if redis is None or token is None:
+            return
+
+        pipeline = redis.pipeline()
+        pipeline.delete(
+            cache.make_key(STOCK_RESERVATION_KEY.format(token=token)),
+        )
+        pipeline.zrem(cache.make_key(STOCK_RESERVATIONS_KEY), token)
+        pipeline.execute()
+
+    @classmethod
+    def release(cls, token: Optional[str]) -> None:
+        """Return reserved quantities to counters of products."""
+
+        redis = cls._get_redis()
+        if redis is None or token is None:
+            return
+
+        redis.register_script(release_script)(
+            keys=[
+                cache.make_key(STOCK_RESERVATION_KEY.format(token=token)),
+                cache.make_key(STOCK_RESERVATIONS_KEY),
+            ],
+            args=[token],
+        )
+
+    @classmethod
+    def forget(cls, products_ids: Iterable[int]) -> None:
+        """Drop counters of products after commit of stock changes."""
+
+        products_ids = set(products_ids)
+        if not products_ids:
+            return
+
+        def drop_counters() -> None:
+            redis = cls._get_redis()
+            if redis is not None:
+                redis.delete(
+                    *[
+                        cls._get_counter_key(product_id)
+                        for product_id in products_ids
+                    ]
+                )
+
+        transaction.on_commit(drop_counters)
+
+    @classmethod
+    def reconcile(cls) -> int:
+        """Sync counters with db stock less active reservations.
+
+        Expired reservations are dropped. Return total synced products.
+
+        """
+        redis = cls._get_redis()
+        if redis is None:
+            return 0
+
+        reconcile = redis.register_script(reconcile_script)
+        reservation_key_prefix = cache.make_key(
+            STOCK_RESERVATION_KEY.format(token=""),
+        )
+        products_ids = list(
+            Product.objects.order_by("id").values_list("id", flat=True)
+        )
+        for start in range(0, len(products_ids), reconcile_batch_size):
+            available_counts = Product.get_available_counts(
+                products_ids[start:start + reconcile_batch_size],
+            )
+            keys = [cache.make_key(STOCK_RESERVATIONS_KEY)]
+            args = [time(), reservation_key_prefix]
+            for product_id, available_count in available_counts.items():
+                keys.append(cls._get_counter_key(product_id))
+                args.append(available_count)
+            reconcile(keys=keys, args=args)
+
+        app_logger.info(f"Stock is reconciled for {len(products_ids)} ids")
+        return len(products_ids)
+
+    @staticmethod
+    def _get_redis():
+        """Get Redis client of default cache or None for other caches."""
+
+        try:
+            return get_redis_connection("default")
+        except NotImplementedError:
+            return None
+
+    @staticmethod
+    def _get_counter_key(product_id: int) -> str:
+        """Get Redis key of product stock counter."""
+
+        return cache.make_key(STOCK_COUNTER_KEY.format(id=product_id))
+
+    @classmethod
+    def _create_counters(cls, redis, products_ids: list[int]) -> None:
+        """Create missed counters of products from db stock."""
+
+        available_counts = Product.get_available_counts(products_ids)
+        pipeline = redis.pipeline()
+        for product_id in products_ids:
+            pipeline.set(
+                cls._get_counter_key(product_id),
+                available_counts.get(product_id, 0),
+                nx=True,
+            )
+        pipeline.execute()
@@ -1,8 +1,6 @@
 """App signal functions."""
 
-from django.db.models import Count, Sum, FloatField
 from django.db.models.base import ModelBase
-from django.db.models.functions import Cast
 from django.db.models.signals import (
     pre_save,
     post_save,
@@ -12,7 +10,24 @@ from django.db.models.signals import (
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 
-from .models import CategoryImage, ProductImage, ProductReview, Product
+from .models import (
+    Category,
+    CategoryClosure,
+    CategoryImage,
+    CategoryTag,
+    Product,
+    ProductAndSpecification,
+    ProductAndTag,
+    ProductImage,
+    ProductReview,
+    ProductSpecification,
+    ProductTag,
+)
+from .services.catalog import CatalogHandler
+from .services.category import CategoryHandler
+from .services.category_tags import CategoryTagsMap
+from .services.search import ProductSearch
+from .services.stock_reservation import StockReservation
 from common.custom_logger import app_logger
 from common.utils import delete_file_from_sys
 
@@ -93,36 +108,380 @@ def delete_product_image_from_sys(
 
 
 @receiver([post_save, post_delete], sender=ProductReview)
-def recount_product_rating(
+def change_product_rating(
     sender: ModelBase, instance: ProductReview, *args, **kwargs,
 ) -> None:
-    """Recount product rating after changing in product reviews.
+    """Change product rating counters after changing in reviews.
+
+    Created and deleted reviews change counters incrementally in the same
+    transaction. Product rating is recounted if rate or product of review
+    is updated.
 
     Args:
         sender (ModelBase): ProductReview
-        instance (User): ProductReview instance
+        instance (ProductReview): ProductReview instance
 
     """
 
     if kwargs.get("raw", False):
         app_logger.info(
-            f"\n'recount_product_rating' is disabled for loading fixture\n"
+            f"\n'change_product_rating' is disabled for loading fixture\n"
         )
         return
 
-    app_logger.info(
-        f"Caught signal {kwargs.get("signal")} for {instance.product.id}"
+    previous_product_id, previous_rate = (
+        getattr(instance, "_previous_rating", None) or (None, None)
     )
-    product_rating = (
-        ProductReview.objects.
-        filter(product_id=instance.product.id).
-        aggregate(
-            rate=(Cast(Sum("rate"), output_field=FloatField()) / Count("id"))
+    if ProductReview.is_rating_deferred(
+            [instance.product_id, previous_product_id],
+    ):
+        return
+
+    if kwargs.get("signal") == post_delete:
+        Product.change_rating(instance.product_id, -instance.rate, -1)
+    elif kwargs.get("created", False):
+        Product.change_rating(instance.product_id, instance.rate, 1)
+    elif (previous_product_id, previous_rate) != (
+            instance.product_id, instance.rate,
+    ):
+        Product.recount_ratings(
+            {instance.product_id, previous_product_id} - {None},
         )
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(
+    sender: ModelBase, instance: Product, *args, **kwargs,
+) -> None:
+    """Rebuild product search document after product is saved.
+
+    Args:
+        sender (ModelBase): Product
+        instance (Product): Product instance
+
+    """
+    if kwargs.get("raw", False):
+        app_logger.info(
+            f"\n'reindex_product' is disabled for loading fixture\n"
+        )
+        return
+
+    ProductSearch.refresh_products([instance.id])
+
+
+@receiver([post_save, post_delete], sender=ProductAndTag)
+@receiver([post_save, post_delete], sender=ProductAndSpecification)
+def reindex_product_relations(
+    sender: ModelBase,
+    instance: ProductAndTag | ProductAndSpecification,
+    *args,
+    **kwargs,
+) -> None:
+    """Rebuild product search document after changing tags/specifications.
+
+    Args:
+        sender (ModelBase): ProductAndTag or ProductAndSpecification
+        instance (ProductAndTag | ProductAndSpecification): model instance
+
+    """
+    if kwargs.get("raw", False):
+        app_logger.info(
+            f"\n'reindex_product_relations' is disabled for loading fixture\n"
+        )
+        return
+
+    ProductSearch.refresh_products([instance.product_id])
+
+
+@receiver(post_save, sender=ProductTag)
+@receiver(post_save, sender=ProductSpecification)
+def reindex_related_products(
+    sender: ModelBase,
+    instance: ProductTag | ProductSpecification,
+    *args,
+    **kwargs,
+) -> None:
+    """Rebuild search documents of products with updated tag/specification.
+
+    Args:
+        sender (ModelBase): ProductTag or ProductSpecification
+        instance (ProductTag | ProductSpecification): model instance
+
+    """
+    if kwargs.get("raw", False):
+        app_logger.info(
+            f"\n'reindex_related_products' is disabled for loading fixture\n"
+        )
+        return
+
+    ProductSearch.refresh_products(
+        list(instance.products.values_list("id", flat=True))
     )
-    app_logger.info(f"Rating {product_rating}  for {instance.product.id}")
-    (
-        Product.objects.
-        filter(id=instance.product.id).
-        update(rating=product_rating["rate"])
-     )
+
+
+@receiver([post_save, pre_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductAndTag)
+@receiver([post_save, post_delete], sender=ProductAndSpecification)
+def invalidate_catalog_cache_for_product(
+    sender: ModelBase,
+    instance: Product | ProductAndTag | ProductAndSpecification,
+    *args,
+    **kwargs,
+) -> None:
+    """Invalidate cached catalog pages with product and its categories.
+
+    Pages filtered by categories of product (and not filtered) are kept if
+    saved product is changed out of catalog fields (its membership and
+    order in pages are not changed).
+
+    Args:
+        sender (ModelBase): Product, ProductAndTag or ProductAndSpecification
+        instance (Product | ProductAndTag | ProductAndSpecification): model
+            instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    if sender is Product:
+        if kwargs.get("signal") is post_save and not getattr(
+                instance, "_is_catalog_changed", True,
+        ):
+            CatalogHandler.invalidate_products_cache([instance.id])
+            return
+
+        product_id = instance.id
+    else:
+        product_id = instance.product_id
+    CatalogHandler.invalidate_products_categories_cache([product_id])
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=ProductReview)
+def invalidate_catalog_cache_for_product_details(
+    sender: ModelBase,
+    instance: ProductImage | ProductReview,
+    *args,
+    **kwargs,
+) -> None:
+    """Invalidate cached catalog pages with product of image/review.
+
+    Args:
+        sender (ModelBase): ProductImage or ProductReview
+        instance (ProductImage | ProductReview): model instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    CatalogHandler.invalidate_products_cache([instance.product_id])
+
+
+@receiver(post_save, sender=ProductSpecification)
+def invalidate_catalog_cache_for_specification(
+    sender: ModelBase, instance: ProductSpecification, *args, **kwargs,
+) -> None:
+    """Invalidate cached products details with specification.
+
+    Args:
+        sender (ModelBase): ProductSpecification
+        instance (ProductSpecification): ProductSpecification instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    CatalogHandler.invalidate_products_cache(
+        list(instance.products.values_list("id", flat=True))
+    )
+
+
+@receiver(post_save, sender=ProductTag)
+def invalidate_catalog_cache_for_tag(
+    sender: ModelBase, instance: ProductTag, *args, **kwargs,
+) -> None:
+    """Invalidate cached catalog pages and facets with products of tag.
+
+    Args:
+        sender (ModelBase): ProductTag
+        instance (ProductTag): ProductTag instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    CatalogHandler.invalidate_products_categories_cache(
+        list(instance.products.values_list("id", flat=True))
+    )
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog_cache_for_category(
+    sender: ModelBase, instance: Category, *args, **kwargs,
+) -> None:
+    """Invalidate cached catalog pages filtered by category.
+
+    Args:
+        sender (ModelBase): Category
+        instance (Category): Category instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    CatalogHandler.invalidate_categories_cache(
+        [
+            instance.id,
+            instance.parent_id,
+            getattr(instance, "_previous_parent_id", None),
+        ],
+    )
+
+
+@receiver(pre_delete, sender=Category)
+def detach_category_subtree(
+    sender: ModelBase, instance: Category, *args, **kwargs,
+) -> None:
+    """Detach subcategories from ancestors of deleted category in closure.
+
+    Subcategories become root categories (parent is set to NULL).
+
+    Args:
+        sender (ModelBase): Category
+        instance (Category): Category instance
+
+    """
+    CategoryClosure.detach_subtree(
+        instance.id,
+        list(instance.subcategories.values_list("id", flat=True)),
+    )
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=CategoryImage)
+def invalidate_categories_tree_cache(
+    sender: ModelBase, instance: Category | CategoryImage, *args, **kwargs,
+) -> None:
+    """Invalidate cached categories tree after categories changes.
+
+    Args:
+        sender (ModelBase): Category or CategoryImage
+        instance (Category | CategoryImage): model instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    CategoryHandler.invalidate_categories_tree_cache()
+
+
+@receiver([post_save, post_delete], sender=ProductAndTag)
+def count_category_tags_for_product_tag(
+    sender: ModelBase, instance: ProductAndTag, *args, **kwargs,
+) -> None:
+    """Change products count of product tag for categories of product.
+
+    Args:
+        sender (ModelBase): ProductAndTag
+        instance (ProductAndTag): ProductAndTag instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    if kwargs.get("signal") == post_delete:
+        CategoryTag.change_products_count(
+            instance.product_id, instance.tag_id, -1,
+        )
+    elif kwargs.get("created", False):
+        CategoryTag.change_products_count(
+            instance.product_id, instance.tag_id, 1,
+        )
+    else:
+        return
+
+    CategoryTagsMap.invalidate()
+
+
+@receiver(post_save, sender=Product)
+def recount_category_tags_for_product(
+    sender: ModelBase, instance: Product, *args, **kwargs,
+) -> None:
+    """Recount categories tags if category of product is changed.
+
+    Args:
+        sender (ModelBase): Product
+        instance (Product): Product instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    previous_category_id = getattr(
+        instance, "_previous_category_id", instance.category_id,
+    )
+    if previous_category_id == instance.category_id:
+        return
+
+    CategoryTag.recount_ancestors(
+        [previous_category_id, instance.category_id],
+    )
+    CategoryTagsMap.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Category)
+def recount_category_tags_for_category(
+    sender: ModelBase, instance: Category, *args, **kwargs,
+) -> None:
+    """Recount tags of category and ancestors after categories changes.
+
+    Args:
+        sender (ModelBase): Category
+        instance (Category): Category instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    CategoryTag.recount_ancestors(
+        [
+            instance.id,
+            instance.parent_id,
+            getattr(instance, "_previous_parent_id", None),
+        ],
+    )
+    CategoryTagsMap.invalidate()
+
+
+@receiver([post_save, post_delete], sender=ProductTag)
+def invalidate_category_tags_for_tag(
+    sender: ModelBase, instance: ProductTag, *args, **kwargs,
+) -> None:
+    """Invalidate cached categories tags after tags changes.
+
+    Args:
+        sender (ModelBase): ProductTag
+        instance (ProductTag): ProductTag instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    CategoryTagsMap.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Product)
+def forget_stock_counter_for_product(
+    sender: ModelBase, instance: Product, *args, **kwargs,
+) -> None:
+    """Drop reservation counter of product as its stock can be changed.
+
+    Args:
+        sender (ModelBase): Product
+        instance (Product): Product instance
+
+    """
+    if kwargs.get("raw", False):
+        return
+
+    StockReservation.forget([instance.id])
@@ -0,0 +1,53 @@
+"""Module with tasks for Celery."""
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+from products.models import Product, ProductSales
+from products.services.catalog import CatalogHandler
+from products.services.stock_reservation import StockReservation
+
+celery_logger = get_task_logger("celery_logger")
+
+
+@shared_task(ignore_result=True)
+def rollover_sales_prices() -> None:
+    """Recount Product final price at sales window boundaries.
+
+    Is scheduled by Celery beat right after midnight, when sales of products
+    start or end as per 'sales_from' and 'sales_to' dates.
+
+    """
+    products_ids = Product.refresh_final_prices()
+    if products_ids:
+        CatalogHandler.invalidate_products_categories_cache(products_ids)
+    celery_logger.info(
+        f"Final price is updated for {len(products_ids)} products"
+    )
+
+
+@shared_task(ignore_result=True)
+def rebuild_popularity() -> None:
+    """Rebuild daily sales rollup and Product popularity.
+
+    Is scheduled by Celery beat after midnight, so sales of the day which
+    left popularity window are subtracted from products popularity.
+
+    """
+    products_ids = ProductSales.rebuild()
+    CatalogHandler.invalidate_popularity_cache(products_ids)
+    celery_logger.info(
+        f"Popularity is changed for {len(products_ids)} products"
+    )
+
+
+@shared_task(ignore_result=True)
+def reconcile_stock() -> None:
+    """Sync stock reservation counters with Product 'count'.
+
+    Is scheduled by Celery beat every few minutes, so counters drifted by
+    expired reservations or failed requests are corrected.
+
+    """
+    total_products = StockReservation.reconcile()
+    celery_logger.info(f"Stock is reconciled for {total_products} products")
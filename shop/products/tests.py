@@ -1,3 +1,782 @@
-from django.test import TestCase
+"""Budgets of SQL queries and cache round trips for 'Products' endpoints.
 
-# Create your tests here.
+Run with SHOP_TESTING=True (SQLite and local memory cache).
+
+"""
+
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from json import loads as json_loads
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from common.cache import StaleWhileRevalidateCache, TaggedCache
+from common.testing import QueryBudgetTestCase
+from orders.models import Order, OrderAndProduct
+from products.constants import (
+    ALL_CATEGORIES_CACHE_TAG,
+    CATALOG_FACETS_PRICE_BUCKETS,
+    DEFAULT_PAGINATION_LIMIT,
+    POPULARITY_WINDOW_DAYS,
+    PRODUCT_CACHE_TAG,
+)
+from products.admin.category import archive_categories, restore_categories
+from products.models import (
+    Category,
+    CategoryClosure,
+    CategoryTag,
+    Product,
+    ProductAndTag,
+    ProductImage,
+    ProductReview,
+    ProductSales,
+    ProductTag,
+)
+from products.serializers import (
+    OutSalesProductSerializer,
+    OutSpecialProductSerializer,
+)
+from products.services.catalog import CatalogHandler
+from products.services.common import (
+    apply_pagination_to_qs,
+    get_pagination_last_page,
+)
+from products.services.category_tags import CategoryTagsMap
+from products.services.product import (
+    total_limited_products,
+    total_popular_products,
+)
+from products.services.product_index import ProductColumnarIndex, np
+from products.services.search import ProductSearch
+from products.tasks import rebuild_popularity
+
+# Query params of catalog as they are sent by frontend (catalog page)
+catalog_params = {
+    "filter[name]": "",
+    "filter[minPrice]": 0,
+    "filter[maxPrice]": 50000,
+    "filter[freeDelivery]": "false",
+    "filter[available]": "true",
+    "currentPage": 1,
+    "sort": "price",
+    "sortType": "inc",
+    "limit": 20,
+}
+
+
+class ProductsQueryBudgetTest(QueryBudgetTestCase):
+    """Check that products endpoints cost fixed number of queries."""
+
+    def test_catalog(self) -> None:
+        url = reverse("products:catalog_details")
+        self.request_with_budget("get", url, 5, 12, catalog_params)
+        self.request_with_budget(
+            "get", url, 0, 2, catalog_params, clear_cache=False,
+        )
+
+    def test_catalog_independent_of_page_size(self) -> None:
+        url = reverse("products:catalog_details")
+        _, small_page_queries, small_page_cache_calls = (
+            self.request_with_budget(
+                "get", url, 5, 12, {**catalog_params, "limit": 2},
+            )
+        )
+        _, big_page_queries, big_page_cache_calls = (
+            self.request_with_budget(
+                "get", url, 5, 12, {**catalog_params, "limit": 20},
+            )
+        )
+        self.assertEqual(small_page_queries, big_page_queries)
+        self.assertEqual(small_page_cache_calls, big_page_cache_calls)
+
+    def test_catalog_with_filters(self) -> None:
+        self.request_with_budget(
+            "get",
+            reverse("products:catalog_details"),
+            6,
+            12,
+            {
+                **catalog_params,
+                "category": self.categories[0].id,
+                "filter[minPrice]": 100,
+                "filter[freeDelivery]": "true",
+                "sort": "price",
+                "sortType": "dec",
+            },
+        )
+
+    def test_catalog_facets(self) -> None:
+        response, _, _ = self.request_with_budget(
+            "get",
+            reverse("products:catalog_details"),
+            8,
+            15,
+            {
+                **catalog_params,
+                "category": self.categories[0].id,
+                "filter[maxPrice]": 300,
+                "facets": "true",
+            },
+        )
+        categories_ids = {
+            category["descendant_id"]
+            for category in Category.get_descendants_ids(
+                self.categories[0].id,
+            )
+        }
+        products = [
+            product
+            for product in self.products
+            if product.category_id in categories_ids and
+            product.final_price <= 300
+        ]
+        products_ids = {product.id for product in products}
+        tags_counts = {}
+        for product_tag in ProductAndTag.objects.filter(
+                product_id__in=products_ids,
+        ):
+            tags_counts[product_tag.tag_id] = (
+                tags_counts.get(product_tag.tag_id, 0) + 1
+            )
+        prices_counts = [
+            sum(
+                1
+                for product in products
+                if product.final_price >= min_price and (
+                    max_price is None or product.final_price < max_price
+                )
+            )
+            for min_price, max_price in zip(
+                CATALOG_FACETS_PRICE_BUCKETS,
+                CATALOG_FACETS_PRICE_BUCKETS[1:] + (None,),
+            )
+        ]
+
+        self.assertGreater(min(prices_counts[:2]), 0)
+
+        facets = json_loads(response.content)["facets"]
+        self.assertEqual(facets["total"], len(products))
+        self.assertEqual(
+            [price["count"] for price in facets["prices"]], prices_counts,
+        )
+        self.assertEqual(
+            {tag["id"]: tag["count"] for tag in facets["tags"]}, tags_counts,
+        )
+        self.assertEqual(
+            facets["freeDelivery"],
+            sum(1 for product in products if product.free_delivery),
+        )
+        self.assertEqual(facets["available"], len(products))
+
+    def test_catalog_sort_ties_by_id(self) -> None:
+        Product.objects.update(final_price=Decimal(100))
+        for sort_type in ("inc", "dec"):
+            response, _, _ = self.request_with_budget(
+                "get",
+                reverse("products:catalog_details"),
+                5,
+                13,
+                {**catalog_params, "sortType": sort_type},
+            )
+            products_ids = [
+                product["id"]
+                for product in json_loads(response.content)["items"]
+            ]
+            self.assertEqual(
+                products_ids,
+                sorted(products_ids, reverse=sort_type == "dec"),
+            )
+        for sort, id_sort in (
+                (None, "id"), ("final_price", "id"), ("-final_price", "-id"),
+        ):
+            self.assertEqual(
+                CatalogHandler._add_sort_to_qs(
+                    Product.objects.all(), sort,
+                ).query.order_by[-1],
+                id_sort,
+            )
+
+    def test_catalog_sort_by_rating(self) -> None:
+        product_id = self.products[0].id
+        ProductReview.objects.filter(product_id=product_id).delete()
+        response, _, _ = self.request_with_budget(
+            "get",
+            reverse("products:catalog_details"),
+            5,
+            12,
+            {**catalog_params, "sort": "rating", "cursor": ""},
+        )
+        product = json_loads(response.content)["items"][0]
+        self.assertEqual(product["id"], product_id)
+        self.assertIsNone(product["rating"])
+        self.assertEqual(
+            CatalogHandler._add_sort_to_qs(
+                Product.objects.all(), "-rating",
+            ).query.order_by,
+            ("-rating", "-id"),
+        )
+
+    @skipIf(np is None, "NumPy is required for catalog index")
+    def test_catalog_index_sort_as_orm(self) -> None:
+        Product.objects.filter(id__in=[
+            product.id for product in self.products[::2]
+        ]).update(final_price=Decimal(100))
+        index = ProductColumnarIndex()
+        index.build()
+        for sort in (
+                None, "final_price", "-final_price", "-review_count", "rating",
+        ):
+            query_params = {
+                "category_id": None,
+                "filters": {"count__gte": 1},
+                "search": None,
+                "tags": [],
+                "sort": sort,
+                "pagination": {
+                    "current_page": 1, "limit": 100, "cursor": None,
+                },
+                "facets": False,
+            }
+            products_ids, _ = index.search(query_params)
+            self.assertEqual(
+                products_ids,
+                list(
+                    CatalogHandler._add_sort_to_qs(
+                        CatalogHandler._get_filtered_qs(query_params), sort,
+                    ).values_list("id", flat=True)
+                ),
+            )
+
+    @override_settings(SHOP_SEARCH_INPROCESS_INDEX=False)
+    @patch.object(ProductSearch, "_backend", None)
+    def test_search_inprocess_index_only_for_tests(self) -> None:
+        self.assertIsNone(ProductSearch.get_backend())
+        with self.assertRaises(ImproperlyConfigured):
+            ProductSearch.search(Product.objects.all(), "product")
+
+    @patch.object(ProductSearch, "_backend", None)
+    def test_catalog_search_by_relevance(self) -> None:
+        for product, title in zip(
+                self.products, ("Green apple apple", "Green pear"),
+        ):
+            product.title = title
+            product.save()
+        response, _, _ = self.request_with_budget(
+            "get",
+            reverse("products:catalog_details"),
+            6,
+            13,
+            {
+                **catalog_params,
+                "filter[name]": "apple green",
+                "sort": "relevance",
+                "sortType": "dec",
+            },
+        )
+        self.assertEqual(
+            [
+                product["id"]
+                for product in json_loads(response.content)["items"]
+            ],
+            [self.products[0].id, self.products[1].id],
+        )
+
+    @patch.object(ProductSearch, "_backend", None)
+    def test_catalog_search_by_short_tokens(self) -> None:
+        self.products[0].title = "Box"
+        self.products[0].save()
+        response, _, _ = self.request_with_budget(
+            "get",
+            reverse("products:catalog_details"),
+            5,
+            13,
+            {
+                **catalog_params,
+                "filter[name]": "x",
+                "sort": "relevance",
+                "sortType": "dec",
+            },
+        )
+        self.assertEqual(
+            [
+                product["id"]
+                for product in json_loads(response.content)["items"]
+            ],
+            [self.products[0].id],
+        )
+
+    def test_categories(self) -> None:
+        url = reverse("products:categories_details")
+        self.request_with_budget("get", url, 1, 9)
+        self.request_with_budget("get", url, 0, 2, clear_cache=False)
+
+    def test_product(self) -> None:
+        url = reverse(
+            "products:product_details", kwargs={"id": self.products[0].id},
+        )
+        self.request_with_budget("get", url, 5, 9)
+        self.request_with_budget("get", url, 0, 3, clear_cache=False)
+
+    def test_product_reviews(self) -> None:
+        product_id = self.products[0].id
+        for number in range(3, 15):
+            ProductReview.objects.create(
+                product_id=product_id,
+                author=f"Author {number}",
+                email=f"author{number}@example.com",
+                text="Review text",
+                rate=5,
+            )
+        url = reverse("products:product_details", kwargs={"id": product_id})
+        response, _, _ = self.request_with_budget("get", url, 5, 9)
+        self.assertEqual(
+            [review["author"] for review in response.json()["reviews"]],
+            [f"Author {number}" for number in range(15)],
+        )
+        response, _, _ = self.request_with_budget(
+            "get", url, 5, 9, {"reviews": 2},
+        )
+        self.assertEqual(
+            [review["author"] for review in response.json()["reviews"]],
+            ["Author 14", "Author 13"],
+        )
+
+    def test_popular_products(self) -> None:
+        url = reverse("products:products_popular")
+        self.request_with_budget("get", url, 4, 13)
+        self.request_with_budget("get", url, 0, 2, clear_cache=False)
+
+    def test_popular_products_of_category(self) -> None:
+        url = reverse("products:products_popular")
+        self.request_with_budget(
+            "get", url, 5, 13, {"category": self.categories[0].id},
+        )
+        self.request_with_budget(
+            "get", url, 1, 2, {"category": self.categories[0].id},
+            clear_cache=False,
+        )
+
+    def test_limited_products(self) -> None:
+        url = reverse("products:products_limited")
+        self.request_with_budget("get", url, 3, 8)
+        self.request_with_budget("get", url, 0, 2, clear_cache=False)
+
+    def test_products_cards_as_serializers(self) -> None:
+        ProductReview.objects.filter(product_id=self.products[0].id).delete()
+        ProductImage.objects.filter(product_id=self.products[0].id).delete()
+        sales_qs = Product.get_sales_products()
+        for url, data in (
+                (
+                    reverse("products:products_popular"),
+                    OutSpecialProductSerializer(
+                        Product.get_popular_products(total_popular_products),
+                        many=True,
+                    ).data,
+                ),
+                (
+                    reverse("products:products_limited"),
+                    OutSpecialProductSerializer(
+                        Product.get_limited_products(total_limited_products),
+                        many=True,
+                    ).data,
+                ),
+                (
+                    reverse("products:products_sales"),
+                    {
+                        "items": OutSalesProductSerializer(
+                            apply_pagination_to_qs(
+                                sales_qs, 1, DEFAULT_PAGINATION_LIMIT,
+                            ),
+                            many=True,
+                        ).data,
+                        "currentPage": 1,
+                        "lastPage": get_pagination_last_page(
+                            sales_qs.count(),
+                        ),
+                    },
+                ),
+        ):
+            self.assertEqual(
+                self.client.get(url).content, JSONRenderer().render(data),
+            )
+
+    @patch(
+        "products.services.banner_pool.sample",
+        lambda population, total: list(population[:total]),
+    )
+    def test_banners_products(self) -> None:
+        url = reverse("products:products_banners")
+        self.request_with_budget("get", url, 4, 7)
+        self.request_with_budget("get", url, 0, 3, clear_cache=False)
+
+    def test_sales_products(self) -> None:
+        url = reverse("products:products_sales")
+        self.request_with_budget("get", url, 4, 12)
+        self.request_with_budget("get", url, 0, 2, clear_cache=False)
+        self.request_with_budget(
+            "get", url, 0, 5, {"currentPage": 2}, clear_cache=False,
+        )
+
+    @override_settings(TIME_ZONE="Europe/Moscow")
+    @patch(
+        "django.utils.timezone.now",
+        return_value=datetime(2026, 10, 17, 22, tzinfo=dt_timezone.utc),
+    )
+    def test_sales_by_local_date(self, _) -> None:
+        Product.objects.filter(id=self.products[1].id).update(
+            is_sales=True,
+            sales_price=Decimal(10),
+            sales_from=date(2026, 10, 18),
+        )
+        product = Product.objects.get(id=self.products[1].id)
+        self.assertEqual(product.get_actual_price(), Decimal(10))
+        self.assertIn(product.id, Product.refresh_final_prices())
+        self.assertIn(product, Product.get_sales_products())
+
+    def test_tags(self) -> None:
+        url = reverse("products:products_tags")
+        self.request_with_budget("get", url, 3, 6)
+        self.request_with_budget("get", url, 0, 1, clear_cache=False)
+        self.request_with_budget(
+            "get", url, 0, 1, {"category": self.categories[0].id},
+            clear_cache=False,
+        )
+
+    def test_reviews(self) -> None:
+        url = reverse(
+            "products:product_review", kwargs={"id": self.products[0].id},
+        )
+        response, _, _ = self.request_with_budget(
+            "get", url, 3, 4, {"limit": 1},
+        )
+        self.request_with_budget(
+            "get", url, 2, 2, {"limit": 1}, clear_cache=False,
+        )
+        self.request_with_budget(
+            "get",
+            url,
+            2,
+            2,
+            {"limit": 1, "cursor": response.data["next"]},
+            clear_cache=False,
+        )
+
+    def test_add_review(self) -> None:
+        self.client.force_login(self.user)
+        self.request_with_budget(
+            "post",
+            reverse(
+                "products:product_review",
+                kwargs={"id": self.products[0].id},
+            ),
+            8,
+            0,
+            {
+                "author": "Buyer",
+                "email": "buyer@example.com",
+                "text": "Good product",
+                "rate": 5,
+            },
+        )
+
+
+class ProductsCacheInvalidationTest(QueryBudgetTestCase):
+    """Check which cached responses are invalidated by products changes."""
+
+    def _get_all_categories_version(self) -> str:
+        return TaggedCache.get_versions(
+            [ALL_CATEGORIES_CACHE_TAG],
+        )[ALL_CATEGORIES_CACHE_TAG]
+
+    @patch("common.cache.cache_clock_skew", 0)
+    def test_value_invalidated_while_computed_is_not_cached(self) -> None:
+        def compute() -> tuple[str, list[str]]:
+            with self.captureOnCommitCallbacks(execute=True):
+                TaggedCache.invalidate(["test"])
+            return "stale", ["test"]
+
+        self.assertEqual(
+            StaleWhileRevalidateCache.get_or_set("test", compute, 60),
+            "stale",
+        )
+        self.assertIsNone(TaggedCache.get("test"))
+
+        StaleWhileRevalidateCache.get_or_set(
+            "test", lambda: ("fresh", ["test"]), 60,
+        )
+        self.assertEqual(TaggedCache.get("test"), "fresh")
+
+    def test_product_changes_out_of_catalog_fields(self) -> None:
+        product = Product.objects.get(id=self.products[0].id)
+        version = self._get_all_categories_version()
+        product.received_amount += 1
+        product.count -= 1
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(self._get_all_categories_version(), version)
+
+        product.free_delivery = not product.free_delivery
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertNotEqual(self._get_all_categories_version(), version)
+
+    def test_stock_changes(self) -> None:
+        version = self._get_all_categories_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            CatalogHandler.invalidate_stock_cache({self.products[0].id: 1})
+        self.assertEqual(self._get_all_categories_version(), version)
+
+        Product.objects.filter(id=self.products[0].id).update(count=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            CatalogHandler.invalidate_stock_cache({self.products[0].id: 1})
+        self.assertNotEqual(self._get_all_categories_version(), version)
+
+    def test_catalog_etag_changed_by_page_products(self) -> None:
+        url = reverse("products:catalog_details")
+        params = {**catalog_params, "limit": 2}
+        response = self.client.get(url, params)
+        etag = response["ETag"]
+        page_ids = {product["id"] for product in response.json()["items"]}
+        other_id = next(
+            product.id for product in self.products
+            if product.id not in page_ids
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CatalogHandler.invalidate_products_cache([other_id])
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        product = Product.objects.get(id=min(page_ids))
+        product.title = "Renamed product"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get_does_not_create_versions(self) -> None:
+        product_id = max(product.id for product in self.products) + 1
+        tag = PRODUCT_CACHE_TAG.format(id=product_id)
+        self.client.get(
+            reverse("products:product_details", args=[product_id]),
+            HTTP_IF_NONE_MATCH='"etag"',
+        )
+        self.assertIsNone(TaggedCache.get_existing_versions([tag]))
+
+    def test_popular_products_refreshed_by_popularity_rebuild(self) -> None:
+        url = reverse("products:products_popular")
+        response = self.client.get(url)
+        sorting_index = max(product.sorting_index for product in self.products)
+        top_product_id = next(
+            product.id for product in self.products[::-1]
+            if product.sorting_index == sorting_index and
+            product.id != response.json()[0]["id"]
+        )
+        order = self.create_orders(1)[0]
+        OrderAndProduct.bulk_add(
+            [
+                {
+                    "product_id": top_product_id,
+                    "total_quantity": 10,
+                    "total_price": Decimal(1000),
+                },
+            ],
+            order.id,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_popularity()
+        response = self.client.get(url)
+        self.assertEqual(response.json()[0]["id"], top_product_id)
+
+
+class ProductSalesTest(QueryBudgetTestCase):
+    """Check popularity of products for rolling window of daily sales."""
+
+    def _get_popularity(self) -> dict[int, int]:
+        return dict(
+            Product.objects.
+            filter(id__in=[product.id for product in self.products[:4]]).
+            values_list("id", "popularity")
+        )
+
+    def test_window_rollover(self) -> None:
+        products_ids = [product.id for product in self.products[:4]]
+        now = timezone.now()
+        first_order = self.create_orders(2)[0]
+        Order.objects.filter(id=first_order.id).update(
+            created_at=now - timedelta(days=POPULARITY_WINDOW_DAYS - 1),
+        )
+        ProductSales.rebuild()
+        self.assertEqual(
+            self._get_popularity(), dict(zip(products_ids, [1, 2, 2, 1])),
+        )
+
+        with patch(
+            "django.utils.timezone.now", return_value=now + timedelta(days=1),
+        ):
+            window_start = ProductSales.get_window_start()
+            ProductSales.add_sold(
+                {products_ids[3]: 5}, window_start - timedelta(days=1),
+            )
+            self.assertEqual(
+                self._get_popularity(), dict(zip(products_ids, [1, 2, 2, 1])),
+            )
+            changed_products_ids = ProductSales.rebuild()
+
+        self.assertEqual(set(changed_products_ids), set(products_ids[:3]))
+        self.assertEqual(
+            self._get_popularity(), dict(zip(products_ids, [0, 1, 1, 1])),
+        )
+        self.assertFalse(
+            ProductSales.objects.filter(date__lt=window_start).exists(),
+        )
+
+
+class CategoryTagsTest(QueryBudgetTestCase):
+    """Check materialized tags of categories after categories changes."""
+
+    @staticmethod
+    def _count_category_tags(category_id: int) -> dict[int, int]:
+        """Count products per tag of category and active subcategories."""
+
+        categories_ids = [
+            closure.descendant_id
+            for closure in CategoryClosure.objects.filter(
+                ancestor_id=category_id,
+            ).select_related("descendant")
+            if closure.depth == 0 or closure.descendant.is_active
+        ]
+        tags_counts = {}
+        for tag_id in ProductAndTag.objects.filter(
+                product__category_id__in=categories_ids,
+        ).values_list("tag_id", flat=True):
+            tags_counts[tag_id] = tags_counts.get(tag_id, 0) + 1
+        return tags_counts
+
+    @staticmethod
+    def _get_category_tags(category_id: int) -> dict[int, int]:
+        return dict(
+            CategoryTag.objects.
+            filter(category_id=category_id).
+            values_list("tag_id", "products_count")
+        )
+
+    def test_archive_and_restore_categories(self) -> None:
+        subcategory = next(
+            category for category in self.categories if category.parent_id
+        )
+        queryset = Category.objects.filter(id=subcategory.id)
+        tags_before = self._get_category_tags(subcategory.parent_id)
+        self.assertEqual(
+            tags_before, self._count_category_tags(subcategory.parent_id),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_categories(None, None, queryset)
+        tags_archived = self._get_category_tags(subcategory.parent_id)
+        self.assertNotEqual(tags_archived, tags_before)
+        self.assertEqual(
+            tags_archived, self._count_category_tags(subcategory.parent_id),
+        )
+        self.assertNotIn(subcategory.id, CategoryTagsMap.get())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            restore_categories(None, None, queryset)
+        self.assertEqual(
+            self._get_category_tags(subcategory.parent_id), tags_before,
+        )
+        self.assertIn(subcategory.id, CategoryTagsMap.get())
+
+
+    def test_products_changes(self) -> None:
+        product = Product.objects.get(
+            id=next(
+                product.id for product in self.products
+                if product.category.parent_id
+            ),
+        )
+        category = next(
+            category for category in self.categories
+            if category.parent_id not in (None, product.category.parent_id)
+        )
+        tag = ProductTag.objects.create(name="New tag")
+        tag_categories = CategoryTag.objects.filter(tag=tag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductAndTag.objects.create(product=product, tag=tag)
+        self._check_categories_tags()
+        self.assertEqual(
+            set(tag_categories.values_list("category_id", flat=True)),
+            {product.category_id, product.category.parent_id},
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.category = category
+            product.save()
+        self._check_categories_tags()
+        self.assertEqual(
+            set(tag_categories.values_list("category_id", flat=True)),
+            {category.id, category.parent_id},
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductAndTag.objects.filter(product=product, tag=tag).delete()
+        self._check_categories_tags()
+        self.assertFalse(tag_categories.exists())
+
+    def _check_categories_tags(self) -> None:
+        """Check materialized tags of all categories against products."""
+
+        for category in self.categories:
+            self.assertEqual(
+                self._get_category_tags(category.id),
+                self._count_category_tags(category.id),
+            )
+
+
+class CategoriesTreeTest(QueryBudgetTestCase):
+    """Check lookups of categories tree by active categories only."""
+
+    def test_inactive_category_hides_subtree(self) -> None:
+        category = next(
+            category for category in self.categories if category.parent_id
+        )
+        subcategory = Category.objects.create(
+            title="Subcategory leaf", parent=category,
+        )
+        self.assertEqual(Category.get_nesting_level(subcategory.id), 2)
+        self.assertEqual(
+            subcategory.get_root_category_id(), category.parent_id,
+        )
+        self.assertEqual(
+            Category.get_subcategories_rel_nesting_level(category.parent_id),
+            2,
+        )
+
+        Category.objects.filter(id=category.id).update(is_active=False)
+        self.assertEqual(Category.get_nesting_level(subcategory.id), 0)
+        self.assertIsNone(subcategory.get_root_category_id())
+        self.assertEqual(
+            Category.get_subcategories_rel_nesting_level(category.parent_id),
+            1,
+        )
+        descendants_ids = {
+            row["descendant_id"]
+            for row in Category.get_descendants_ids(category.parent_id)
+        }
+        self.assertNotIn(category.id, descendants_ids)
+        self.assertNotIn(subcategory.id, descendants_ids)
+        self.assertEqual(
+            {
+                row["descendant_id"]
+                for row in Category.get_descendants_ids(category.id)
+            },
+            {category.id, subcategory.id},
+        )
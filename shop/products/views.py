@@ -1,10 +1,14 @@
 """Module contains endpoints for app."""
 
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.request import Request
 
+from .constants import (
+    CATEGORIES_TREE_CACHE_TAG,
+    PRODUCT_CACHE_TAG,
+)
 from .services import (
     CatalogHandler,
     CategoryHandler,
@@ -12,6 +16,7 @@ from .services import (
     ProductReviewHandler,
     ProductTagHandler,
 )
+from common.cache import conditional_by_versions
 
 
 class CatalogView(APIView):
@@ -19,10 +24,11 @@ class CatalogView(APIView):
     def get(self, request: Request) -> Response:
         """Get Category and subcategories products as per query params."""
 
-        return CatalogHandler.get_catalog_response(request.query_params)
+        return CatalogHandler.get_catalog_response(request)
 
 
 class CategoryView(APIView):
+    @conditional_by_versions(lambda request: [CATEGORIES_TREE_CACHE_TAG])
     def get(self, request: Request) -> Response:
         """Get all Categories with subcategories."""
 
@@ -31,10 +37,15 @@ class CategoryView(APIView):
 
 class ProductView(APIView):
 
+    @conditional_by_versions(
+        lambda request, id: [PRODUCT_CACHE_TAG.format(id=id)],
+    )
     def get(self, request: Request, id: int) -> Response:
         """Get Product details as per Product.id."""
 
-        return ProductHandler.get_product_by_id_response(id)
+        return ProductHandler.get_product_by_id_response(
+            id, request.query_params.dict(),
+        )
 
 
 class ProductBannerView(APIView):
@@ -50,7 +61,9 @@ class ProductPopularView(APIView):
     def get(self, request: Request) -> Response:
         """Get 'popular' Products."""
 
-        return ProductHandler.get_popular_products_response()
+        return ProductHandler.get_popular_products_response(
+            request.query_params.dict(),
+        )
 
 
 class ProductLimitedView(APIView):
@@ -62,7 +75,14 @@ class ProductLimitedView(APIView):
 
 
 class ProductReviewView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request: Request, id: int) -> Response:
+        """Get page of Product Reviews with Product rating summary."""
+
+        return ProductReviewHandler.get_reviews_response(
+            id, request.query_params.dict(),
+        )
 
     def post(self, request: Request, id: int) -> Response:
         """Add new Product Review to Product."""
@@ -7,6 +7,8 @@ from os import (
     path as os_path,
 )
 
+from celery.schedules import crontab
+
 if os_getenv("SHOP_DEV_SERVER", "True") == "True":
     from dotenv import load_dotenv
 
@@ -96,12 +98,26 @@ DATABASES = {
         },
     }
 }
+# Test runs (SHOP_TESTING) use SQLite and local memory cache
+if os_getenv("SHOP_TESTING") == "True":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "test_db.sqlite3",
+        }
+    }
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Cashing
-if os_getenv("SHOP_DUMMY_CACHE") == "True":
+if os_getenv("SHOP_TESTING") == "True":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+elif os_getenv("SHOP_DUMMY_CACHE") == "True":
     CACHES = {
         "default": {
             "BACKEND": "django.core.cache.backends.dummy.DummyCache",
@@ -124,6 +140,21 @@ else:
         }
     }
 
+# Single-flight locks of cache recomputes (fallback: compute or error)
+SHOP_CACHE_LOCK_TIMEOUT = int(os_getenv("SHOP_CACHE_LOCK_TIMEOUT", 30))
+SHOP_CACHE_LOCK_WAIT = float(os_getenv("SHOP_CACHE_LOCK_WAIT", 2))
+SHOP_CACHE_LOCK_FALLBACK = os_getenv("SHOP_CACHE_LOCK_FALLBACK", "compute")
+
+
+# In-memory columnar catalog index (requires extra "catalog-index": NumPy)
+SHOP_CATALOG_INDEX = os_getenv("SHOP_CATALOG_INDEX") == "True"
+
+# In-process search index for databases without FULLTEXT (SQLite test runs).
+# It is not shared between processes, so it is off by default out of tests.
+SHOP_SEARCH_INPROCESS_INDEX = os_getenv(
+    "SHOP_SEARCH_INPROCESS_INDEX", os_getenv("SHOP_TESTING"),
+) == "True"
+
 
 # Celery configs
 CELERY_BROKER_URL = (
@@ -134,6 +165,20 @@ CELERY_RESULT_BACKEND = (
     f"redis://{os_getenv("REDIS_USERNAME")}:{os_getenv("REDIS_PASSWORD")}"
     f"@{REDIS_HOST}:{os_getenv("REDIS_PORT")}/{os_getenv("REDIS_BROKER_DB")}"
 )
+CELERY_BEAT_SCHEDULE = {
+    "rollover_sales_prices": {
+        "task": "products.tasks.rollover_sales_prices",
+        "schedule": crontab(minute=1, hour=0),
+    },
+    "rebuild_popularity": {
+        "task": "products.tasks.rebuild_popularity",
+        "schedule": crontab(minute=5, hour=0),
+    },
+    "reconcile_stock": {
+        "task": "products.tasks.reconcile_stock",
+        "schedule": crontab(minute="*/5"),
+    },
+}
 
 
 # Password validation
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shop.settings")
 
 application = get_wsgi_application()
+
+# Build in-memory catalog index on worker start instead of first request
+from products.services.product_index import ProductColumnarIndex  # noqa: E402
+
+ProductColumnarIndex.warm_up()
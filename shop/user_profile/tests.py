@@ -0,0 +1,52 @@
+"""Budgets of SQL queries and cache round trips for 'User profile' endpoints.
+
+Run with SHOP_TESTING=True (SQLite and local memory cache).
+
+"""
+
+from django.urls import reverse
+
+from common.testing import QueryBudgetTestCase
+
+
+class UserProfileQueryBudgetTest(QueryBudgetTestCase):
+    """Check that profile endpoints cost fixed number of queries.
+
+    Avatar upload (multipart form with image file) is not covered.
+
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_profile(self) -> None:
+        self.request_with_budget(
+            "get", reverse("user_profile:profile_full"), 3, 0,
+        )
+
+    def test_update_profile(self) -> None:
+        self.request_with_budget(
+            "post",
+            reverse("user_profile:profile_full"),
+            5,
+            0,
+            {
+                "fullName": "Buyer Name",
+                "email": "buyer@example.com",
+                "phone": "+79876543210",
+                "avatar": None,
+            },
+        )
+
+    def test_update_password(self) -> None:
+        self.request_with_budget(
+            "post",
+            reverse("user_profile:profile_password"),
+            15,
+            0,
+            {
+                "currentPassword": "buyer_password",
+                "newPassword": "new_buyer_password",
+            },
+        )